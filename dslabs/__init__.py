@@ -3,3 +3,4 @@ lecturer.
 This aims to standardize outputs across the entier class
 """
 from .dslabs_functions import *
+from .downsampling import DOWNSAMPLING, downsample
@@ -0,0 +1,144 @@
+"""
+Downsampling of long series before plotting: a line chart can't show more than a
+couple of points per horizontal pixel, so series are reduced to a number of points
+proportional to the width of the axes they are drawn on.
+
+- "minmax": the min and max values of every pixel column, so that the
+  envelope of the line is drawn exactly as with all the points.
+- "lttb": Largest-Triangle-Three-Buckets, one point per bucket, the one keeping the
+  visual shape of the series (Steinarsson, 2013).
+- None: every point, as before.
+"""
+
+from numpy import (
+    ndarray,
+    arange,
+    argmax,
+    argmin,
+    asarray,
+    ceil,
+    concatenate,
+    full,
+    inf,
+    isnan,
+    nan,
+    issubdtype,
+    datetime64,
+    timedelta64,
+    float64,
+    sort,
+    unique,
+    where,
+)
+from matplotlib.axes import Axes
+from pandas import DatetimeIndex, Index
+
+DOWNSAMPLING: str | None = "minmax"
+POINTS_PER_PIXEL: int = 2
+
+
+def get_nr_points(ax: Axes, points_per_pixel: int = POINTS_PER_PIXEL) -> int:
+    return max(int(ax.get_window_extent().width * points_per_pixel), 3)
+
+
+def as_plot_arrays(xvalues, yvalues) -> tuple[ndarray, ndarray]:
+    """Numpy arrays for matplotlib: datetime64 for timestamps, float64 for values."""
+    if not isinstance(xvalues, ndarray) or xvalues.dtype == object:
+        xvalues = Index(xvalues)
+    if isinstance(xvalues, DatetimeIndex) and xvalues.tz is not None:
+        # Matplotlib draws timestamps in UTC.
+        xvalues = xvalues.tz_convert(None)
+    return asarray(xvalues), asarray(yvalues, dtype=float64)
+
+
+def get_positions(xvalues: ndarray) -> ndarray:
+    if issubdtype(xvalues.dtype, datetime64) or issubdtype(xvalues.dtype, timedelta64):
+        return xvalues.view("int64").astype(float64)
+    return xvalues.astype(float64)
+
+
+def minmax_indices(yvalues: ndarray, nr_points: int) -> ndarray:
+    """Positions of the min and max values of `nr_points` // 2 buckets of `yvalues`,
+    plus the first and last points. Buckets with missing values also keep one of
+    them, so that gaps are still drawn."""
+    n: int = len(yvalues)
+    nr_buckets: int = max(nr_points // 2, 1)
+    size: int = int(ceil(n / nr_buckets))
+    nr_buckets = int(ceil(n / size))
+
+    # Padding of the last bucket counts as missing, its positions are dropped below.
+    padded: ndarray = full(nr_buckets * size, nan)
+    padded[:n] = yvalues
+    buckets: ndarray = padded.reshape(nr_buckets, size)
+    missing: ndarray = isnan(buckets)
+    first: ndarray = arange(nr_buckets) * size
+    low: ndarray = first + argmin(where(missing, inf, buckets), axis=1)
+    high: ndarray = first + argmax(where(missing, -inf, buckets), axis=1)
+    with_gaps: ndarray = missing.any(axis=1)
+    gaps: ndarray = first[with_gaps] + argmax(missing[with_gaps], axis=1)
+
+    indices: ndarray = sort(concatenate([[0], low, high, gaps, [n - 1]]))
+    return unique(indices[indices < n])
+
+
+def lttb_indices(xvalues: ndarray, yvalues: ndarray, nr_points: int) -> ndarray:
+    """Positions of the `nr_points` picked by Largest-Triangle-Three-Buckets: the
+    first and last points, and in every bucket in between the point making the
+    largest triangle with the previous pick and the mean of the next bucket."""
+    n: int = len(yvalues)
+    x: ndarray = get_positions(xvalues)
+    valid: ndarray = ~isnan(yvalues)
+    edges: ndarray = (1 + arange(nr_points - 1) * (n - 2) / (nr_points - 2)).astype(int)
+
+    indices: list[int] = [0]
+    for i in range(nr_points - 2):
+        start, end = edges[i], edges[i + 1]
+        after: slice = slice(end, edges[i + 2] if i + 2 < len(edges) else n)
+        if end <= start:
+            continue
+        next_valid: ndarray = valid[after]
+        if next_valid.any():
+            cx, cy = x[after][next_valid].mean(), yvalues[after][next_valid].mean()
+        else:
+            cx, cy = x[n - 1], yvalues[n - 1]
+        ax, ay = x[indices[-1]], yvalues[indices[-1]]
+        areas: ndarray = abs((ax - cx) * (yvalues[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        # A missing value is only picked when the whole bucket is missing.
+        areas = where(valid[start:end], areas, -1.0)
+        indices.append(start + int(argmax(areas)))
+    indices.append(n - 1)
+    return asarray(indices)
+
+
+def downsample(
+    xvalues, yvalues, ax: Axes = None, method: str | None = DOWNSAMPLING, nr_points: int = None  # type: ignore
+) -> tuple[ndarray, ndarray]:
+    """Reduce the series to about `nr_points` (by default, as many as the width of `ax`
+    allows) with `method`. Series that are already short enough are kept whole.
+
+    Args:
+        xvalues: positions of the points, numbers or timestamps.
+        yvalues: values of the points.
+        ax (Axes, optional): Axes where the series will be drawn.
+        method (str | None, optional): "minmax", "lttb" or None to keep every point.
+            Defaults to DOWNSAMPLING.
+        nr_points (int, optional): Defaults to the number of points for `ax`.
+
+    Returns:
+        tuple: x and y numpy arrays.
+    """
+    xvalues, yvalues = as_plot_arrays(xvalues, yvalues)
+    if method is None:
+        return xvalues, yvalues
+    if nr_points is None:
+        nr_points = get_nr_points(ax)
+    if len(yvalues) <= nr_points:
+        return xvalues, yvalues
+
+    if method == "minmax":
+        indices: ndarray = minmax_indices(yvalues, nr_points)
+    elif method == "lttb":
+        indices = lttb_indices(xvalues, yvalues, max(nr_points, 3))
+    else:
+        raise ValueError(f"Unknown downsampling method {method}")
+    return xvalues[indices], yvalues[indices]
@@ -8,7 +8,7 @@ from math import pi, sin, cos, ceil, sqrt
 from itertools import product
 from datetime import datetime
 from typing import Callable
-from numpy import array, ndarray, arange, std, set_printoptions
+from numpy import array, ndarray, arange, std, set_printoptions, datetime64
 from matplotlib.collections import PathCollection
 from matplotlib.colorbar import Colorbar
 from matplotlib.container import BarContainer
@@ -30,6 +30,7 @@ from sklearn.metrics import confusion_matrix, RocCurveDisplay, roc_auc_score
 from sklearn.naive_bayes import _BaseNB, GaussianNB, MultinomialNB, BernoulliNB
 from sklearn.neighbors import KNeighborsClassifier
 
+from .downsampling import DOWNSAMPLING, downsample
 from .config import (
     ACTIVE_COLORS,
     LINE_COLOR,
@@ -87,14 +88,18 @@ def set_chart_xticks(
         if percentage:
             ax.set_ylim(0.0, 1.0)
 
-        if isinstance(xvalues[0], datetime):
+        if isinstance(xvalues[0], (datetime, datetime64)):
             locator = AutoDateLocator()
             ax.xaxis.set_major_locator(locator)
             ax.xaxis.set_major_formatter(
                 AutoDateFormatter(locator, defaultfmt="%Y-%m-%d")
             )
         rotation: int = 0
-        if not any(not isinstance(x, (int, float)) for x in xvalues):
+        if isinstance(xvalues, ndarray):
+            numeric: bool = is_any_real_numeric_dtype(xvalues.dtype)
+        else:
+            numeric = not any(not isinstance(x, (int, float)) for x in xvalues)
+        if numeric:
             ax.set_xlim(left=xvalues[0], right=xvalues[-1])
             ax.set_xticks(xvalues, labels=xvalues)
         else:
@@ -115,16 +120,20 @@ def plot_line_chart(
     name: str = "",
     percentage: bool = False,
     show_stdev: bool = False,
+    downsampling: str | None = DOWNSAMPLING,
 ) -> Axes:
     if ax is None:
         ax = gca()
+    # Deviation of the whole series, on purpose: the points kept by a min/max
+    # envelope overstate it. The band is then drawn around the downsampled line.
+    stdev: float = round(std(yvalues), 3) if show_stdev else 0.0
+    xvalues, yvalues = downsample(xvalues, yvalues, ax=ax, method=downsampling)
     ax = set_chart_labels(ax=ax, title=title, xlabel=xlabel, ylabel=ylabel)
     ax = set_chart_xticks(xvalues, ax, percentage=percentage)
     if any(y < 0 for y in yvalues) and percentage:
         ax.set_ylim(-1.0, 1.0)
     ax.plot(xvalues, yvalues, c=LINE_COLOR, label=name)
     if show_stdev:
-        stdev: float = round(std(yvalues), 3)
         y_bottom: list[float] = [(y - stdev) for y in yvalues]
         y_top: list[float] = [(y + stdev) for y in yvalues]
         ax.fill_between(xvalues, y_bottom, y_top, color=FILL_COLOR, alpha=0.2)
@@ -932,15 +941,15 @@ def plot_forecasting_series_on_ax(
     title: str = "",
     xlabel: str = "time",
     ylabel: str = "",
+    downsampling: str | None = DOWNSAMPLING,
 ) -> list[Axes]:
     ax.set_title(title)
     ax.set_xlabel(xlabel)
     ax.set_ylabel(ylabel)
-    ax.plot(trn.index, trn.values, label="train", color=PAST_COLOR)
-    ax.plot(tst.index, tst.values, label="test", color=FUTURE_COLOR)
+    ax.plot(*downsample(trn.index, trn.values, ax=ax, method=downsampling), label="train", color=PAST_COLOR)
+    ax.plot(*downsample(tst.index, tst.values, ax=ax, method=downsampling), label="test", color=FUTURE_COLOR)
     ax.plot(
-        prd_tst.index,
-        prd_tst.values,
+        *downsample(prd_tst.index, prd_tst.values, ax=ax, method=downsampling),
         "--",
         label="test prediction",
         color=PRED_FUTURE_COLOR,
@@ -956,16 +965,16 @@ def plot_forecasting_series(
     title: str = "",
     xlabel: str = "time",
     ylabel: str = "",
+    downsampling: str | None = DOWNSAMPLING,
 ) -> list[Axes]:
     fig, ax = subplots(1, 1, figsize=(4 * HEIGHT, HEIGHT), squeeze=True)
     fig.suptitle(title)
     ax.set_xlabel(xlabel)
     ax.set_ylabel(ylabel)
-    ax.plot(trn.index, trn.values, label="train", color=PAST_COLOR)
-    ax.plot(tst.index, tst.values, label="test", color=FUTURE_COLOR)
+    ax.plot(*downsample(trn.index, trn.values, ax=ax, method=downsampling), label="train", color=PAST_COLOR)
+    ax.plot(*downsample(tst.index, tst.values, ax=ax, method=downsampling), label="test", color=FUTURE_COLOR)
     ax.plot(
-        prd_tst.index,
-        prd_tst.values,
+        *downsample(prd_tst.index, prd_tst.values, ax=ax, method=downsampling),
         "--",
         label="test prediction",
         color=PRED_FUTURE_COLOR,
@@ -1,7 +1,11 @@
 import os
 import pandas as pd
-from preprocess import preprocess
-from profiling import dimensionality, granularity, distribution, stationarity
+from preprocess import add_ambient_temperature, preprocess
+from preprocess.meteo import meteostat_provider
+from preprocess.ingestion import CSV_SCHEMA, list_csv_files, load_csv_files
+from preprocess.cache import fingerprint, read_cache, write_cache
+from preprocess.incremental import update_store
+from profiling import runner as profiling
 from transformation import aggregation, differentiation, smoothing, scaling
 from pipelines.tasks import transform
 from pipelines import (
@@ -17,61 +21,78 @@ from pipelines import (
 )
 
 
-def load_data(dir):
-    months = []
-    for root, dirs, files in os.walk(dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            df = pd.read_csv(file_path)
-            months.append(df)
+def load_data(dir, use_cache=True, incremental=False, weather=False):
+    paths = list_csv_files(dir)
+    # Ambient temperature from meteostat, an exogenous variable for ARIMA and LSTM.
+    weather_provider = meteostat_provider if weather else None
 
-    df = pd.concat(months, axis=0, ignore_index=True)
-    df = preprocess(df, datetime_col="registered_at")
+    # Only preprocess the monthly files that were added since the last execution.
+    if incremental:
+        df = update_store(paths)
+        return df if weather_provider is None else add_ambient_temperature(df, weather_provider)
+
+    # Reuse the preprocessed frame while the source files and parameters are unchanged.
+    key = fingerprint(paths, { "datetime_col": "registered_at", "schema": CSV_SCHEMA, "weather": weather })
+    df = read_cache(key) if use_cache else None
+    if df is not None:
+        return df
+
+    df = load_csv_files(paths)
+    df = preprocess(df, datetime_col="registered_at", weather_provider=weather_provider)
+    if use_cache:
+        write_cache(df, key)
     return df
 
-df = load_data("./data/1min")
 
-# Using this when we have already loaded and preprocessed the df locally
-# to save time on each execution.
-# df = pd.read_pickle('./data/resampled-1hr.pkl')
+def main():
+    # Runs only as a script: the process pools of ingestion and profiling
+    # re-import this module in their workers under the spawn start method.
+    df = load_data("./data/1min")
 
+    """Profiling"""
+    # Dimensionality, granularity, distribution and stationarity, in parallel.
+    profiling.run(df, ['system_battery_max_temperature'])
 
-"""Profiling"""
-dimensionality.analyze(df, 'system_battery_max_temperature')
-granularity.analyze(df, 'system_battery_max_temperature')
-distribution.analyze(df, 'system_battery_max_temperature')
-stationarity.analyze(df, "system_battery_max_temperature")
+    """Transformation: Analysis"""
+    scaling.analyze(df, 'system_battery_max_temperature')
 
-"""Transformation: Analysis"""
-scaling.analyze(df, 'system_battery_max_temperature')
+    # Analyze aggregation with scaled dataset
+    df_scaled = transform(df, { "scaling": True })
+    aggregation.analyze(df_scaled, 'system_battery_max_temperature')
 
-# Analyze aggregation with scaled dataset
-df_scaled = transform(df, { "scaling": True })
-aggregation.analyze(transform(df, { "scaling": True }), 'system_battery_max_temperature')
+    # Analyze differentiation with scaled and aggregated dataset
+    df_scaled_hour = transform(df, { "scaling": True, "aggregation": { 'rule': 'h'} })
+    differentiation.analyze(df_scaled_hour, 'system_battery_max_temperature')
 
-# Analyze differentiation with scaled and aggregated dataset
-df_scaled_hour = transform(df, { "scaling": True, "aggregation": { 'rule': 'h'} })
-differentiation.analyze(df_scaled_hour, 'system_battery_max_temperature')
+    smoothing.analyze(df_scaled_hour, 'system_battery_max_temperature', [12,24,36,48])
 
-smoothing.analyze(df_scaled_hour, 'system_battery_max_temperature', [12,24,36,48])
+    """Transformation: Application"""
+    df_hour = transform(
+        df,
+        { "scaling": True, "aggregation": { 'rule': 'h'}, "differentiation": False },
+    )
+
+    """Modeling"""
+    # Same scaler `transform` fitted on `df`, forecasts are reported in degrees.
+    scaler = scaling.IncrementalScaler().fit(df)
+    options = {"training_pct": 0.80, "smoothing": False, "scaler": scaler}
+    # options_smoothing = {"training_pct": 0.80, "smoothing": { "window": 12 }}
+
+    simple_average.run(df_hour, 'system_battery_max_temperature', options, path='temp/simple-average')
+    persistence_optimistic.run(df_hour, 'system_battery_max_temperature', options, path='temp/persistence-optimistic')
+    persistence_realist.run(df_hour, 'system_battery_max_temperature', options, path='temp/persistence-realist')
+    linear_regression.run(df_hour, 'system_battery_max_temperature', options, path='temp/linear-regression')
+    rolling_mean.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/rolling-mean-r2')
+    exponential_smoothing.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/exponential-smoothing-r2-exp')
+    arima.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/arima')
+    # Ambient temperature is only there when loaded with `load_data(..., weather=True)`.
+    exogenous = ['system_grid_session_duration', 'system_battery_soc']
+    if 'ambient_temperature' in df_hour.columns:
+        exogenous.append('ambient_temperature')
+    arima.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2', 'exogenous': exogenous }, path='temp/arima-exog')
+    lstm.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/lstm')
+    lstm_exog.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2', 'exogenous': exogenous }, path='temp/lstm-exog')
 
-"""Transformation: Application"""
-df_hour = transform(
-    df,
-    { "scaling": True, "aggregation": { 'rule': 'h'}, "differentiation": False },
-)
 
-"""Modeling"""
-options = {"training_pct": 0.80, "smoothing": False}
-# options_smoothing = {"training_pct": 0.80, "smoothing": { "window": 12 }}
-
-simple_average.run(df_hour, 'system_battery_max_temperature', options, path='temp/simple-average')
-persistence_optimistic.run(df_hour, 'system_battery_max_temperature', options, path='temp/persistence-optimistic')
-persistence_realist.run(df_hour, 'system_battery_max_temperature', options, path='temp/persistence-realist')
-linear_regression.run(df_hour, 'system_battery_max_temperature', options, path='temp/linear-regression')
-rolling_mean.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/rolling-mean-r2')
-exponential_smoothing.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/exponential-smoothing-r2-exp')
-arima.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/arima')
-arima.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2', 'exogenous': ['system_grid_session_duration', 'system_battery_soc'] }, path='temp/arima-exog')
-lstm.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/lstm')
-lstm_exog.run(df_hour, 'system_battery_max_temperature', { **options, 'optimize_for': 'R2' }, path='temp/lstm-exog')
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,9 @@ import traceback
 import time
 from pandas import DataFrame, Series, DatetimeIndex
 from statsmodels.tsa.arima.model import ARIMA
-from dslabs import HEIGHT, DELTA_IMPROVE, subplots, plot_multiline_chart
 from utils import get_options_with_default, log_execution_time
-from pipelines.tasks import prepare, save_report, evaluate
+from pipelines.tasks import REPORT_OPTIONS, prepare, save_report
+from pipelines.tasks.evaluate import DELTA_IMPROVE, get_target_stats, score_forecasts
 
 """
 
@@ -20,10 +20,13 @@ In the context of the problem, the temperature is expected to rise with longer c
 DEFAULT_ARIMA_OPT_REGRESSOR_OPTIONS = {
     'training_pct': 0.8,
     'smoothing': False,
-    'optimize_for': 'R2'  # R2 or MAPE
+    'optimize_for': 'R2',  # R2 or MAPE
+    **REPORT_OPTIONS,
 }
 
 def diagnostics(train, test, target, path):
+    from dslabs import HEIGHT
+
     predictor = ARIMA(train, order=(3, 1, 2))
     model = predictor.fit()
 
@@ -35,7 +38,7 @@ def diagnostics(train, test, target, path):
 
 
 @log_execution_time
-def find_best_parameters(train, test, optimize_for='R2', exogenous=None, path='./temp'):
+def find_best_parameters(train, test, optimize_for='R2', exogenous=None, path='./temp', stats=None):
     metric = optimize_for
     show_by_perc = metric == "R2" or metric == "MAPE"
     best_result: dict = {"metric": metric, "params": (), "predicted_test": None, "predicted_train": None, "perf": -10000}
@@ -44,11 +47,10 @@ def find_best_parameters(train, test, optimize_for='R2', exogenous=None, path='.
     p_params = [1, 4, 8, 12, 16]
     q_params = [1, 2, 4, 8]
 
-    fig, axs = subplots(1, len(d_values), figsize=(len(d_values) * HEIGHT, HEIGHT))
+    charts = []
     for d in d_values:
-        values = {}
+        values = {q: [] for q in q_params}
         for q in q_params:
-            yvalues = []
             for p in p_params:
                 start = time.time()
                 if exogenous is not None:
@@ -60,8 +62,9 @@ def find_best_parameters(train, test, optimize_for='R2', exogenous=None, path='.
                     model = arima.fit()
                     prd_test = model.forecast(steps=len(test), signal_only=False)
 
-                metrics: dict = evaluate(test=test, predicted_test=prd_test)
-                eval: float = metrics['test'][metric]
+                # Candidates are scored as they're fitted, so that only the best
+                # fitted model so far is kept.
+                eval: float = round(float(score_forecasts(test, [prd_test], stats)[metric][0]), 2)
                 print(f'({p},{d},{q}): {eval}. took {time.time() - start}')
 
                 if eval > best_result["perf"] and abs(eval - best_result["perf"]) > DELTA_IMPROVE:
@@ -69,20 +72,23 @@ def find_best_parameters(train, test, optimize_for='R2', exogenous=None, path='.
                     best_result["params"] = (p, d, q)
                     best_result["predicted_test"] = prd_test
                     best_result["model"] = model
-                yvalues.append(eval)
-            values[q] = yvalues
+                values[q].append(eval)
 
-        ax = plot_multiline_chart(
-            p_params, values, ax=axs[d], title=f"ARIMA d={d} ({metric})", xlabel="p", ylabel=metric, percentage=show_by_perc
-        )
-        ax.set_ylim(-3.5, 1)
+        charts.append({'title': f"ARIMA d={d} ({metric})", 'values': values})
 
     print(
         f"ARIMA best results achieved with (p,d,q)=({best_result['params'][0]:.0f}, {best_result['params'][1]:.0f}, {best_result['params'][2]:.0f}) ==> measure={best_result['perf']:.2f}"
     )
 
-    fig.savefig(f"{path}/arima-parameter-tuning-by-d-for-{metric}.png")
-
+    best_result["study"] = {
+        'file': f"arima-parameter-tuning-by-d-for-{metric}.png",
+        'xvalues': p_params,
+        'xlabel': "p",
+        'ylabel': metric,
+        'percentage': show_by_perc,
+        'ylim': (-3.5, 1),
+        'charts': charts,
+    }
     return best_result
 
 
@@ -91,7 +97,8 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     options = get_options_with_default(options, DEFAULT_ARIMA_OPT_REGRESSOR_OPTIONS)
 
     # Create target dir if it doesn't exist
-    os.makedirs(path, exist_ok=True)
+    if path:
+        os.makedirs(path, exist_ok=True)
 
     print(f"\n-- ARIMA {'EXOG' if 'exogenous' in options else ''} --")
     print(f'target: {target}')
@@ -102,31 +109,34 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     target_test = test[target]
 
     # diagnostics(target_train, target_test, target='system_battery_max_temperature', path=path)
+    stats = get_target_stats(options['scaler'], target)
 
     exogenous = None
     if 'exogenous' in options and len(options['exogenous']) > 0:
         exogenous = [{ 'train': train[exog], 'test': test[exog] } for exog in options['exogenous']]
-        best_result = find_best_parameters(target_train, target_test, exogenous=exogenous[0], optimize_for=options['optimize_for'], path=path)
+        best_result = find_best_parameters(target_train, target_test, exogenous=exogenous[0], optimize_for=options['optimize_for'], path=path, stats=stats)
         prd_train = best_result['model'].predict(start=0, end=len(target_train) - 1)
         prd_test = best_result['model'].forecast(steps=len(target_test), exog=target_test)
 
     else:
-        best_result = find_best_parameters(target_train, target_test, optimize_for=options['optimize_for'], path=path)
+        best_result = find_best_parameters(target_train, target_test, optimize_for=options['optimize_for'], path=path, stats=stats)
         prd_train = best_result['model'].predict(start=0, end=len(target_train) - 1)
         prd_test = best_result['model'].forecast(steps=len(target_test))
 
     # Save results to `path`
-    if path:
-        save_report(
-            'arima',
-            target,
-            target_train,
-            target_test,
-            prd_train,
-            prd_test,
-            observations=[
-                f"optimized_for={best_result['metric']}",
-                f"(p,d,q)={best_result['params']}"
-            ],
-            path=path
-        )
+    return save_report(
+        'arima',
+        target,
+        target_train,
+        target_test,
+        prd_train,
+        prd_test,
+        observations=[
+            f"optimized_for={best_result['metric']}",
+            f"(p,d,q)={best_result['params']}"
+        ],
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+        study=best_result['study'],
+    )
@@ -3,52 +3,52 @@ from pandas import read_csv, DataFrame, Series
 from pipelines.tasks.prepare import prepare
 from utils import get_options_with_default
 from statsmodels.tsa.holtwinters import SimpleExpSmoothing, ExponentialSmoothing
-from pipelines.tasks import prepare, save_report, evaluate
-from dslabs import FORECAST_MEASURES, DELTA_IMPROVE, plot_line_chart, HEIGHT
-from matplotlib.pyplot import figure
+from pipelines.tasks import REPORT_OPTIONS, prepare, save_report
+from pipelines.tasks.evaluate import DELTA_IMPROVE, get_target_stats, score_forecasts
 
 # from dslabs_functions import series_train_test_split, HEIGHT
 
 DEFAULT_EXPONENTIAL_SMOOTHING_OPTIONS = {
     'training_pct': 0.8,
     'smoothing': False,
-    'optimize_for': 'R2'  # MAPE
+    'optimize_for': 'R2',  # MAPE
+    **REPORT_OPTIONS,
 }
 
 
-def exponential_smoothing_study(train: Series, test: Series, measure: str = "R2"):
+def exponential_smoothing_study(train: Series, test: Series, measure: str = "R2", stats=None):
     alpha_values = [i / 10 for i in range(1, 10)]
     flag = measure == "R2" or measure == "MAPE"
     best_model = None
     best_params: dict = {"name": "Exponential Smoothing", "metric": measure, "params": ()}
     best_performance: float = -100000
 
-    yvalues = []
-    for alpha in alpha_values:
-        tool = ExponentialSmoothing(train)
-        model = tool.fit(smoothing_level=alpha, optimized=False)
-        prd_tst = model.forecast(steps=len(test))
+    models = [ExponentialSmoothing(train).fit(smoothing_level=alpha, optimized=False) for alpha in alpha_values]
 
-        eval: float = FORECAST_MEASURES[measure](test, prd_tst)
+    # All the candidates are scored together.
+    scores = score_forecasts(test, [model.forecast(steps=len(test)) for model in models], stats)[measure]
+    yvalues = []
+    for (i, alpha) in enumerate(alpha_values):
+        eval: float = scores[i]
         # print(w, eval)
         if eval > best_performance and abs(eval - best_performance) > DELTA_IMPROVE:
             best_performance: float = eval
             best_params["params"] = (alpha,)
-            best_model = model
+            best_model = models[i]
         yvalues.append(eval)
 
     print(f"Exponential Smoothing best with alpha={best_params['params'][0]:.0f} -> {measure}={best_performance}")
-    ax = plot_line_chart(
-        alpha_values,
-        yvalues,
-        title=f"Exponential Smoothing ({measure})",
-        xlabel="alpha",
-        ylabel=measure,
-        percentage=flag,
-    )
-    ax.set_ylim(-3, 1)
+    study = {
+        'file': f"exponential_smoothing_{measure}_study.png",
+        'xvalues': alpha_values,
+        'xlabel': "alpha",
+        'ylabel': measure,
+        'percentage': flag,
+        'ylim': (-3, 1),
+        'charts': [{'title': f"Exponential Smoothing ({measure})", 'values': yvalues}],
+    }
 
-    return best_model, best_params
+    return best_model, best_params, study
 
 
 def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
@@ -56,7 +56,8 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     options = get_options_with_default(options, DEFAULT_EXPONENTIAL_SMOOTHING_OPTIONS)
 
     # Create target dir if it doesn't exist
-    os.makedirs(path, exist_ok=True)
+    if path:
+        os.makedirs(path, exist_ok=True)
 
     metric = options['optimize_for']
 
@@ -68,24 +69,23 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     train = train[target]
     test = test[target]
 
-    fig = figure(figsize=(3 * HEIGHT, HEIGHT))
-    best_model, best_params = exponential_smoothing_study(train, test, measure=metric)
-    fig.tight_layout()
-    fig.savefig(f"{path}/exponential_smoothing_{metric}_study.png")
+    best_model, best_params, study = exponential_smoothing_study(train, test, measure=metric, stats=get_target_stats(options['scaler'], target))
 
     prd_trn = best_model.predict(start=0, end=len(train) - 1)
     prd_tst = best_model.forecast(steps=len(test))
 
-        # Save results to `path`
-    if path:
-        save_report(
-            f'exponential-smoothing-{metric}',
-            target,
-            train,
-            test,
-            prd_trn,
-            prd_tst,
-            observations=[f"best model using win={best_params['params']})"],
-            path=path
-        )
+    # Save results to `path`
+    return save_report(
+        f'exponential-smoothing-{metric}',
+        target,
+        train,
+        test,
+        prd_trn,
+        prd_tst,
+        observations=[f"best model using win={best_params['params']})"],
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+        study=study,
+    )
 
@@ -1,14 +1,15 @@
 from pandas import DataFrame, Series
 from numpy import arange
 from models import LinearRegression
-from pipelines.tasks import prepare, save_report
+from pipelines.tasks import REPORT_OPTIONS, prepare, save_report
 # from pipelines.tasks.prepare import prepare
 # from pipelines.tasks.report import save_report
 from utils import get_options_with_default
 
 DEFAULT_LINEAR_REGRESSION_OPTS = {
     'training_pct': 0.8,
-    'smoothing': False
+    'smoothing': False,
+    **REPORT_OPTIONS,
 }
 
 
@@ -43,16 +44,15 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     print(f'Coef: {model.coef_[0]:.2f}')
 
     # Save results to `path`
-    if path:
-        save_report(
-            'linear-regression',
-            target,
-            train,
-            test,
-            prd_trn,
-            prd_tst,
-            observations=[f'Intercept: {model.intercept_:.2f}', f'Coef: {model.coef_[0]:.2f}'],
-            path=path
-        )
-
-    return train, test, prd_trn, prd_tst
+    return save_report(
+        'linear-regression',
+        target,
+        train,
+        test,
+        prd_trn,
+        prd_tst,
+        observations=[f'Intercept: {model.intercept_:.2f}', f'Coef: {model.coef_[0]:.2f}'],
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+    )
@@ -6,19 +6,19 @@ from pandas import DataFrame, Series, read_csv
 from pipelines.tasks.prepare import prepare
 from models import DS_LSTM_Exog, prepare_dataset_for_lstm_exog
 from utils import get_options_with_default
-from pipelines.tasks import prepare, save_report, evaluate
-from dslabs import DELTA_IMPROVE, plot_line_chart, HEIGHT
-from matplotlib.pyplot import figure, subplots
-from dslabs import DELTA_IMPROVE, plot_forecasting_series, plot_line_chart, HEIGHT, FORECAST_MEASURES, plot_multiline_chart
+from pipelines.tasks import REPORT_OPTIONS, prepare, save_report
+from pipelines.tasks.evaluate import DELTA_IMPROVE, get_target_stats, score_forecasts
 from copy import deepcopy
 from utils import log_execution_time
 from transformation import smoothing
-import matplotlib.pyplot as plt
 
 DEFAULT_LSTM_OPTIONS = {
     'training_pct': 0.8,
     'smoothing': False,
-    'optimize_for': 'R2'  # or MAPE
+    'optimize_for': 'R2',  # or MAPE
+    # Exogenous variables, 'ambient_temperature' needs `preprocess(..., weather_provider=...)`.
+    'exogenous': ['system_grid_session_duration', 'system_battery_soc'],
+    **REPORT_OPTIONS,
 }
 
 def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
@@ -26,7 +26,8 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     options = get_options_with_default(options, DEFAULT_LSTM_OPTIONS)
 
     # Create target dir if it doesn't exist
-    os.makedirs(path, exist_ok=True)
+    if path:
+        os.makedirs(path, exist_ok=True)
 
     print('\n-- LSTM --')
     print(f'target: {target}')
@@ -45,7 +46,7 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     np_train = train.values.astype('float32')
     np_test = test.values.astype('float32')
 
-    cols = ['system_battery_max_temperature', 'system_grid_session_duration', 'system_battery_soc']
+    cols = [target, *options['exogenous']]
     series = df[cols].values.astype("float32")
     train_size = int(len(series) * 0.80)
     train, test = series[:train_size], series[train_size:]
@@ -64,7 +65,7 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     # model.predict(tensor_x)
     # print(loss)
 
-    best_model, best_params = lstm_study(np_train, np_test, nr_episodes=1000, measure=metric, path=path)
+    best_model, best_params, study = lstm_study(np_train, np_test, nr_episodes=1000, measure=metric, path=path, stats=get_target_stats(options['scaler'], target))
 
     params = best_params["params"]
     best_length = params[0]
@@ -80,21 +81,23 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     
 
     # Save results to `path`
-    if path:
-        save_report(
-            f'lstm-{metric}',
-            target,
-            df[target][best_length:train_size],
-            df[target][train_size+best_length:],
-            prd_trn,
-            prd_tst,
-            observations=[f"{params}"],
-            path=path
-        )
+    return save_report(
+        f'lstm-{metric}',
+        target,
+        df[target][best_length:train_size],
+        df[target][train_size+best_length:],
+        prd_trn,
+        prd_tst,
+        observations=[f"{params}"],
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+        study=study,
+    )
 
 
 @log_execution_time
-def lstm_study(train, test, nr_episodes: int = 1000, measure: str = "R2", path='temp/'):
+def lstm_study(train, test, nr_episodes: int = 1000, measure: str = "R2", path='temp/', stats=None):
     sequence_size = [6, 8, 12]
     nr_hidden_units = [2, 10, 25]
 
@@ -106,8 +109,7 @@ def lstm_study(train, test, nr_episodes: int = 1000, measure: str = "R2", path='
     best_params: dict = {"name": "LSTM", "metric": measure, "params": ()}
     best_performance: float = -100000
 
-    fig, axs = subplots(1, len(sequence_size), figsize=(len(sequence_size) * HEIGHT, HEIGHT))
-    # ax_test.plot(test.ravel(), label='test')
+    charts = []
 
     for i in range(len(sequence_size)):
         length = sequence_size[i]
@@ -123,9 +125,11 @@ def lstm_study(train, test, nr_episodes: int = 1000, measure: str = "R2", path='
                 if n in episodes:
                     model.eval()  # Set model to evaluation mode
                     with torch.no_grad(): 
-                        to_test = deepcopy(model)
-                        prd_tst = to_test.predict(tstX)
-                    eval: float = FORECAST_MEASURES[measure](test[length:], prd_tst)
+                        prd_tst = model.predict(tstX)
+
+                    # Checkpoints are scored as they're taken, so that only the
+                    # best model so far is copied.
+                    eval: float = score_forecasts(test[length:], [prd_tst], stats)[measure][0]
                     print(f"seq length={length} hidden_units={hidden} nr_episodes={n}", eval)
                     if eval > best_performance and abs(eval - best_performance) > DELTA_IMPROVE:
                         best_performance: float = eval
@@ -133,19 +137,18 @@ def lstm_study(train, test, nr_episodes: int = 1000, measure: str = "R2", path='
                         best_model = deepcopy(model)
                     yvalues.append(eval)
             values[hidden] = yvalues
-        plot_multiline_chart(
-            episodes,
-            values,
-            ax=axs[i],
-            title=f"LSTM seq length={length} ({measure})",
-            xlabel="nr episodes",
-            ylabel=measure,
-            percentage=flag,
-        )
+        charts.append({'title': f"LSTM seq length={length} ({measure})", 'values': values})
     print(
         f'LSTM best results achieved with length={best_params["params"][0]} hidden_units={best_params["params"][1]} and nr_episodes={best_params["params"][2]}) ==> measure={best_performance:.2f}'
     )
-    # mby savefig
-    fig.savefig(f'{path}/lstm-study.png')
-    return best_model, best_params
+    study = {
+        'file': 'lstm-study.png',
+        'xvalues': episodes,
+        'xlabel': "nr episodes",
+        'ylabel': measure,
+        'percentage': flag,
+        'ylim': None,
+        'charts': charts,
+    }
+    return best_model, best_params, study
 
@@ -1,13 +1,14 @@
 import os
 from pandas import DataFrame, Series
 from models import PersistenceOptimistRegressor
-from pipelines.tasks import prepare, save_report
+from pipelines.tasks import REPORT_OPTIONS, prepare, save_report
 from utils import get_options_with_default
 
 
 DEFAULT_PERSISTENCE_OPT_REGRESSOR_OPTIONS = {
     'training_pct': 0.8,
     'smoothing': False,
+    **REPORT_OPTIONS,
 }
 
 
@@ -16,7 +17,8 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     options = get_options_with_default(options, DEFAULT_PERSISTENCE_OPT_REGRESSOR_OPTIONS)
 
     # Create target dir if it doesn't exist
-    os.makedirs(path, exist_ok=True)
+    if path:
+        os.makedirs(path, exist_ok=True)
 
     print('\n-- Persistence Optimistic Regressor --')
     print(f'target: {target}')
@@ -34,13 +36,14 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     prd_tst: Series = fr_mod.predict(test)
 
     # Save results to `path`
-    if path:
-        save_report(
-            'persistence-one-step-behind',
-            target,
-            train,
-            test,
-            prd_trn,
-            prd_tst,
-            path=path
-        )
+    return save_report(
+        'persistence-one-step-behind',
+        target,
+        train,
+        test,
+        prd_trn,
+        prd_tst,
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+    )
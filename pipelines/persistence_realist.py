@@ -1,13 +1,14 @@
 from pandas import DataFrame, Series
 from models import PersistenceRealistRegressor
 from pipelines.tasks.prepare import prepare
-from pipelines.tasks.report import save_report
+from pipelines.tasks.report import REPORT_OPTIONS, save_report
 from utils import get_options_with_default
 
 
 DEFAULT_PERSISTENCE_REALISTIC_OPTIONS = {
     'training_pct': 0.8,
     'smoothing': False,
+    **REPORT_OPTIONS,
 }
 
 
@@ -35,13 +36,14 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     print(f'Prediction: {prd_tst.iloc[0]:.2f}')
 
     # Save results to `path`
-    if path:
-        save_report(
-            'persistence-long-term',
-            target,
-            train,
-            test,
-            prd_trn,
-            prd_tst,
-            path=path
-        )
+    return save_report(
+        'persistence-long-term',
+        target,
+        train,
+        test,
+        prd_trn,
+        prd_tst,
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+    )
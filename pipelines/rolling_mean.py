@@ -2,15 +2,15 @@ from pandas import DataFrame, Series
 from pipelines.tasks.prepare import prepare
 from models import RollingMeanRegressor
 from utils import get_options_with_default
-from pipelines.tasks import prepare, save_report, evaluate
-from dslabs import DELTA_IMPROVE, plot_line_chart, HEIGHT
-from matplotlib.pyplot import figure
+from pipelines.tasks import REPORT_OPTIONS, prepare, save_report
+from pipelines.tasks.evaluate import DELTA_IMPROVE, get_target_stats, score_forecasts
 
 
 DEFAULT_ROLLING_MEAN_OPTIONS = {
     'training_pct': 0.8,
     'smoothing': False,
-    'optimize_for': 'R2'  # MAPE
+    'optimize_for': 'R2',  # MAPE
+    **REPORT_OPTIONS,
 }
 
 
@@ -31,43 +31,49 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     metric = options['optimize_for']
     best_result: dict = {"metric": metric, "params": (), "predicted_test": None, "predicted_train": None, "perf": -10000}
 
-    yvalues = []
-    for w in win_size:
-        pred = RollingMeanRegressor(win=w)
+    models = [RollingMeanRegressor(win=w) for w in win_size]
+    predictions = []
+    for pred in models:
         pred.fit(train)
-        prd_train = pred.predict(train)
-        prd_test = pred.predict(test)
+        predictions.append((pred.predict(train), pred.predict(test)))
 
-        metrics: dict = evaluate(train, test, prd_train, prd_test)
-        eval: float = metrics['test'][metric]
+    # All the candidates are scored together.
+    scores = score_forecasts(test, [prd_test for (_, prd_test) in predictions], get_target_stats(options['scaler'], target))[metric]
+    yvalues = []
+    for (i, w) in enumerate(win_size):
+        eval: float = round(float(scores[i]), 2)
         if eval > best_result["perf"] and abs(eval - best_result["perf"]) > DELTA_IMPROVE:
             best_result["perf"] = eval
             best_result["params"] = (w,)
-            best_result["predicted_test"] = prd_test
-            best_result["predicted_train"] = prd_train
-            best_result["model"] = pred
+            best_result["predicted_test"] = predictions[i][1]
+            best_result["predicted_train"] = predictions[i][0]
+            best_result["model"] = models[i]
         yvalues.append(eval)
         print(f"w={w} got {eval}")
 
     print(f"Best model using win={best_result['params'][0]} ({win_size})")
 
+    study = {
+        'file': f"rolling-mean-parameter-tuning-for-{metric}.png",
+        'xvalues': win_size,
+        'xlabel': "window size",
+        'ylabel': metric,
+        'percentage': True,
+        'ylim': (-3, 1),
+        'charts': [{'title': f"Rolling Mean ({metric})", 'values': yvalues}],
+    }
+
     # Save results to `path`
-    if path:
-        save_report(
-            f'rolling-mean-{metric}-win={best_result["params"][0]}',
-            target,
-            train,
-            test,
-            best_result['predicted_train'],
-            best_result['predicted_test'],
-            observations=[f"best model using win={best_result['params'][0]} ({win_size})"],
-            path=path
-        )
-    
-    fig = figure(figsize=(3 * HEIGHT, HEIGHT))
-    ax = plot_line_chart(
-        win_size, yvalues, title=f"Rolling Mean ({metric})", xlabel="window size", ylabel=metric, percentage=True
+    return save_report(
+        f'rolling-mean-{metric}-win={best_result["params"][0]}',
+        target,
+        train,
+        test,
+        best_result['predicted_train'],
+        best_result['predicted_test'],
+        observations=[f"best model using win={best_result['params'][0]} ({win_size})"],
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+        study=study,
     )
-    ax.set_ylim(-3, 1)
-    fig.tight_layout()
-    fig.savefig(f"{path}/rolling-mean-parameter-tuning-for-{metric}.png")
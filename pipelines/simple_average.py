@@ -1,13 +1,14 @@
 from pandas import DataFrame, Series
 from pipelines.tasks.prepare import prepare
 from models import SimpleAvgRegressor
-from pipelines.tasks.report import save_report
+from pipelines.tasks.report import REPORT_OPTIONS, save_report
 from utils import get_options_with_default
 
 
 DEFAULT_SIMPLE_AVERAGE_OPTIONS = {
     'training_pct': 0.8,
-    'smoothing': False
+    'smoothing': False,
+    **REPORT_OPTIONS,
 }
 
 
@@ -35,14 +36,15 @@ def run(df: DataFrame, target: str, options: dict|None= None, path='temp/'):
     print(f'Prediction: {prd_tst.iloc[0]:.2f}')
 
     # Save results to `path`
-    if path:
-        save_report(
-            'simple-average',
-            target,
-            train,
-            test,
-            prd_trn,
-            prd_tst,
-            path=path
-        )
+    return save_report(
+        'simple-average',
+        target,
+        train,
+        test,
+        prd_trn,
+        prd_tst,
+        path=path,
+        plot=options['plot'],
+        scaler=options['scaler'],
+    )
     
\ No newline at end of file
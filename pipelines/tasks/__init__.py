@@ -1,4 +1,4 @@
 from .prepare import prepare 
 from .transform import transform 
 from .evaluate import evaluate
-from .report import save_report
+from .report import REPORT_OPTIONS, save_report, load_results, plot_results
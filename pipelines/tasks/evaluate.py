@@ -1,31 +1,16 @@
-from math import sqrt
-from sklearn.metrics import (
-    mean_squared_error,
-    mean_absolute_error,
-    mean_absolute_percentage_error,
-    r2_score,
-)
-from dslabs import plot_forecasting_series_on_ax
-from pipelines import linear_regression
+import numpy as np
+import pandas as pd
+
+# Gain over the best metric so far for a candidate model to replace it, as in `dslabs`.
+DELTA_IMPROVE: float = 0.001
+
 
 def evaluate(train=None, test=None, predicted_train=None, predicted_test=None):
-    test = {
-        "RMSE": round(sqrt(mean_squared_error(test, predicted_test)), 2),
-        "MAE": round(mean_absolute_error(test, predicted_test), 2),
-        "MAPE": round(mean_absolute_percentage_error(test, predicted_test), 2),
-        "R2": round(r2_score(test, predicted_test), 2),
-    }
+    test = round_metrics(score_forecasts(test, [predicted_test]))
 
     if predicted_train is not None:
         return {
-            "train": {
-                "RMSE": round(sqrt(mean_squared_error(train, predicted_train)), 2),
-                "MAE": round(mean_absolute_error(train, predicted_train), 2),
-                "MAPE": round(
-                    mean_absolute_percentage_error(train, predicted_train), 2
-                ),
-                "R2": round(r2_score(train, predicted_train), 2),
-            },
+            "train": round_metrics(score_forecasts(train, [predicted_train])),
             "test": test,
         }
 
@@ -34,8 +19,146 @@ def evaluate(train=None, test=None, predicted_train=None, predicted_test=None):
     }
 
 
-def compare_with_linear_reg(df, target, ax=None, plot_subtitle=""):
-    train, test, predicted_train, predicted_test = linear_regression.run(df, target, path=None)
+def forecast_metrics(truth: np.ndarray, predictions: np.ndarray, mask: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    """RMSE, MAE, MAPE and R2 of every row of `predictions`, computed as sklearn
+    does but for all rows at once.
+
+    Args:
+        truth (ndarray): observed values, one row per prediction row or a single
+            row shared by all of them.
+        predictions (ndarray): one row of predictions per candidate.
+        mask (ndarray | None, optional): values of each row to evaluate.
+            Defaults to None, all of them.
+
+    Returns:
+        dict: metric name to an array with a value per row.
+    """
+    truth = np.asarray(truth, dtype=np.float64)
+    predictions = np.atleast_2d(np.asarray(predictions, dtype=np.float64))
+    mask = np.ones(predictions.shape, dtype=bool) if mask is None else np.broadcast_to(mask, predictions.shape)
+    count = mask.sum(axis=-1)
+
+    errors = np.where(mask, np.abs(truth - predictions), 0.0)
+    squares = (errors * errors).sum(axis=-1)
+    # As sklearn, relative errors are taken over max(|truth|, eps).
+    relative = np.where(mask, errors / np.maximum(np.abs(truth), np.finfo(np.float64).eps), 0.0)
+
+    means = np.where(mask, truth, 0.0).sum(axis=-1) / count
+    deviations = np.where(mask, truth - means[..., None], 0.0)
+    variance = (deviations * deviations).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Constant truth scores 1 when perfectly predicted and 0 otherwise.
+        r2 = np.where(variance > 0, 1 - squares / variance, np.where(squares == 0, 1.0, 0.0))
+
+    return {
+        'RMSE': np.sqrt(squares / count),
+        'MAE': errors.sum(axis=-1) / count,
+        'MAPE': relative.sum(axis=-1) / count,
+        'R2': r2,
+    }
+
+
+def score_forecasts(truth, predictions, stats: tuple | None = None) -> dict[str, np.ndarray]:
+    """`forecast_metrics` of every candidate forecast against `truth`.
+
+    Args:
+        truth (Series | ndarray): observed values.
+        predictions (list | ndarray): forecasts of the same length as `truth`
+            (Series, arrays or tensors), or a candidates x horizon matrix.
+        stats (tuple | None, optional): mean and scale `truth` and `predictions`
+            were standard scaled with (see `get_target_stats`), metrics are then
+            computed in the original units. Defaults to None.
+
+    Returns:
+        dict: metric name to an array with a value per candidate.
+    """
+    truth = np.ravel(np.asarray(truth, dtype=np.float64))
+    predictions = np.stack([np.ravel(np.asarray(prediction, dtype=np.float64)) for prediction in predictions])
+    if predictions.shape[1] != len(truth):
+        raise ValueError(f'Forecasts of {predictions.shape[1]} values for {len(truth)} observations')
+    if stats is not None:
+        (mean, scale) = stats
+        truth = truth * scale + mean
+        predictions = predictions * scale + mean
+    return forecast_metrics(truth, predictions)
+
+
+def get_target_stats(scaler, target: str) -> tuple | None:
+    """Mean and scale of `target` in `scaler` (an IncrementalScaler), for
+    `score_forecasts`. None when the data wasn't scaled."""
+    if scaler is None:
+        return None
+    (means, scales) = scaler.get_stats([target])
+    return (float(means[0]), float(scales[0]))
+
+
+def fit_linear_trends(data: pd.DataFrame, training_pct: float = 0.8) -> dict:
+    """Fit a linear trend on the time index of every column of `data`, as
+    `pipelines.linear_regression.run` does for one target: the first
+    `training_pct` of the column's values (missing ones are dropped) are the
+    train set, the position of each value is its only feature.
+
+    Fits are ordinary least squares in closed form, on the centered positions,
+    for all the columns at once.
+
+    Args:
+        data (DataFrame): one column per variant to fit.
+        training_pct (float, optional): Defaults to 0.8.
+
+    Returns:
+        dict: `intercept`, `slope` and train `size` arrays with a value per
+            column, and the `train` and `test` metrics of `forecast_metrics`.
+    """
+    values = data.to_numpy(dtype=np.float64, na_value=np.nan).T
+    valid = ~np.isnan(values)
+    positions = np.cumsum(valid, axis=1) - 1
+    size = np.floor(valid.sum(axis=1) * training_pct)
+    train = valid & (positions < size[:, None])
+    test = valid & (positions >= size[:, None])
+
+    # Positions of the train set are 0..size-1, centered on their mean.
+    centered = np.where(train, positions - (size[:, None] - 1) / 2, 0.0)
+    filled = np.where(train, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (centered * filled).sum(axis=1) / (size * (size * size - 1) / 12)
+        slope = np.where(size > 1, slope, 0.0)
+        intercept = filled.sum(axis=1) / size - slope * (size - 1) / 2
+
+    predictions = intercept[:, None] + slope[:, None] * positions
+    return {
+        'intercept': intercept,
+        'slope': slope,
+        'size': size.astype(np.int64),
+        'train': forecast_metrics(values, predictions, train),
+        'test': forecast_metrics(values, predictions, test),
+    }
+
+
+def round_metrics(metrics: dict[str, np.ndarray], row: int = 0) -> dict[str, float]:
+    """Metrics of one row of `forecast_metrics`, rounded as `evaluate` does."""
+    return {metric: round(float(values[row]), 2) for (metric, values) in metrics.items()}
+
+
+def get_trend_metrics(data: pd.DataFrame, training_pct: float = 0.8) -> dict[str, dict]:
+    """Metrics of the linear trend of every column of `data`, in the format of
+    `evaluate`."""
+    trends = fit_linear_trends(data, training_pct)
+    return {
+        col: {'train': round_metrics(trends['train'], i), 'test': round_metrics(trends['test'], i)}
+        for (i, col) in enumerate(data.columns)
+    }
+
+
+def plot_linear_trend(series: pd.Series, trends: dict, row: int = 0, ax=None, plot_subtitle=""):
+    """Plot the test forecast of the trend in `row` of `fit_linear_trends`,
+    fitted on `series`."""
+    # Imported here so that the pipelines can run without loading matplotlib.
+    from dslabs import plot_forecasting_series_on_ax
+
+    series = series.dropna()
+    size = trends['size'][row]
+    train, test = series.iloc[:size], series.iloc[size:]
+    predicted_test = pd.Series(trends['intercept'][row] + trends['slope'][row] * np.arange(size, len(series)), index=test.index)
     plot_forecasting_series_on_ax(
         train,
         test,
@@ -45,4 +168,12 @@ def compare_with_linear_reg(df, target, ax=None, plot_subtitle=""):
         xlabel=train.index.name,
         ylabel=""
     )
-    return evaluate(train, test, predicted_train, predicted_test)
+
+
+def compare_with_linear_reg(df, target, ax=None, plot_subtitle=""):
+    """Fit a linear trend on `target` with `fit_linear_trends`, plot its forecast
+    of the test set on `ax` and return its metrics, as `evaluate` would.
+    """
+    trends = fit_linear_trends(df[[target]])
+    plot_linear_trend(df[target], trends, ax=ax, plot_subtitle=plot_subtitle)
+    return {'train': round_metrics(trends['train']), 'test': round_metrics(trends['test'])}
@@ -0,0 +1,96 @@
+"""Figures of the pipelines, drawn from the results they return (see
+`report.get_results`), so that runs without plots can be rendered later on.
+"""
+from matplotlib.pyplot import figure, savefig, subplots
+from dslabs import (
+    HEIGHT,
+    plot_forecasting_series,
+    plot_line_chart,
+    plot_multibar_chart,
+    plot_multiline_chart,
+)
+
+
+def plot_forecasting_eval(metrics: dict, title: str = ""):
+    """Same chart as `dslabs.plot_forecasting_eval`, from the train and test
+    metrics of `score_forecasts` instead of recomputing them."""
+    ev1 = {metric: [metrics['train'][metric][0], metrics['test'][metric][0]] for metric in ['RMSE', 'MAE']}
+    ev2 = {metric: [metrics['train'][metric][0], metrics['test'][metric][0]] for metric in ['MAPE', 'R2']}
+
+    fig, axs = subplots(1, 2, figsize=(1.5 * HEIGHT, 0.75 * HEIGHT), squeeze=True)
+    fig.suptitle(title)
+    plot_multibar_chart(["train", "test"], ev1, ax=axs[0], title="Scale-dependent error", percentage=False)
+    plot_multibar_chart(["train", "test"], ev2, ax=axs[1], title="Percentage error", percentage=True)
+    return axs
+
+
+def plot_study(study: dict):
+    """Parameter tuning curves of a study: one chart per entry of `study['charts']`,
+    with a line of scores, or a line per parameter value if a dict of them.
+
+    Args:
+        study (dict): `xvalues`, `xlabel`, `ylabel`, `percentage`, `ylim` (None to
+            keep the default limits) and `charts`, a list of `title` and `values`.
+
+    Returns:
+        Figure
+    """
+    charts = study['charts']
+    if len(charts) == 1 and not isinstance(charts[0]['values'], dict):
+        fig = figure(figsize=(3 * HEIGHT, HEIGHT))
+        axs = [plot_line_chart(
+            study['xvalues'],
+            charts[0]['values'],
+            title=charts[0]['title'],
+            xlabel=study['xlabel'],
+            ylabel=study['ylabel'],
+            percentage=study['percentage'],
+        )]
+    else:
+        fig, axs = subplots(1, len(charts), figsize=(len(charts) * HEIGHT, HEIGHT), squeeze=False)
+        axs = [
+            plot_multiline_chart(
+                study['xvalues'],
+                chart['values'],
+                ax=ax,
+                title=chart['title'],
+                xlabel=study['xlabel'],
+                ylabel=study['ylabel'],
+                percentage=study['percentage'],
+            )
+            for (chart, ax) in zip(charts, axs[0])
+        ]
+
+    if study['ylim'] is not None:
+        for ax in axs:
+            ax.set_ylim(*study['ylim'])
+    fig.tight_layout()
+    return fig
+
+
+def plot_results(results: dict, path='temp/', title=""):
+    """Save the figures of a pipeline run to `path`: the evaluation metrics, the
+    forecast of the test set and, if any, the parameter study.
+
+    Args:
+        results (dict): as returned by `report.get_results`.
+        path (str, optional): Defaults to 'temp/'.
+        title (str, optional): Prefix of the evaluation chart title. Defaults to "".
+    """
+    model, target = results['model'], results['target']
+    plot_forecasting_eval(results['metrics'], title=f"{title} {target} ({model})")
+    savefig(f"{path}/{model}-{target}-eval.png")
+
+    plot_forecasting_series(
+        results['train'],
+        results['test'],
+        results['predicted_test'],
+        title=f"{target} - {model}",
+        xlabel=results['train'].index.name,
+        ylabel=target,
+    )
+    savefig(f"{path}/{model}-{target}-forecast.png")
+
+    if results['study'] is not None:
+        fig = plot_study(results['study'])
+        fig.savefig(f"{path}/{results['study']['file']}")
@@ -2,7 +2,7 @@ import pandas as pd
 from typing import TypedDict, Optional
 from utils import get_options_with_default
 from preprocess import aggregation_func_by_col
-from dslabs import series_train_test_split, dataframe_temporal_train_test_split
+from preprocess.sparse import SparseFrame
 from transformation import smoothing
 
 
@@ -17,6 +17,23 @@ DEFAULT_PREPARE_OPTIONS : PrepareOptions = {
 }
 
 
+# Same as the `dslabs` splits, which can't be imported without matplotlib.
+def series_train_test_split(data: pd.Series, trn_pct: float = 0.90) -> tuple[pd.Series, pd.Series]:
+    trn_size: int = int(len(data) * trn_pct)
+    df_cp: pd.Series = data.copy()
+    train: pd.Series = df_cp.iloc[:trn_size, 0]
+    test: pd.Series = df_cp.iloc[trn_size:, 0]
+    return train, test
+
+
+def dataframe_temporal_train_test_split(data: pd.DataFrame, trn_pct: float = 0.90) -> tuple[pd.DataFrame, pd.DataFrame]:
+    trn_size: int = int(len(data) * trn_pct)
+    df_cp: pd.DataFrame = data.copy()
+    train: pd.DataFrame = df_cp.iloc[:trn_size]
+    test: pd.DataFrame = df_cp.iloc[trn_size:]
+    return train, test
+
+
 def prepare(data, options: PrepareOptions = DEFAULT_PREPARE_OPTIONS.copy()):
     """Prepare `df` dataset as described in `options`. Preparation includes applying
     smoothing and separating in train and test sets.
@@ -34,6 +51,14 @@ def prepare(data, options: PrepareOptions = DEFAULT_PREPARE_OPTIONS.copy()):
     train = None
     test = None
 
+    # Smoothing is causal, so smoothing the whole sparse frame and keeping the
+    # training rows is the same as smoothing the training set.
+    smoothed = None
+    if isinstance(data, SparseFrame):
+        if 'smoothing' in options and options['smoothing']:
+            smoothed = smoothing.run(data, window=options['smoothing']['window'])
+        data = data.to_dense()
+
     if type(data) == pd.Series:
         train, test = series_train_test_split(data=data, trn_pct=options['training_pct'])
     elif type(data) == pd.DataFrame:
@@ -42,7 +67,10 @@ def prepare(data, options: PrepareOptions = DEFAULT_PREPARE_OPTIONS.copy()):
         raise(f'Unsupported data type {type(data)}')
 
     # Smooth on training set
-    if 'smoothing' in options and options['smoothing']:
+    if smoothed is not None:
+        train = smoothed.to_dense().reindex(train.index)
+        train = train.iloc[options['smoothing']['window']-1:].copy()
+    elif 'smoothing' in options and options['smoothing']:
         train = smoothing.run(train, window=options['smoothing']['window'])
         train = train.iloc[options['smoothing']['window']-1:].copy()
 
@@ -1,48 +1,115 @@
 import os
-from matplotlib.pyplot import savefig
-from dslabs import (
-    plot_forecasting_series,
-    plot_forecasting_eval,
-)
-from .evaluate import evaluate
-
-def save_report(model, target, train, test, predicted_train, predicted_test, observations=[], path='temp/', title=""):
-    # Create target dir if it doesn't exist
-    os.makedirs(path, exist_ok=True)
-    
-    # Get evaluation metrics
-    results = evaluate(train, test, predicted_train, predicted_test)
-    for metric, value in results['test'].items():
-        print(f'{metric}:\t{value}')
-    
-    # Plot forecast
-    plot_forecasting_eval(
-        train, test, predicted_train, predicted_test, title=f"{title} {target} ({model})"
-    )
-    savefig(f"{path}/{model}-{target}-eval.png")
-
-    plot_forecasting_series(
-        train,
-        test,
-        predicted_test,
-        title=f"{target} - {model}",
-        xlabel=train.index.name,
-        ylabel=target,
-    )
-    savefig(f"{path}/{model}-{target}-forecast.png")
-
-    # Save metrics
+import pickle
+from .evaluate import round_metrics, score_forecasts
+
+
+# Options of `save_report` that every pipeline takes, merged into their defaults.
+REPORT_OPTIONS = {
+    # False to only compute the metrics, figures can be drawn later with `plot_results`.
+    'plot': True,
+    # IncrementalScaler the data was standard scaled with, forecasts are then
+    # scored and plotted in the units of the target.
+    'scaler': None,
+}
+
+
+def get_results(model, target, train, test, predicted_train, predicted_test, observations=[], study=None) -> dict:
+    """Structured results of a pipeline run: everything its report is written and
+    its figures are drawn from.
+
+    Args:
+        model (str): name of the model, used in file names.
+        target (str): forecasted column.
+        train, test (Series): observed values.
+        predicted_train, predicted_test (Series): forecasts of the model.
+        observations (list, optional): lines added to the report. Defaults to [].
+        study (dict | None, optional): parameter tuning curves, see
+            `figures.plot_study`. Defaults to None.
+
+    Returns:
+        dict: the arguments plus `metrics`, the `score_forecasts` of the train and
+            test sets, and `results`, their rounded values.
+    """
+    metrics = {
+        'train': score_forecasts(train, [predicted_train]),
+        'test': score_forecasts(test, [predicted_test]),
+    }
+    return {
+        'model': model,
+        'target': target,
+        'train': train,
+        'test': test,
+        'predicted_train': predicted_train,
+        'predicted_test': predicted_test,
+        'observations': observations,
+        'study': study,
+        'metrics': metrics,
+        'results': {dataset: round_metrics(values) for (dataset, values) in metrics.items()},
+    }
+
+
+def write_results(results: dict, path='temp/'):
+    """Write the metrics report of `results` and pickle them, so that their figures
+    can be drawn later with `plot_results(load_results(...))`."""
+    model, target, train = results['model'], results['target'], results['train']
     with open(f'{path}/{model}-{target}-run.txt', 'w') as f:
         f.write(f'target: {target}\n')
         f.write(f'start: {train.index[0]}\n')
         f.write(f'end: {train.index[-1]}\n')
         f.write('\n\n')
         f.write('# Metrics Train\n')
-        f.write('\n'.join([f'{metric}: {value}' for (metric, value) in results['train'].items()]))
+        f.write('\n'.join([f'{metric}: {value}' for (metric, value) in results['results']['train'].items()]))
         f.write('\n\n')
         f.write('# Metrics Test\n')
-        f.write('\n'.join([f'{metric}: {value}' for (metric, value) in results['test'].items()]))
-        if len(observations) > 0:
+        f.write('\n'.join([f'{metric}: {value}' for (metric, value) in results['results']['test'].items()]))
+        if len(results['observations']) > 0:
             f.write('\n\n')
             f.write('# Observations\n')
-            f.write('\n'.join([obs for obs in observations]))
+            f.write('\n'.join([obs for obs in results['observations']]))
+
+    with open(f'{path}/{model}-{target}-results.pkl', 'wb') as f:
+        pickle.dump(results, f)
+
+
+def load_results(file: str) -> dict:
+    with open(file, 'rb') as f:
+        return pickle.load(f)
+
+
+def plot_results(results: dict, path='temp/', title=""):
+    """Save the figures of `results` to `path`, see `figures.plot_results`."""
+    # Imported here, runs without plots don't load the figures.
+    from .figures import plot_results as plot_figures
+    plot_figures(results, path=path, title=title)
+
+
+def save_report(model, target, train, test, predicted_train, predicted_test, observations=[], path='temp/', title="", plot=True, study=None, scaler=None) -> dict:
+    """Evaluate the forecasts of a pipeline run, write the report to `path` (unless
+    None) and, if `plot`, its figures.
+
+    When the data was standard scaled, `scaler` (an IncrementalScaler) brings the
+    observed and forecasted values back to the units of `target` before they are
+    scored and plotted, and is saved next to the report.
+
+    Returns:
+        dict: results of the run, see `get_results`.
+    """
+    if scaler is not None:
+        (train, test, predicted_train, predicted_test) = [
+            scaler.inverse_transform(values, col=target) for values in [train, test, predicted_train, predicted_test]
+        ]
+
+    results = get_results(model, target, train, test, predicted_train, predicted_test, observations, study)
+    for metric, value in results['results']['test'].items():
+        print(f'{metric}:\t{value}')
+
+    if path:
+        # Create target dir if it doesn't exist
+        os.makedirs(path, exist_ok=True)
+        if plot:
+            plot_results(results, path=path, title=title)
+        write_results(results, path=path)
+        if scaler is not None:
+            scaler.save(f'{path}/{model}-{target}-scaler.json')
+
+    return results
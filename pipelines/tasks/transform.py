@@ -1,7 +1,14 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
 from typing import TypedDict, Optional
-from transformation import scaling, aggregation, differentiation
+import pandas as pd
+from pyarrow import feather
+from transformation import scaling, aggregation, differentiation, fused as fused_engine
 from utils import get_options_with_default
 from preprocess import aggregation_func_by_col
+from preprocess.cache import fingerprint_frame
 
 
 class TransformationOptions(TypedDict):
@@ -16,31 +23,155 @@ DEFAULT_PREPARE_OPTIONS : TransformationOptions = {
     'differentiation': False,
 }
 
+# Order in which the transformation steps are applied.
+TRANSFORMATION_STEPS = ['scaling', 'aggregation', 'differentiation']
 
-def transform(df, options: TransformationOptions = DEFAULT_PREPARE_OPTIONS.copy()):
+# Memory used by the transform cache before least recently used results are evicted.
+TRANSFORM_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+
+def get_frame_nbytes(df) -> int:
+    if hasattr(df, 'observed'):
+        # SparseFrame, sized by every table it holds.
+        return sum(get_frame_nbytes(part) for part in [df.observed, df.gaps, df.fills])
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+class TransformCache:
+    """LRU cache of `transform` results, bounded by `max_bytes` of memory and
+    optionally backed by feather files in `cache_dir`.
+
+    Results are keyed by a fingerprint of the input frame plus the steps applied
+    to it, and every prefix of a chain of steps is cached. A later call that
+    extends a chain (e.g. scaling, then scaling and aggregation) only computes
+    the missing steps.
+
+    Frames are copied in and out of the cache, since some analyses modify the
+    frames they are given.
+
+    Args:
+        max_bytes (int, optional): Defaults to TRANSFORM_CACHE_MAX_BYTES.
+        cache_dir (str | None, optional): directory of the disk tier. Defaults to
+            None, caching in memory only.
+    """
+
+    def __init__(self, max_bytes: int = TRANSFORM_CACHE_MAX_BYTES, cache_dir: str | None = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.entries: OrderedDict[str, object] = OrderedDict()
+        self.nbytes = 0
+
+    @staticmethod
+    def get_key(data_key: str, steps: list[tuple[str, object]]) -> str:
+        payload = json.dumps({'data': data_key, 'steps': steps}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'transform-{key[:16]}.feather')
+
+    def get(self, key: str):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key].copy()
+
+        if self.cache_dir is not None and os.path.exists(self.get_path(key)):
+            df = feather.read_feather(self.get_path(key))
+            if isinstance(df.index, pd.DatetimeIndex) and len(df.index) >= 3:
+                df.index.freq = df.index.inferred_freq
+            self.put(key, df, persist=False)
+            return df.copy()
+        return None
+
+    def put(self, key: str, df, persist: bool = True):
+        nbytes = get_frame_nbytes(df)
+        if key in self.entries or nbytes > self.max_bytes:
+            return
+
+        self.entries[key] = df.copy()
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            (_, evicted) = self.entries.popitem(last=False)
+            self.nbytes -= get_frame_nbytes(evicted)
+
+        if persist and self.cache_dir is not None and isinstance(df, pd.DataFrame):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            feather.write_feather(df, self.get_path(key), compression='uncompressed')
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+transform_cache = TransformCache()
+
+
+def get_transformation_steps(options: TransformationOptions) -> list[tuple[str, object]]:
+    """Normalize `options` to the list of enabled steps, in the order they're applied."""
+    return [(step, options[step]) for step in TRANSFORMATION_STEPS if step in options and options[step]]
+
+
+def apply_transformation_step(df, step: str, params):
+    if step == 'scaling':
+        return scaling.run(df)
+
+    if step == 'aggregation':
+        agg_func = { k: v for (k,v) in aggregation_func_by_col.items() if k in df.columns }
+        return aggregation.run(df, gran_level=params['rule'], agg_funcs=agg_func)
+
+    if step == 'differentiation':
+        return differentiation.run(df)
+
+    raise ValueError(f'Unsupported transformation step {step}')
+
+
+def transform(df, options: TransformationOptions = DEFAULT_PREPARE_OPTIONS.copy(), cache: TransformCache | None = transform_cache, fused: bool = False):
     """Apply transformations to `df` as described in `options`.
 
+    Results of each prefix of the requested steps are kept in `cache`, so repeating
+    or extending a previous call on the same data reuses its results.
 
     Args:
         df (_type_): _description_
         options (dict | None, optional): _description_. Defaults to None.
+        cache (TransformCache | None, optional): Defaults to the shared
+            `transform_cache`, None disables caching.
+        fused (bool, optional): run the steps together on the underlying arrays
+            (see `transformation.fused`) instead of one after the other. Only
+            the result of the whole chain is then cached. Defaults to False.
 
     Returns:
         _type_: _description_
     """
     options = get_options_with_default(options, default=DEFAULT_PREPARE_OPTIONS)
+    steps = get_transformation_steps(options)
+    if cache is None or len(steps) == 0:
+        if fused and len(steps) > 0:
+            return fused_engine.run(df, steps)
+        for (step, params) in steps:
+            df = apply_transformation_step(df, step, params)
+        return df
 
-    # Scaling
-    if 'scaling' in options and options['scaling']:
-        df = scaling.run(df)
+    # Start from the longest chain of steps that was already computed.
+    data_key = fingerprint_frame(df)
+    keys = [cache.get_key(data_key, steps[:i + 1]) for i in range(len(steps))]
+    done = 0
+    for i in range(len(steps), 0, -1):
+        cached = cache.get(keys[i - 1])
+        if cached is not None:
+            df, done = cached, i
+            break
 
-    # Aggregation
-    if 'aggregation' in options and options['aggregation']:
-        agg_func = { k: v for (k,v) in aggregation_func_by_col.items() if k in df.columns }
-        df = aggregation.run(df, gran_level=options['aggregation']['rule'], agg_funcs=agg_func)
+    if done == len(steps):
+        print(f'transform reused cached {[step for (step, _) in steps]}')
+        return df
 
-    # Differentiation
-    if 'differentiation' in options and options['differentiation']:
-        df = differentiation.run(df)
+    if fused:
+        df = fused_engine.run(df, steps[done:])
+        cache.put(keys[-1], df)
+        return df
 
+    for i in range(done, len(steps)):
+        (step, params) = steps[i]
+        df = apply_transformation_step(df, step, params)
+        cache.put(keys[i], df)
     return df
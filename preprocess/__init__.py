@@ -1,38 +1,124 @@
 import pandas as pd
-from preprocess.meteo import add_meteo_station
+from preprocess.meteo import WeatherProvider, add_meteo_station, add_weather
+from preprocess.runs import run_cumsum
+from preprocess.interpolation import GapPolicy, fill_gaps
+from preprocess.sparse import SparseFrame
+
+# Records (not minutes) away from which missing `system_grid_available` values are filled.
+GRID_FILL_LIMIT = 120
+
+def fill_grid_available(grid: pd.Series) -> pd.Series:
+    """Fill missing `system_grid_available` records from neighbouring ones (up to
+    GRID_FILL_LIMIT records away) and assume the grid was not available for the
+    remaining gaps.
+    """
+    return grid.astype(float).ffill(limit=GRID_FILL_LIMIT).bfill(limit=GRID_FILL_LIMIT).fillna(0)
+
+
+def is_valid_record(df: pd.DataFrame) -> pd.Series:
+    """If battery_voltage is 0, then batteries are not properly communicating
+    their metrics, and such records should be dropped."""
+    return df['system_battery_voltage'] != 0
+
+
+def get_grid_session_duration(grid: pd.Series) -> pd.Series:
+    """Running sum of `grid` within each run of equal consecutive values, which counts
+    the records since the vehicle was plugged in (and is 0 while unplugged).
+    """
+    return pd.Series(run_cumsum(grid.to_numpy()), index=grid.index, name=grid.name)
 
-def preprocess(df: pd.DataFrame, datetime_col: str):
-    df[datetime_col] = pd.to_datetime(df[datetime_col], utc=True)
-    df['system_grid_available'] = df.system_grid_available.astype(float).ffill(limit=120).bfill(limit=120).fillna(0)
-    df['system_grid_session_duration'] = (
-        df.groupby((df['system_grid_available'] != df['system_grid_available'].shift(1)).cumsum())['system_grid_available'].cumsum()
-    )
 
-    df = df.sort_values(datetime_col)
+def regrid(df: pd.DataFrame, datetime_col: str, start: pd.Timestamp | None = None, dense: bool = True) -> pd.DataFrame:
+    """Index `df` by `datetime_col`, drop invalid and duplicated records and ensure
+    there's a row per minute.
+
+    Args:
+        df (DataFrame): raw records.
+        datetime_col (str): column with the record timestamps.
+        start (Timestamp | None, optional): first minute of the grid. Defaults to
+            the first record.
+        dense (bool, optional): add the missing minutes. Defaults to True, when
+            False only the valid records are returned.
+
+    Returns:
+        DataFrame: frame with a row per minute.
+    """
+    # Records merged by `preprocess.ingestion` are already in order.
+    if not df[datetime_col].is_monotonic_increasing:
+        df = df.sort_values(datetime_col, kind='stable')
     df = df.set_index(datetime_col)
 
-    # If battery_voltage is 0, then batteries are not properly communicating
-    # their metrics, and such records should be dropped.
-    df = df.loc[df['system_battery_voltage'] != 0]
+    df = df.loc[is_valid_record(df)]
 
     # Remove entries that duplicate the index, probably due to being in 
     # multiple csv's. 
-    df = df[~df.index.duplicated(keep='first')]
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated(keep='first')]
+
+    if not dense:
+        return df
 
     # Ensure df has an entry per minute using prefered
-    df = df.asfreq('min')
+    if start is None:
+        return df.asfreq('min')
+    return df.reindex(pd.date_range(start, df.index[-1], freq='min', name=df.index.name))
+
+
+def fill_missing_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Fill missing values of each column in `gap_policy_by_col`."""
+    for col, policy in gap_policy_by_col.items():
+        df[col] = fill_gaps(df[col], policy)
+    return df
 
-    # Fix target variable missing values. Assume 30 min old values are still good and interpolate
-    # for remaining gaps.
-    df['system_battery_max_temperature'] = df['system_battery_max_temperature'].bfill(limit=30).ffill(limit=30)
-    df['system_battery_max_temperature'] = df.system_battery_max_temperature.interpolate('cubic')
 
-    df['system_battery_soc'] = df['system_battery_soc'].bfill(limit=30).ffill(limit=30)
-    df['system_battery_soc'] = df.system_battery_soc.interpolate('linear')
+def add_ambient_temperature(df: pd.DataFrame, provider: WeatherProvider) -> pd.DataFrame:
+    """Join the temperature observed at the meteo station closest to each record,
+    as `ambient_temperature`, so that models can use it as an exogenous variable.
+    Records without coordinates get a missing value.
 
-    ## Add meteorology station to dataframe if it doesn't exist yet
-    # if 'station_code' not in df.columns:
-    #     df = add_meteo_station(df)
+    Args:
+        df (DataFrame): frame indexed by UTC time, with `latitude` and `longitude`.
+        provider (WeatherProvider): source of the hourly observations, e.g.
+            `meteostat_provider` or a `file_provider`.
+
+    Returns:
+        DataFrame: `df` with the `ambient_temperature` column.
+    """
+    df = add_weather(add_meteo_station(df), provider=provider)
+    # Station columns are strings, which the transformations can't handle.
+    return df.drop(columns=['station_id', 'station_code', 'station_name'])
+
+
+def preprocess(df: pd.DataFrame, datetime_col: str, sparse: bool = False, weather_provider: WeatherProvider | None = None):
+    """Clean raw telemetry records and resample them to a row per minute.
+
+    Args:
+        df (DataFrame): raw records, as read from the csv files.
+        datetime_col (str): column with the record timestamps.
+        sparse (bool, optional): return a SparseFrame, which doesn't materialise
+            the missing minutes. Defaults to False.
+        weather_provider (WeatherProvider | None, optional): when given, the
+            ambient temperature is joined from it, see `add_ambient_temperature`.
+            Defaults to None.
+
+    Returns:
+        DataFrame | SparseFrame: preprocessed minute frame.
+    """
+    df[datetime_col] = pd.to_datetime(df[datetime_col], utc=True)
+    df['system_grid_available'] = fill_grid_available(df['system_grid_available'])
+    df['system_grid_session_duration'] = get_grid_session_duration(df['system_grid_available'])
+
+    if sparse:
+        observed = regrid(df, datetime_col, dense=False)
+        if weather_provider is not None:
+            observed = add_ambient_temperature(observed, weather_provider)
+        return SparseFrame.from_observed(observed, gap_policy_by_col)
+
+    df = regrid(df, datetime_col)
+    df = fill_missing_values(df)
+
+    if weather_provider is not None:
+        df = add_ambient_temperature(df, weather_provider)
 
     return df
 
@@ -49,5 +135,15 @@ aggregation_func_by_col = {
     "system_fibo_temperature": "mean",
     "system_load_controller_igbt_temperature_1": "mean",
     "vehicle_speed_gps": "mean",
-    "system_grid_session_duration": "sum"
+    "system_grid_session_duration": "sum",
+    "ambient_temperature": "mean"
+}
+
+
+# How missing values are filled in each column once there's a row per minute.
+# For the target variable, assume 30 min old values are still good and interpolate
+# for remaining gaps.
+gap_policy_by_col: dict[str, GapPolicy] = {
+    "system_battery_max_temperature": { "method": "cubic", "bfill": 30, "ffill": 30, "max_gap": None },
+    "system_battery_soc": { "method": "linear", "bfill": 30, "ffill": 30, "max_gap": None },
 }
@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+
+CACHE_DIR = './data/cache'
+
+# Bump whenever `preprocess` changes its output so that stale caches are ignored.
+CACHE_VERSION = 2
+
+
+def fingerprint_files(paths: list[str]) -> list[dict]:
+    """Describe each file in `paths` by its path, size and modification time.
+
+    Args:
+        paths (list[str]): files to describe.
+
+    Returns:
+        list[dict]: one entry per file, in the same order as `paths`.
+    """
+    entries = []
+    for path in paths:
+        stat = os.stat(path)
+        entries.append({'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    return entries
+
+
+def fingerprint(paths: list[str], params: dict) -> str:
+    """Build a cache key from the source files and the parameters used to process them.
+    Any file being added, removed or modified results in a different key.
+
+    Args:
+        paths (list[str]): source csv files.
+        params (dict): json-serializable parameters that affect the output.
+
+    Returns:
+        str: hex digest identifying the cached frame.
+    """
+    payload = json.dumps(
+        {'version': CACHE_VERSION, 'files': fingerprint_files(paths), 'params': params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_cache_path(key: str, cache_dir: str = CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f'preprocessed-{key[:16]}.feather')
+
+
+def to_mappable_table(df: pd.DataFrame) -> pa.Table:
+    """Convert `df` to an Arrow table whose float columns keep NaN as values rather
+    than nulls: columns without nulls can be handed to pandas without a copy."""
+    table = pa.Table.from_pandas(df)
+    for i, name in enumerate(table.column_names):
+        if name in df.columns and df[name].dtype.kind == 'f':
+            table = table.set_column(i, name, pa.array(df[name].to_numpy(), from_pandas=False))
+    return table
+
+
+def read_cache(key: str, cache_dir: str = CACHE_DIR) -> pd.DataFrame | None:
+    """Load the frame stored under `key`, memory-mapping the file. The columns are
+    read-only views of the mapped file rather than copies (only the index is
+    materialized), so pages are read on access and the frame must be copied before
+    modifying it in place.
+
+    Args:
+        key (str): cache key as returned by `fingerprint`.
+        cache_dir (str, optional): Defaults to CACHE_DIR.
+
+    Returns:
+        DataFrame | None: cached frame or None when there is no entry for `key`.
+    """
+    path = get_cache_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    # One block per column, so that pandas doesn't consolidate them into a copy.
+    df = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+    df.index.freq = 'min'
+    print(f'read_cache loaded {df.shape} from {path}')
+    return df
+
+
+def write_cache(df: pd.DataFrame, key: str, cache_dir: str = CACHE_DIR):
+    """Store `df` under `key` as an uncompressed feather file in a single chunk,
+    see `to_mappable_table`, removing entries written for previous keys since those
+    can no longer be hit.
+
+    Args:
+        df (DataFrame): preprocessed minute frame.
+        key (str): cache key as returned by `fingerprint`.
+        cache_dir (str, optional): Defaults to CACHE_DIR.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = get_cache_path(key, cache_dir)
+
+    for file in os.listdir(cache_dir):
+        if file.startswith('preprocessed-') and file.endswith('.feather'):
+            os.remove(os.path.join(cache_dir, file))
+
+    feather.write_feather(to_mappable_table(df), path, compression='uncompressed', chunksize=max(len(df), 1))
+    print(f'write_cache saved {df.shape} to {path}')
+
+
+def fingerprint_frame(df) -> str:
+    """Build a key from the contents of an in-memory frame, hashing the raw buffers
+    of its index and columns rather than hashing it row by row.
+
+    Args:
+        df (DataFrame | Series | SparseFrame): frame to describe.
+
+    Returns:
+        str: hex digest identifying the frame's contents.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if hasattr(df, 'observed'):
+        # SparseFrame, described by its parts.
+        for part in [df.observed, df.gaps, df.fills]:
+            h.update(fingerprint_frame(part).encode())
+        return h.hexdigest()
+
+    frame = df.to_frame() if isinstance(df, pd.Series) else df
+    h.update(repr((type(df).__name__, list(frame.columns), [str(t) for t in frame.dtypes])).encode())
+    for values in [frame.index, *(frame.iloc[:, i] for i in range(frame.shape[1]))]:
+        array = values.array.asi8 if hasattr(values.array, 'asi8') else values.to_numpy()
+        if array.dtype == object:
+            h.update(pd.util.hash_array(array).tobytes())
+        else:
+            h.update(memoryview(np.ascontiguousarray(array)).cast('B'))
+    return h.hexdigest()
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+from preprocess import GRID_FILL_LIMIT, is_valid_record, fill_grid_available, get_grid_session_duration, regrid, fill_missing_values, gap_policy_by_col
+from preprocess.interpolation import GapPolicy, SPLINE_CONTEXT
+from preprocess.cache import fingerprint_files
+from preprocess.ingestion import CSV_SCHEMA, DATETIME_COL, get_file_start, iter_csv_file, merge_records
+
+
+STORE_DIR = './data/store'
+
+# Records whose derived values may still change when later records arrive.
+# `system_grid_available` is forward and backward filled up to GRID_FILL_LIMIT
+# records away (records, not minutes), so twice that is kept on each side of the cut.
+OVERLAP_ROWS = 2 * GRID_FILL_LIMIT
+
+
+def get_overlap_time(policies: dict[str, GapPolicy]) -> pd.Timedelta:
+    """Time kept on each side of the cut for the columns filled by `policies`:
+    twice their longest forward or backward fill, which count minutes of the grid."""
+    limits = [policy.get(fill) or 0 for policy in policies.values() for fill in ['ffill', 'bfill']]
+    return pd.Timedelta(minutes=2 * max(limits, default=0))
+
+
+# Whichever of OVERLAP_ROWS and OVERLAP_TIME reaches further back is kept, as
+# records can be sparser or denser than a minute.
+OVERLAP_TIME = get_overlap_time(gap_policy_by_col)
+
+# Observations kept on each side of the cut for the interpolated columns. A gap's
+# spline is fitted on up to 2 * SPLINE_CONTEXT - 1 observations on either side
+# of it, so gaps before the cut never reach data that arrives after it.
+INTERPOLATION_CONTEXT = 2 * SPLINE_CONTEXT
+INTERPOLATED_COLS = list(gap_policy_by_col)
+
+
+def continue_grid_session_duration(grid: pd.Series, start: int, grid_carry: float, session_carry: float) -> pd.Series:
+    """Compute `system_grid_session_duration` for records `start` onwards, resuming
+    the session that was running on record `start - 1`.
+
+    Args:
+        grid (Series): filled `system_grid_available` records.
+        start (int): position of the first record to compute.
+        grid_carry (float): `system_grid_available` on record `start - 1`.
+        session_carry (float): `system_grid_session_duration` on record `start - 1`.
+
+    Returns:
+        Series: session duration, NaN for records before `start`.
+    """
+    segment = grid.iloc[start - 1:].copy()
+    segment.iloc[0] = grid_carry
+    session = get_grid_session_duration(segment)
+
+    first_run = (segment != grid_carry).cumsum() == 0
+    session[first_run] += session_carry - grid_carry
+    return session.reindex(grid.index)
+
+
+def get_next_state(raw: pd.DataFrame, grid: pd.Series, session: pd.Series, anchor: pd.Timestamp, reopen: pd.Timestamp | None = None) -> dict:
+    """Summarize the end of the processed records so that later records can be
+    appended without reprocessing the whole history.
+
+    Records from `cut` onward may still change once new records arrive and are
+    reprocessed on the next append. Records between the start of `tail` and `cut`
+    are only kept as context for the gap filling rules.
+
+    Args:
+        raw (DataFrame): records as read from the csv files, ordered by time.
+        grid (Series): filled `system_grid_available` for each record in `raw`.
+        session (Series): `system_grid_session_duration` for each record in `raw`.
+        anchor (Timestamp): first minute of the stored minute frame.
+        reopen (Timestamp | None, optional): earliest record later files may have,
+            the cut is placed as if `raw` ended there. Defaults to None, after the
+            last record of `raw`.
+
+    Returns:
+        dict: state to pass to `preprocess_append`.
+    """
+    times = raw[DATETIME_COL]
+    end_row, end = len(raw), times.iloc[-1]
+    if reopen is not None and reopen <= end:
+        end_row, end = int(times.searchsorted(reopen, side='left')), reopen
+
+    observed = is_valid_record(raw).to_numpy()
+    positions = [np.flatnonzero(observed[:end_row] & raw[col].notna().to_numpy()[:end_row]) for col in INTERPOLATED_COLS]
+
+    cut_row = min(end_row - OVERLAP_ROWS, int(times.searchsorted(end - OVERLAP_TIME, side='left')))
+    for obs in positions:
+        cut_row = min(cut_row, obs[-INTERPOLATION_CONTEXT] if len(obs) >= INTERPOLATION_CONTEXT else 0)
+    cut_row = max(cut_row, 0)
+
+    start_row = min(cut_row - OVERLAP_ROWS, int(times.searchsorted(times.iloc[cut_row] - OVERLAP_TIME, side='left')))
+    for obs in positions:
+        before = obs[obs < cut_row]
+        start_row = min(start_row, before[-INTERPOLATION_CONTEXT] if len(before) >= INTERPOLATION_CONTEXT else 0)
+    start_row = max(start_row, 0)
+
+    return {
+        'anchor': anchor,
+        'cut': times.iloc[cut_row],
+        'tail': raw.iloc[start_row:].reset_index(drop=True),
+        'warmup_rows': int(cut_row - start_row),
+        'grid_carry': float(grid.iloc[cut_row - 1]) if cut_row > 0 else None,
+        'session_carry': float(session.iloc[cut_row - 1]) if cut_row > 0 else None,
+    }
+
+
+def can_append(raw: pd.DataFrame, state: dict) -> bool:
+    """Whether `raw` can be appended to the records summarized by `state`: records
+    older than the cut can only be duplicates of records in its tail."""
+    times = pd.to_datetime(raw[DATETIME_COL], utc=True)
+    older = times < state['cut']
+    return bool(times[older].isin(state['tail'][DATETIME_COL]).all())
+
+
+def preprocess_append(raw: pd.DataFrame, state: dict | None = None, reopen: pd.Timestamp | None = None) -> tuple[pd.DataFrame, dict]:
+    """Preprocess `raw` records that follow the ones summarized by `state`. This
+    matches what `preprocess` returns for the whole history, from `state['cut']` on.
+
+    Args:
+        raw (DataFrame): new records as read from the csv files.
+        state (dict | None, optional): state returned by the previous call. Defaults
+            to None, meaning `raw` is the whole history.
+        reopen (Timestamp | None, optional): earliest record of the files that will
+            be appended next, see `get_next_state`. Defaults to None.
+
+    Returns:
+        tuple: minute frame from `state['cut']` onwards (or the whole frame when
+            `state` is None) and the state for the next append.
+    """
+    raw = raw.copy()
+    raw[DATETIME_COL] = pd.to_datetime(raw[DATETIME_COL], utc=True)
+    start = 0
+    anchor = None
+
+    if state is not None:
+        if not can_append(raw, state):
+            raise ValueError(f"new records older than {state['cut']}, a full rebuild is required")
+
+        raw = merge_records([state['tail'], raw], DATETIME_COL)
+        start = state['warmup_rows']
+        anchor = state['anchor']
+
+    grid = fill_grid_available(raw['system_grid_available'])
+    if start > 0:
+        session = continue_grid_session_duration(grid, start, state['grid_carry'], state['session_carry'])
+    else:
+        session = get_grid_session_duration(grid)
+
+    df = raw.assign(system_grid_available=grid, system_grid_session_duration=session)
+    if anchor is not None:
+        # Keep the minute grid aligned with the one of the stored frame.
+        first = df[DATETIME_COL].min()
+        anchor = anchor + (first - anchor).ceil('min')
+    df = regrid(df, DATETIME_COL, start=anchor)
+    df = fill_missing_values(df)
+
+    next_state = get_next_state(raw, grid, session, anchor=df.index[0] if state is None else state['anchor'], reopen=reopen)
+    if state is not None:
+        df = df.loc[state['cut']:]
+
+    return df, next_state
+
+
+def read_state(store_dir: str = STORE_DIR) -> dict | None:
+    path = os.path.join(store_dir, 'state.json')
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        state = json.load(f)
+    state['anchor'] = pd.Timestamp(state['anchor'])
+    state['cut'] = pd.Timestamp(state['cut'])
+    state['tail'] = feather.read_feather(os.path.join(store_dir, 'tail.feather'))
+    return state
+
+
+def write_state(state: dict, store_dir: str = STORE_DIR):
+    feather.write_feather(state['tail'], os.path.join(store_dir, 'tail.feather'), compression='uncompressed')
+    with open(os.path.join(store_dir, 'state.json'), 'w') as f:
+        json.dump({
+            **{k: v for (k, v) in state.items() if k != 'tail'},
+            'anchor': state['anchor'].isoformat(),
+            'cut': state['cut'].isoformat(),
+        }, f, indent=2)
+
+
+def iter_store(store_dir: str = STORE_DIR):
+    """Iterate over the stored minute frame one part at a time, memory-mapping each
+    of them, so that histories larger than memory can be consumed in order.
+
+    Args:
+        store_dir (str, optional): Defaults to STORE_DIR.
+
+    Yields:
+        DataFrame: consecutive parts of the preprocessed minute frame.
+    """
+    state = read_state(store_dir)
+    if state is None:
+        raise FileNotFoundError(f'{store_dir} has no preprocessed minute frame, see write_store')
+    for part in state['parts']:
+        yield feather.read_table(os.path.join(store_dir, part['file']), memory_map=True).to_pandas()
+
+
+def read_store(store_dir: str = STORE_DIR) -> pd.DataFrame:
+    """Read the whole stored minute frame.
+
+    Args:
+        store_dir (str, optional): Defaults to STORE_DIR.
+
+    Returns:
+        DataFrame: preprocessed minute frame.
+    """
+    df = pd.concat(list(iter_store(store_dir)), axis=0)
+    df.index.freq = 'min'
+    return df
+
+
+def append_part(df: pd.DataFrame, parts: list[dict], cut: pd.Timestamp | None, store_dir: str = STORE_DIR) -> list[dict]:
+    """Replace stored rows from `cut` onwards with `df`. Only the parts that overlap
+    the cut are rewritten, so the cost is bound to the size of `df`.
+
+    Args:
+        df (DataFrame): minute frame from `cut` onwards.
+        parts (list[dict]): parts currently in the store.
+        cut (Timestamp | None): first minute to replace, None when the store is empty.
+        store_dir (str, optional): Defaults to STORE_DIR.
+
+    Returns:
+        list[dict]: parts in the store after the append.
+    """
+    kept_parts = []
+    for part in parts:
+        path = os.path.join(store_dir, part['file'])
+        if pd.Timestamp(part['end']) < cut:
+            kept_parts.append(part)
+            continue
+
+        kept = feather.read_feather(path)
+        kept = kept[kept.index < cut]
+        os.remove(path)
+        if len(kept) > 0:
+            feather.write_feather(kept, path, compression='uncompressed')
+            kept_parts.append({**part, 'end': kept.index[-1].isoformat()})
+
+    file = f'part-{len(kept_parts):05d}.feather'
+    feather.write_feather(df, os.path.join(store_dir, file), compression='uncompressed')
+    kept_parts.append({'file': file, 'start': df.index[0].isoformat(), 'end': df.index[-1].isoformat()})
+    return kept_parts
+
+
+def clear_store(store_dir: str = STORE_DIR):
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.makedirs(store_dir)
+
+
+def write_store(paths: list[str], store_dir: str = STORE_DIR, schema: dict = CSV_SCHEMA, chunksize: int | None = None):
+    """Bring the stored minute frame up to date with the csv files in `paths`.
+    Only files that were not ingested yet are read and preprocessed, the store is
+    rebuilt from scratch if any previously ingested file changed or disappeared, or
+    if new files have records older than the stored tail.
+
+    Files are streamed one at a time (or `chunksize` records at a time), in the
+    order of their first record, carrying the state needed by the gap filling rules
+    and the grid session timer from one chunk to the next. The cut of each file is
+    kept before the first record of the files that follow it, so files that overlap
+    are merged however deep the overlap. Memory is therefore bound to the size of a
+    chunk (plus the overlap) rather than to the size of the history.
+
+    Args:
+        paths (list[str]): csv files.
+        store_dir (str, optional): Defaults to STORE_DIR.
+        schema (dict, optional): Defaults to CSV_SCHEMA.
+        chunksize (int | None, optional): records per chunk. Defaults to None,
+            processing a whole file at a time.
+    """
+    files = {entry['path']: entry for entry in fingerprint_files(paths)}
+    schema_desc = {k: str(v) for (k, v) in schema.items()}
+    state = read_state(store_dir)
+
+    if state is not None:
+        if state['schema'] != schema_desc or any(files.get(entry['path']) != entry for entry in state['files']):
+            print('write_store source files changed, rebuilding store')
+            state = None
+
+    ingested = [] if state is None else state['files']
+    pending = [path for path in files if state is None or path not in {entry['path'] for entry in ingested}]
+    starts = {path: get_file_start(path, chunksize=chunksize) for path in pending}
+    pending = sorted(pending, key=starts.get)
+
+    rebuild = state is None
+    if rebuild:
+        clear_store(store_dir)
+
+    for i, path in enumerate(pending):
+        start = time.time()
+        reopen = min([starts[later] for later in pending[i + 1:]], default=None)
+        for raw in iter_csv_file(path, schema, chunksize=chunksize):
+            if not rebuild and not can_append(raw, state):
+                print(f'write_store {path} has records older than the stored tail, rebuilding store')
+                clear_store(store_dir)
+                return write_store(paths, store_dir, schema, chunksize)
+
+            # Later chunks of the file start after this one, later files at `reopen`.
+            last = raw[DATETIME_COL].max()
+            df, next_state = preprocess_append(raw, state, last if reopen is None else min(reopen, last))
+            if state is None:
+                parts = append_part(df, [], None, store_dir)
+            else:
+                parts = append_part(df, state['parts'], state['cut'], store_dir)
+            state = {**next_state, 'files': ingested, 'parts': parts, 'schema': schema_desc}
+
+        ingested = ingested + [files[path]]
+        state['files'] = ingested
+        write_state(state, store_dir)
+        print(f'write_store [{len(ingested)}/{len(files)}] {path} in {time.time() - start:.2f}s')
+
+    if len(pending) == 0:
+        print(f'write_store {store_dir} is up to date')
+
+
+def update_store(paths: list[str], store_dir: str = STORE_DIR, schema: dict = CSV_SCHEMA) -> pd.DataFrame:
+    """Bring the stored minute frame up to date with the csv files in `paths` and
+    read it. See `write_store`.
+
+    Returns:
+        DataFrame: preprocessed minute frame for all of `paths`.
+    """
+    write_store(paths, store_dir, schema)
+    return read_store(store_dir)
@@ -0,0 +1,225 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from preprocess import aggregation_func_by_col, is_valid_record
+
+
+DATETIME_COL = 'registered_at'
+
+# Columns computed by `preprocess` (or joined from meteo data) and therefore never
+# read from the csv files.
+DERIVED_COLS = ['system_grid_session_duration', 'ambient_temperature']
+
+# Declared schema of the monthly telemetry files. Only these columns are read
+# (missing ones are tolerated), which avoids dtype inference on every column.
+CSV_SCHEMA = {
+    **{col: 'float32' for col in aggregation_func_by_col if col not in DERIVED_COLS},
+    # Used by `preprocess` to build the grid session timer.
+    'system_grid_available': 'boolean',
+    # Used by `preprocess.meteo`. Kept as float64 to preserve coordinate precision.
+    'latitude': 'float64',
+    'longitude': 'float64',
+}
+
+
+def list_csv_files(dir: str) -> list[str]:
+    """List every csv file under `dir`, sorted by path so that monthly files are
+    concatenated in chronological order.
+
+    Args:
+        dir (str): directory with the monthly csv files.
+
+    Returns:
+        list[str]: sorted file paths.
+    """
+    paths = []
+    for root, dirs, files in os.walk(dir):
+        for file in files:
+            if file.endswith('.csv'):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def get_read_csv_options(schema: dict = CSV_SCHEMA, datetime_col: str = DATETIME_COL) -> dict:
+    columns = {datetime_col, *schema.keys()}
+    return {
+        'usecols': lambda col: col in columns,
+        'dtype': schema,
+        'parse_dates': [datetime_col],
+    }
+
+
+def sort_records(df: pd.DataFrame, datetime_col: str = DATETIME_COL) -> pd.DataFrame:
+    """Ensure the records of a single file are ordered by `datetime_col` and keep
+    the first valid record of each timestamp (the first one if none is valid, see
+    `is_valid_record`). Files are usually written in order, in which case this is a
+    linear check and no copy is made.
+
+    Args:
+        df (DataFrame): records of a single file.
+        datetime_col (str, optional): Defaults to DATETIME_COL.
+
+    Returns:
+        DataFrame: sorted records without duplicated timestamps.
+    """
+    if not df[datetime_col].is_monotonic_increasing:
+        df = df.sort_values(datetime_col, kind='stable', ignore_index=True)
+
+    ts = df[datetime_col].array.asi8
+    if len(ts) > 1 and (ts[1:] == ts[:-1]).any():
+        # Valid records first within each timestamp, in file order otherwise.
+        order = np.lexsort((~is_valid_record(df).to_numpy(), ts))
+        (df, ts) = (df.take(order), ts[order])
+        df = df[np.concatenate([[True], ts[1:] != ts[:-1]])].reset_index(drop=True)
+    return df
+
+
+def merge_sorted_records(a: pd.DataFrame, b: pd.DataFrame, datetime_col: str = DATETIME_COL) -> pd.DataFrame:
+    """Merge two frames sorted by `datetime_col`, dropping records of `b` whose
+    timestamp is already in `a`, unless the record of `a` is invalid and the one
+    of `b` isn't (see `is_valid_record`), in which case the one of `a` is dropped.
+    """
+    ta = a[datetime_col].array.asi8
+    tb = b[datetime_col].array.asi8
+    in_a = np.isin(tb, ta)
+    positions = np.searchsorted(ta, tb[in_a])
+    replace = is_valid_record(b).to_numpy()[in_a] & ~is_valid_record(a).to_numpy()[positions]
+
+    keep_a = np.ones(len(a), dtype=bool)
+    keep_a[positions[replace]] = False
+    keep_b = ~in_a
+    keep_b[np.flatnonzero(in_a)[replace]] = True
+    (a, b) = (a[keep_a], b[keep_b])
+    ta = a[datetime_col].array.asi8
+    tb = b[datetime_col].array.asi8
+
+    # Position of each record of `b` in the merged output.
+    from_b = np.zeros(len(a) + len(b), dtype=bool)
+    from_b[np.searchsorted(ta, tb, side='right') + np.arange(len(tb))] = True
+    order = np.empty(len(from_b), dtype=np.int64)
+    order[~from_b] = np.arange(len(a))
+    order[from_b] = len(a) + np.arange(len(b))
+
+    return pd.concat([a, b], axis=0, ignore_index=True).take(order).reset_index(drop=True)
+
+
+def merge_records(frames: list[pd.DataFrame], datetime_col: str = DATETIME_COL) -> pd.DataFrame:
+    """k-way merge of the records of several files into a single time ordered frame
+    without duplicated timestamps. Each frame is sorted on its own (a no-op for
+    files written in order) and only the records where consecutive files overlap
+    are actually merged, so the whole merge is a linear pass over the records.
+    For duplicated timestamps the valid record from the file that starts first is
+    kept, invalid records (dropped by `regrid`) never hide a valid one.
+
+    Args:
+        frames (list[DataFrame]): records of each file.
+        datetime_col (str, optional): Defaults to DATETIME_COL.
+
+    Returns:
+        DataFrame: merged records.
+    """
+    frames = [sort_records(df, datetime_col) for df in frames]
+    non_empty = [df for df in frames if len(df) > 0]
+    if len(non_empty) == 0:
+        return frames[0]
+    frames = sorted(non_empty, key=lambda df: df[datetime_col].iloc[0])
+
+    merged = []
+    current = frames[0]
+    for df in frames[1:]:
+        # Records before the start of `df` can't be affected by any later file.
+        split = np.searchsorted(current[datetime_col].array.asi8, df[datetime_col].array.asi8[0], side='left')
+        merged.append(current.iloc[:split])
+        current = merge_sorted_records(current.iloc[split:], df, datetime_col)
+    merged.append(current)
+
+    return pd.concat(merged, axis=0, ignore_index=True)
+
+
+def read_csv_file(file_path: str, schema: dict = CSV_SCHEMA, datetime_col: str = DATETIME_COL):
+    """Read a single csv file following `schema`, with its records sorted by
+    `datetime_col` and without duplicated timestamps.
+
+    Args:
+        file_path (str): csv file to read.
+        schema (dict, optional): column name to dtype. Defaults to CSV_SCHEMA.
+        datetime_col (str, optional): column parsed as datetime. Defaults to DATETIME_COL.
+
+    Returns:
+        tuple: file path, DataFrame and time it took to read it (seconds).
+    """
+    start = time.time()
+    df = pd.read_csv(file_path, **get_read_csv_options(schema, datetime_col))
+    df[datetime_col] = pd.to_datetime(df[datetime_col], utc=True)
+    df = sort_records(df, datetime_col)
+    return file_path, df, time.time() - start
+
+
+def iter_csv_file(file_path: str, schema: dict = CSV_SCHEMA, datetime_col: str = DATETIME_COL, chunksize: int | None = None):
+    """Read a single csv file following `schema`, `chunksize` records at a time.
+
+    Args:
+        file_path (str): csv file to read.
+        schema (dict, optional): column name to dtype. Defaults to CSV_SCHEMA.
+        datetime_col (str, optional): column parsed as datetime. Defaults to DATETIME_COL.
+        chunksize (int | None, optional): records per chunk. Defaults to None,
+            reading the whole file at once.
+
+    Yields:
+        DataFrame: records of each chunk, sorted by `datetime_col`.
+    """
+    if chunksize is None:
+        yield read_csv_file(file_path, schema, datetime_col)[1]
+        return
+
+    with pd.read_csv(file_path, chunksize=chunksize, **get_read_csv_options(schema, datetime_col)) as reader:
+        for chunk in reader:
+            chunk[datetime_col] = pd.to_datetime(chunk[datetime_col], utc=True)
+            yield sort_records(chunk, datetime_col)
+
+
+def get_file_start(file_path: str, datetime_col: str = DATETIME_COL, chunksize: int | None = None) -> pd.Timestamp:
+    """First record of a csv file, reading only `datetime_col` of its first chunk
+    (of the whole file when `chunksize` is None), as `iter_csv_file` does.
+
+    Args:
+        file_path (str): csv file to read.
+        datetime_col (str, optional): Defaults to DATETIME_COL.
+        chunksize (int | None, optional): Defaults to None.
+
+    Returns:
+        Timestamp: earliest record of the first chunk.
+    """
+    times = pd.read_csv(file_path, usecols=[datetime_col], nrows=chunksize)[datetime_col]
+    return pd.to_datetime(times, utc=True).min()
+
+
+def load_csv_files(paths: list[str], schema: dict = CSV_SCHEMA, datetime_col: str = DATETIME_COL, max_workers: int | None = None):
+    """Read `paths` in parallel across a process pool and merge their records in
+    time order. Progress and timing is reported for every file.
+
+    Args:
+        paths (list[str]): csv files to read.
+        schema (dict, optional): column name to dtype. Defaults to CSV_SCHEMA.
+        datetime_col (str, optional): column parsed as datetime. Defaults to DATETIME_COL.
+        max_workers (int | None, optional): size of the process pool. Defaults to
+            the number of processors on the machine.
+
+    Returns:
+        DataFrame: raw telemetry ordered by `datetime_col`, without duplicated timestamps.
+    """
+    start = time.time()
+    months = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(read_csv_file, path, schema, datetime_col) for path in paths]
+        for future in as_completed(futures):
+            file_path, df, elapsed = future.result()
+            months[file_path] = df
+            print(f'load_csv_files [{len(months)}/{len(paths)}] {file_path}: {len(df)} rows in {elapsed:.2f}s')
+
+    df = merge_records([months[path] for path in paths], datetime_col)
+    print(f'load_csv_files read {len(df)} rows from {len(paths)} files in {time.time() - start:.2f}s')
+    return df
@@ -0,0 +1,198 @@
+"""Gap-aware interpolation. Instead of fitting one spline over the whole series,
+each gap is filled from a cubic spline fitted on the observations around it,
+so memory and time grow with the number of gaps rather than with the series.
+"""
+from typing import TypedDict, Optional
+import numpy as np
+import pandas as pd
+from preprocess.runs import run_starts
+
+
+class GapPolicy(TypedDict):
+    method: str  # 'linear' or 'cubic'
+    bfill: Optional[int]  # records filled backwards from the next observation
+    ffill: Optional[int]  # records filled forward from the previous observation
+    max_gap: Optional[int]  # longest gap (in records) to interpolate, None for no limit
+
+
+# Observations used on each side of a gap to fit its spline. The influence of a
+# cubic spline knot decays by ~0.27 per knot, so past 32 knots the local spline
+# matches one fitted over the whole series to floating point precision.
+SPLINE_CONTEXT = 32
+
+# Gaps solved together, bounding memory to GAP_BATCH_SIZE x 2 * SPLINE_CONTEXT.
+GAP_BATCH_SIZE = 4096
+
+
+def find_gaps(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Find runs of NaN in `values`.
+
+    Args:
+        values (ndarray): 1-D float array.
+
+    Returns:
+        tuple: start position and length of each NaN run.
+    """
+    missing = np.isnan(values)
+    starts = run_starts(missing)
+    lengths = np.diff(starts, append=len(values))
+    is_gap = missing[starts]
+    return starts[is_gap], lengths[is_gap]
+
+
+def solve_not_a_knot(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Second derivatives of the not-a-knot cubic splines through each row of
+    (`x`, `y`), the same spline scipy's `interp1d(kind='cubic')` fits. Rows are
+    solved together with a batched Thomas algorithm.
+
+    Args:
+        x (ndarray): (batch, m) knot positions, increasing along each row, m >= 4.
+        y (ndarray): (batch, m) knot values.
+
+    Returns:
+        ndarray: (batch, m) second derivatives at each knot.
+    """
+    h = np.diff(x, axis=1)
+    slopes = np.diff(y, axis=1) / h
+    m = x.shape[1]
+    n = m - 2
+
+    # Tridiagonal system on the inner knots 1..m-2.
+    sub = h[:, :-1].copy()
+    diag = 2 * (h[:, :-1] + h[:, 1:])
+    sup = h[:, 1:].copy()
+    rhs = 6 * np.diff(slopes, axis=1)
+
+    # Not-a-knot: third derivative is continuous at knots 1 and m-2.
+    h0, h1 = h[:, 0], h[:, 1]
+    diag[:, 0] += h0 * (h0 + h1) / h1
+    sup[:, 0] -= h0 * h0 / h1
+    hl, hp = h[:, -1], h[:, -2]
+    diag[:, -1] += hl * (hl + hp) / hp
+    sub[:, -1] -= hl * hl / hp
+
+    # Forward sweep and back substitution, vectorized across the batch.
+    for i in range(1, n):
+        w = sub[:, i] / diag[:, i - 1]
+        diag[:, i] -= w * sup[:, i - 1]
+        rhs[:, i] -= w * rhs[:, i - 1]
+    inner = np.empty_like(rhs)
+    inner[:, -1] = rhs[:, -1] / diag[:, -1]
+    for i in range(n - 2, -1, -1):
+        inner[:, i] = (rhs[:, i] - sup[:, i] * inner[:, i + 1]) / diag[:, i]
+
+    second = np.empty_like(y)
+    second[:, 1:-1] = inner
+    second[:, 0] = ((h0 + h1) * inner[:, 0] - h0 * inner[:, 1]) / h1
+    second[:, -1] = ((hl + hp) * inner[:, -1] - hl * inner[:, -2]) / hp
+    return second
+
+
+def interpolate_cubic(values: np.ndarray, gap_starts: np.ndarray, gap_lengths: np.ndarray, context: int = SPLINE_CONTEXT) -> np.ndarray:
+    """Fill interior gaps of `values` in place with local not-a-knot cubic splines.
+
+    Args:
+        values (ndarray): 1-D float array, modified in place.
+        gap_starts (ndarray): start of each interior gap.
+        gap_lengths (ndarray): length of each interior gap.
+        context (int, optional): observations used on each side of a gap.
+            Defaults to SPLINE_CONTEXT.
+
+    Returns:
+        ndarray: `values`.
+    """
+    observed = np.flatnonzero(~np.isnan(values))
+    m = min(2 * context, len(observed))
+    if len(gap_starts) == 0:
+        return values
+    if m < 4:
+        raise ValueError('cubic interpolation requires at least 4 observations')
+
+    # Index (within `observed`) of the observation right before each gap.
+    before = np.searchsorted(observed, gap_starts) - 1
+
+    for batch in range(0, len(gap_starts), GAP_BATCH_SIZE):
+        sl = slice(batch, batch + GAP_BATCH_SIZE)
+        window_start = np.clip(before[sl] - context + 1, 0, len(observed) - m)
+        knots = observed[window_start[:, None] + np.arange(m)]
+        x = (knots - knots[:, :1]).astype(np.float64)
+        y = values[knots]
+        second = solve_not_a_knot(x, y)
+
+        # Evaluate each gap on the spline piece between its surrounding observations.
+        rows = np.arange(len(window_start))
+        piece = before[sl] - window_start
+        x0, x1 = x[rows, piece], x[rows, piece + 1]
+        y0, y1 = y[rows, piece], y[rows, piece + 1]
+        m0, m1 = second[rows, piece], second[rows, piece + 1]
+
+        lengths = gap_lengths[sl]
+        gap = np.repeat(rows, lengths)
+        offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        positions = gap_starts[sl][gap] + offset
+        t = (positions - knots[gap, 0]).astype(np.float64)
+
+        h = x1[gap] - x0[gap]
+        a = x1[gap] - t
+        b = t - x0[gap]
+        values[positions] = (
+            m0[gap] * a ** 3 / (6 * h) + m1[gap] * b ** 3 / (6 * h)
+            + (y0[gap] / h - m0[gap] * h / 6) * a
+            + (y1[gap] / h - m1[gap] * h / 6) * b
+        )
+
+    return values
+
+
+def interpolate_linear(values: np.ndarray, gap_starts: np.ndarray, gap_lengths: np.ndarray) -> np.ndarray:
+    """Fill interior gaps of `values` in place by linear interpolation between the
+    observations surrounding each gap.
+    """
+    if len(gap_starts) == 0:
+        return values
+
+    gap = np.repeat(np.arange(len(gap_starts)), gap_lengths)
+    offset = np.arange(gap_lengths.sum()) - np.repeat(np.cumsum(gap_lengths) - gap_lengths, gap_lengths)
+    positions = gap_starts[gap] + offset
+
+    left = gap_starts - 1
+    right = gap_starts + gap_lengths
+    weight = (offset + 1) / (gap_lengths[gap] + 1)
+    values[positions] = values[left[gap]] + weight * (values[right[gap]] - values[left[gap]])
+    return values
+
+
+def fill_gaps(series: pd.Series, policy: GapPolicy) -> pd.Series:
+    """Fill missing values of a regularly spaced `series` following `policy`:
+    backward fill, forward fill and then interpolate the remaining gaps.
+
+    As with pandas `interpolate`, leading gaps are kept and trailing gaps are
+    only filled (with the last observation) by the linear method.
+
+    Args:
+        series (Series): series with a row per time step.
+        policy (GapPolicy): how to fill its gaps.
+
+    Returns:
+        Series: filled series.
+    """
+    series = series.bfill(limit=policy.get('bfill')).ffill(limit=policy.get('ffill'))
+    values = series.to_numpy(dtype=np.float64, copy=True)
+
+    starts, lengths = find_gaps(values)
+    interior = (starts > 0) & (starts + lengths < len(values))
+    max_gap = policy.get('max_gap')
+    if max_gap is not None:
+        interior &= lengths <= max_gap
+
+    if policy['method'] == 'cubic':
+        interpolate_cubic(values, starts[interior], lengths[interior])
+    elif policy['method'] == 'linear':
+        interpolate_linear(values, starts[interior], lengths[interior])
+        trailing = (starts > 0) & (starts + lengths == len(values))
+        if trailing.any():
+            values[starts[trailing][0]:] = values[starts[trailing][0] - 1]
+    else:
+        raise ValueError(f"Unsupported interpolation method {policy['method']}")
+
+    return pd.Series(values.astype(series.dtype), index=series.index, name=series.name)
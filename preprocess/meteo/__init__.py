@@ -1,5 +1,7 @@
 import pandas as pd
 from meteostat import Stations, Hourly # https://dev.meteostat.net
+from preprocess.meteo.stations import STATIONS_FILE, StationResolver, get_station_resolver
+from preprocess.meteo.weather import WeatherProvider, add_weather, file_provider, meteostat_provider
 
 
 def get_closest_station(lat, lon):
@@ -22,30 +24,30 @@ def get_closest_station(lat, lon):
         return None
 
 
-def add_meteo_station(df):
+def add_meteo_station(df, stations_file: str = STATIONS_FILE):
     """Enriches df with meteostat data with the following new cols:
+    - station_id
     - station_code
     - station_name 
 
+    Stations are resolved offline from the station table in `stations_file`, with
+    a single nearest neighbour query for all the distinct (rounded) coordinates
+    in `df`. See `preprocess.meteo.stations`.
+
     Args:
         df (pd.DataFrame): original dataframe.
+        stations_file (str, optional): Defaults to STATIONS_FILE.
     
     Returns:
         pd.DataFrame: Dataframe with the additional meteo data.
     """
-    def aggregate(chunk):
-        station = get_closest_station(chunk.latitude.mean(), chunk.longitude.mean())
-        print('add_meteo_station', chunk.index[0], '/', len(df))
-        return pd.DataFrame({
-            'station_code': [station['icao']] * len(chunk),
-            'station_name': [station['name']] * len(chunk),
-        }, index=chunk.index)
-    
     print('add_meteo_station', 'adding meteostat information to df')
 
-    grouped = df.groupby(df.index // 60, group_keys=False)  # calling aggregate once per hour
-    meteo = grouped.apply(aggregate)
+    resolver = get_station_resolver(stations_file)
+    stations = resolver.resolve(df['latitude'].to_numpy(), df['longitude'].to_numpy())
 
-    df['station_code'] = meteo['station_code']
-    df['station_name'] = meteo['station_name']
+    df['station_id'] = stations['id'].to_numpy()
+    df['station_code'] = stations['icao'].to_numpy()
+    df['station_name'] = stations['name'].to_numpy()
+    print('add_meteo_station', f'{len(df)} rows, {len(resolver.cache)} cached coordinates')
     return df
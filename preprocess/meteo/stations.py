@@ -0,0 +1,133 @@
+import os
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+
+STATIONS_FILE = './data/meteo/stations.feather'
+
+# Coordinates are rounded to this many decimal places before looking up their
+# station, 2 decimals being a cell of ~1km. A vehicle that barely moves therefore
+# only needs a handful of lookups.
+COORDINATE_PRECISION = 2
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def fetch_stations(path: str = STATIONS_FILE) -> pd.DataFrame:
+    """Download the whole meteostat station table once and save it to `path`, so
+    that later lookups don't need network access.
+
+    Args:
+        path (str, optional): Defaults to STATIONS_FILE.
+
+    Returns:
+        DataFrame: meteostat stations, indexed by station id.
+    """
+    from meteostat import Stations  # https://dev.meteostat.net
+
+    stations = Stations().fetch()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stations.reset_index().to_feather(path)
+    print('fetch_stations', f'saved {len(stations)} stations to {path}')
+    return stations
+
+
+def load_stations(path: str = STATIONS_FILE) -> pd.DataFrame:
+    """Read the station table saved by `fetch_stations`, fetching it if it doesn't
+    exist yet.
+
+    Args:
+        path (str, optional): Defaults to STATIONS_FILE.
+
+    Returns:
+        DataFrame: stations indexed by id, with at least `latitude` and `longitude`.
+    """
+    if not os.path.exists(path):
+        return fetch_stations(path)
+    return pd.read_feather(path).set_index('id')
+
+
+class StationResolver:
+    """Nearest meteo station lookup over a local station table, using a BallTree
+    on the haversine distance. Results are cached by rounded coordinates.
+
+    Args:
+        stations (DataFrame): station table with `latitude` and `longitude`
+            columns, as returned by `load_stations`.
+        precision (int, optional): decimal places coordinates are rounded to.
+            Defaults to COORDINATE_PRECISION.
+    """
+
+    def __init__(self, stations: pd.DataFrame, precision: int = COORDINATE_PRECISION):
+        stations = stations.dropna(subset=['latitude', 'longitude'])
+        self.stations = stations
+        self.precision = precision
+        self.tree = BallTree(np.radians(stations[['latitude', 'longitude']].to_numpy(dtype=np.float64)), metric='haversine')
+        self.cache: dict[tuple[float, float], tuple[int, float]] = {}
+
+    def query(self, lat: np.ndarray, lon: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Find the closest station to each (`lat`, `lon`) pair. Only coordinates
+        that are not cached yet are looked up, all of them in a single tree query.
+
+        Args:
+            lat (ndarray): latitudes, in degrees.
+            lon (ndarray): longitudes, in degrees.
+
+        Returns:
+            tuple: position of the closest station in `self.stations` (-1 for
+                missing coordinates) and its distance in km (NaN for missing
+                coordinates).
+        """
+        coords = np.column_stack([np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)])
+        positions = np.full(len(coords), -1, dtype=np.int64)
+        distances = np.full(len(coords), np.nan)
+
+        valid = ~np.isnan(coords).any(axis=1)
+        cells, inverse = np.unique(coords[valid].round(self.precision), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        keys = [tuple(cell) for cell in cells]
+        missing = [i for (i, key) in enumerate(keys) if key not in self.cache]
+        if len(missing) > 0:
+            dist, ind = self.tree.query(np.radians(cells[missing]), k=1)
+            for (i, d, p) in zip(missing, dist[:, 0], ind[:, 0]):
+                self.cache[keys[i]] = (int(p), float(d) * EARTH_RADIUS_KM)
+
+        cell_positions = np.array([self.cache[key][0] for key in keys], dtype=np.int64)
+        cell_distances = np.array([self.cache[key][1] for key in keys], dtype=np.float64)
+        positions[valid] = cell_positions[inverse]
+        distances[valid] = cell_distances[inverse]
+        return positions, distances
+
+    def resolve(self, lat: np.ndarray, lon: np.ndarray, columns: list[str] = ['icao', 'name']) -> pd.DataFrame:
+        """Station information for each (`lat`, `lon`) pair.
+
+        Args:
+            lat (ndarray): latitudes, in degrees.
+            lon (ndarray): longitudes, in degrees.
+            columns (list[str], optional): station columns to return. Defaults to
+                ['icao', 'name'].
+
+        Returns:
+            DataFrame: `id`, `distance` (km) and `columns` of the closest station to
+                each pair, NaN for missing coordinates.
+        """
+        positions, distances = self.query(lat, lon)
+        found = positions >= 0
+        stations = self.stations.reset_index()[['id', *columns]]
+
+        result = pd.DataFrame(index=np.arange(len(positions)), columns=['id', *columns], dtype=object)
+        result.loc[found, :] = stations.iloc[positions[found]].to_numpy()
+        result['distance'] = distances
+        return result
+
+
+_resolvers: dict[str, StationResolver] = {}
+
+
+def get_station_resolver(path: str = STATIONS_FILE) -> StationResolver:
+    """Station resolver for the table in `path`, loaded once and shared across calls."""
+    if path not in _resolvers:
+        _resolvers[path] = StationResolver(load_stations(path))
+    return _resolvers[path]
@@ -0,0 +1,153 @@
+import os
+from typing import Callable
+import numpy as np
+import pandas as pd
+
+
+WEATHER_CACHE_DIR = './data/meteo/hourly'
+
+# meteostat hourly columns joined onto the telemetry, and their name there.
+WEATHER_COLUMNS = {
+    'temp': 'ambient_temperature',
+}
+
+# Columns of meteostat's hourly observations, which providers return.
+HOURLY_COLUMNS = ['temp', 'dwpt', 'rhum', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun', 'coco']
+
+# Observations older than this are not joined, leaving the rows as missing.
+WEATHER_TOLERANCE = pd.Timedelta(hours=2)
+
+# A provider returns the hourly observations of a station between two (UTC)
+# timestamps, both included, indexed by their (UTC) time.
+WeatherProvider = Callable[[str, pd.Timestamp, pd.Timestamp], pd.DataFrame]
+
+
+def get_empty_weather(columns: list[str] = HOURLY_COLUMNS) -> pd.DataFrame:
+    """Frame without observations, typed as the ones providers return so that it
+    can be concatenated with them."""
+    index = pd.DatetimeIndex([], tz='UTC', name='time')
+    return pd.DataFrame({col: pd.Series([], index=index, dtype='float64') for col in columns}, index=index)
+
+
+def meteostat_provider(station: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """Hourly observations of `station` from meteostat."""
+    from meteostat import Hourly  # https://dev.meteostat.net
+
+    return Hourly(station, start.tz_convert(None).to_pydatetime(), end.tz_convert(None).to_pydatetime()).fetch()
+
+
+def file_provider(dir: str) -> WeatherProvider:
+    """Provider reading hourly observations from local `{dir}/{station}.csv` files,
+    with a `time` column in UTC. Allows enriching the data without network access.
+
+    Args:
+        dir (str): directory with a csv file per station.
+
+    Returns:
+        WeatherProvider
+    """
+    def provider(station: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        path = os.path.join(dir, f'{station}.csv')
+        if not os.path.exists(path):
+            return get_empty_weather()
+
+        df = pd.read_csv(path, parse_dates=['time']).set_index('time')
+        df.index = df.index.tz_localize('UTC') if df.index.tz is None else df.index.tz_convert('UTC')
+        return df.loc[start:end]
+
+    return provider
+
+
+def get_monthly_weather(station: str, month: pd.Period, provider: WeatherProvider = meteostat_provider, cache_dir: str = WEATHER_CACHE_DIR) -> pd.DataFrame:
+    """Hourly observations of `station` during `month`, fetched through `provider`
+    only if they're not in `cache_dir` yet. Months that are not over yet, or
+    without any observation, are not cached, since more observations may come.
+
+    Args:
+        station (str): meteostat station id.
+        month (Period): month to fetch.
+        provider (WeatherProvider, optional): Defaults to meteostat_provider.
+        cache_dir (str, optional): Defaults to WEATHER_CACHE_DIR.
+
+    Returns:
+        DataFrame: hourly observations indexed by UTC time.
+    """
+    path = os.path.join(cache_dir, station, f'{month}.parquet')
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    start = month.start_time.tz_localize('UTC')
+    end = month.end_time.floor('h').tz_localize('UTC')
+    df = provider(station, start, end)
+    if len(df) == 0:
+        # Not cached either, the observations may still be published.
+        return get_empty_weather(list(df.columns) or HOURLY_COLUMNS)
+
+    df.index = df.index.tz_localize('UTC') if df.index.tz is None else df.index.tz_convert('UTC')
+    df.index.name = 'time'
+    if end < pd.Timestamp.now(tz='UTC'):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path)
+    return df
+
+
+def load_weather(requests: list[tuple[str, pd.Period]], provider: WeatherProvider = meteostat_provider, cache_dir: str = WEATHER_CACHE_DIR) -> pd.DataFrame:
+    """Hourly observations for each (station, month) in `requests`.
+
+    Returns:
+        DataFrame: observations with `time` and `station_id` columns, sorted by time.
+    """
+    frames = []
+    for (i, (station, month)) in enumerate(requests):
+        df = get_monthly_weather(station, month, provider, cache_dir)
+        print(f'load_weather [{i + 1}/{len(requests)}] {station} {month}: {len(df)} observations')
+        frames.append(df.reset_index().assign(station_id=station))
+
+    if len(frames) == 0:
+        return pd.DataFrame({'time': pd.DatetimeIndex([], tz='UTC'), 'station_id': pd.Series([], dtype=object)})
+    return pd.concat(frames, ignore_index=True).sort_values('time', kind='stable', ignore_index=True)
+
+
+def add_weather(df: pd.DataFrame, columns: dict[str, str] = WEATHER_COLUMNS, provider: WeatherProvider = meteostat_provider, cache_dir: str = WEATHER_CACHE_DIR) -> pd.DataFrame:
+    """Join the hourly weather observed at each record's meteo station, as the
+    latest observation at or before the record (within WEATHER_TOLERANCE).
+
+    Observations are fetched once per (station, month) and joined onto every
+    record with a single `merge_asof`. Requires the `station_id` column added by
+    `add_meteo_station`.
+
+    Args:
+        df (DataFrame): frame indexed by UTC time, e.g. the minute or hour frame.
+        columns (dict[str, str], optional): weather column to name in `df`.
+            Defaults to WEATHER_COLUMNS.
+        provider (WeatherProvider, optional): Defaults to meteostat_provider.
+        cache_dir (str, optional): Defaults to WEATHER_CACHE_DIR.
+
+    Returns:
+        DataFrame: `df` with the additional weather columns.
+    """
+    print('add_weather', 'adding weather observations to df')
+
+    stations = df['station_id'].astype(object).where(df['station_id'].notna(), '')
+    months = df.index.tz_convert(None).to_period('M')
+    requests = pd.DataFrame({'station': stations.to_numpy(), 'month': months})
+    requests = requests[requests['station'] != ''].drop_duplicates()
+    weather = load_weather(list(requests.itertuples(index=False, name=None)), provider, cache_dir)
+
+    for col in columns:
+        if col not in weather.columns:
+            weather[col] = np.nan
+
+    records = pd.DataFrame({'time': df.index, 'station_id': stations.to_numpy()})
+    joined = pd.merge_asof(
+        records,
+        weather[['time', 'station_id', *columns]],
+        on='time',
+        by='station_id',
+        direction='backward',
+        tolerance=WEATHER_TOLERANCE,
+    )
+
+    for (col, name) in columns.items():
+        df[name] = joined[col].to_numpy(dtype=np.float32)
+    return df
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from preprocess.interpolation import GapPolicy, fill_gaps
+
+
+class SparseFrame:
+    """Minute frame that only keeps the observed records plus a table of the gaps
+    between them, instead of materialising a NaN row for every missing minute
+    (e.g. a vehicle parked for days).
+
+    Columns filled by a gap policy also keep their filled values inside the gaps,
+    so that aggregating or materialising the frame returns exactly what the dense
+    frame produced by `preprocess` would.
+
+    Attributes:
+        observed (DataFrame): observed records, indexed by minute.
+        gaps (DataFrame): `start` (first missing minute) and `length` (in minutes)
+            of each gap between observed records.
+        fills (DataFrame): values filled inside the gaps, for the columns that
+            have a gap policy, indexed by minute.
+    """
+
+    def __init__(self, observed: pd.DataFrame, gaps: pd.DataFrame, fills: pd.DataFrame, freq: str = 'min'):
+        self.observed = observed
+        self.gaps = gaps
+        self.fills = fills
+        self.freq = freq
+
+    @classmethod
+    def from_observed(cls, observed: pd.DataFrame, policies: dict[str, GapPolicy], freq: str = 'min'):
+        """Build a SparseFrame from the observed records, filling the columns in
+        `policies` like `preprocess.fill_missing_values` does on the dense frame.
+
+        Args:
+            observed (DataFrame): records indexed by time, aligned to `freq`.
+            policies (dict[str, GapPolicy]): gap policy of each column to fill.
+            freq (str, optional): Defaults to 'min'.
+
+        Returns:
+            SparseFrame
+        """
+        grid = pd.date_range(observed.index[0], observed.index[-1], freq=freq, name=observed.index.name)
+        positions = grid.get_indexer(observed.index)
+
+        # As with `asfreq`, records that are not aligned to the grid are dropped.
+        observed = observed[positions >= 0].copy()
+        positions = positions[positions >= 0]
+        gaps = cls.get_gaps(grid, positions)
+
+        missing = np.ones(len(grid), dtype=bool)
+        missing[positions] = False
+        fills = pd.DataFrame(index=grid[missing])
+
+        # Only one column is ever materialised on the whole grid.
+        for col, policy in policies.items():
+            values = np.full(len(grid), np.nan, dtype=observed[col].dtype)
+            values[positions] = observed[col].to_numpy()
+            filled = fill_gaps(pd.Series(values, index=grid, name=col), policy).to_numpy()
+            observed[col] = filled[positions]
+            fills[col] = filled[missing]
+
+        fills = fills.dropna(how='all')
+        return cls(observed, gaps, fills, freq)
+
+    @classmethod
+    def from_dense(cls, df: pd.DataFrame, filled_cols: list[str], freq: str = 'min'):
+        """Build a SparseFrame from a dense frame with a row per `freq`. Rows where
+        only `filled_cols` have values are considered gaps.
+        """
+        other_cols = [col for col in df.columns if col not in filled_cols]
+        is_observed = df[other_cols].notna().any(axis=1).to_numpy()
+        positions = np.flatnonzero(is_observed)
+
+        fills = df.loc[~is_observed, filled_cols].dropna(how='all')
+        return cls(df[is_observed], cls.get_gaps(df.index, positions), fills, freq)
+
+    @staticmethod
+    def get_gaps(grid: pd.DatetimeIndex, positions: np.ndarray) -> pd.DataFrame:
+        after = np.flatnonzero(np.diff(positions) > 1)
+        return pd.DataFrame({
+            'start': grid[positions[after] + 1],
+            'length': positions[after + 1] - positions[after] - 1,
+        })
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.observed.columns
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        """Dense index, with an entry per `freq`."""
+        return pd.date_range(self.observed.index[0], self.observed.index[-1], freq=self.freq, name=self.observed.index.name)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self), len(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.observed) + int(self.gaps['length'].sum())
+
+    def __getitem__(self, key):
+        """Dense column (or columns) for code that needs a regular grid."""
+        if isinstance(key, str):
+            return self.to_dense([key])[key]
+        return self.to_dense(list(key))
+
+    def to_dense(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """Materialise `columns` (all by default) with a row per `freq`.
+
+        Returns:
+            DataFrame: the frame `preprocess` would have returned.
+        """
+        columns = list(self.columns) if columns is None else columns
+        df = self.observed[columns].reindex(self.index)
+        filled = [col for col in columns if col in self.fills.columns]
+        if len(filled) > 0:
+            df.loc[self.fills.index, filled] = self.fills[filled]
+        df.index.freq = self.freq
+        return df
+
+    def get_values(self, col: str) -> pd.Series:
+        """Non-missing values of `col` in time order, including the filled ones."""
+        values = self.observed[col]
+        if col in self.fills.columns:
+            values = pd.concat([values, self.fills[col]]).sort_index()
+        return values.dropna()
+
+    def aggregate(self, gran_level: str, agg_funcs: dict[str, str], dtype=None) -> pd.DataFrame:
+        """Aggregate each column by `gran_level`, skipping the missing minutes. Matches
+        `ts_aggregation_by(self.to_dense(), gran_level, agg_funcs)`.
+
+        Args:
+            gran_level (str): period to aggregate by, e.g. 'h' or 'D'.
+            agg_funcs (dict[str, str]): aggregation function of each column.
+            dtype (optional): dtype values are aggregated in. Defaults to None,
+                keeping the dtype of each column.
+
+        Returns:
+            DataFrame: aggregated frame, with a row per period.
+        """
+        bounds = self.observed.index[[0, -1]].to_period(gran_level)
+        periods = pd.period_range(bounds[0], bounds[-1], freq=gran_level)
+        aggregated = {}
+        for col, func in agg_funcs.items():
+            values = self.get_values(col)
+            values = values if dtype is None else values.astype(dtype)
+            agg = values.groupby(values.index.to_period(gran_level), sort=True).agg(func)
+            # As in pandas, the sum of a period without values is 0.
+            aggregated[col] = agg.reindex(periods, fill_value=0 if func == 'sum' else np.nan)
+
+        df = pd.DataFrame(aggregated, index=periods)
+        df.index = df.index.to_timestamp()
+        df.index.name = self.observed.index.name
+        return df
+
+    def copy(self) -> 'SparseFrame':
+        return SparseFrame(self.observed.copy(), self.gaps.copy(), self.fills.copy(), self.freq)
+
+    def map_columns(self, func) -> 'SparseFrame':
+        """Apply the element-wise `func(values, col)` to every column, returning a
+        new SparseFrame. Missing minutes stay missing.
+        """
+        observed = pd.DataFrame({col: func(self.observed[col], col) for col in self.columns}, index=self.observed.index)
+        fills = pd.DataFrame({col: func(self.fills[col], col) for col in self.fills.columns}, index=self.fills.index)
+        return SparseFrame(observed, self.gaps, fills, self.freq)
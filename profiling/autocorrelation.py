@@ -0,0 +1,125 @@
+"""Autocorrelation engine: the ACF of every lag up to `max_lag` in O(n log n) with
+FFT, and the PACF derived from it with Durbin-Levinson, for one or several
+granularities of a series at once. Results are cached by series fingerprint, so
+the lag figures are drawn from precomputed arrays.
+
+Without missing values the ACF is the one of `statsmodels.tsa.stattools.acf`
+and the PACF the one of `pacf(method='ldb')`. Missing values are skipped: each
+lag is averaged over its pairs of observed values.
+"""
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from scipy.fft import next_fast_len, rfft, irfft
+from preprocess.cache import fingerprint_frame
+from transformation.pyramid import aggregate_by
+
+
+# Series kept by `get_autocorrelation`, most recently used last.
+AUTOCORRELATION_CACHE_SIZE = 16
+
+
+def get_lagged_products(values: np.ndarray, max_lag: int) -> np.ndarray:
+    """Sum of `values[t] * values[t + k]` over t, for every lag k up to `max_lag`,
+    along the first axis."""
+    n = values.shape[0]
+    size = next_fast_len(n + max_lag)
+    spectrum = rfft(values, size, axis=0)
+    return irfft(spectrum * np.conj(spectrum), size, axis=0)[:max_lag + 1]
+
+
+def acf(values: np.ndarray, max_lag: int) -> np.ndarray:
+    """Autocorrelation of lags 0..`max_lag` of `values`, a series or a 2-D array
+    with a series per column.
+
+    Args:
+        values (ndarray): 1-D series or (time, series) array. NaN are missing values.
+        max_lag (int): last lag, lower than the length of the series.
+
+    Returns:
+        ndarray: (max_lag + 1) values, or (max_lag + 1, series) for 2-D `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    max_lag = min(max_lag, n - 1)
+    valid = ~np.isnan(values)
+    mean = np.where(valid, values, 0.0).sum(axis=0) / valid.sum(axis=0)
+    products = get_lagged_products(np.where(valid, values - mean, 0.0), max_lag)
+
+    lags = np.arange(max_lag + 1).reshape(-1, *[1] * (values.ndim - 1))
+    if valid.all():
+        pairs = n - lags
+    else:
+        pairs = np.rint(get_lagged_products(valid.astype(np.float64), max_lag))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Mean of the observed pairs, weighted as in the biased estimator (sum / n).
+        acov = products / pairs * (n - lags) / n
+        return acov / acov[0]
+
+
+def pacf(acf_values: np.ndarray) -> np.ndarray:
+    """Partial autocorrelation of every lag of `acf_values` (as returned by `acf`),
+    with the Durbin-Levinson recursion.
+
+    Args:
+        acf_values (ndarray): ACF of lags 0..max_lag, 1-D or (lag, series).
+
+    Returns:
+        ndarray: PACF, with the shape of `acf_values`.
+    """
+    rho = np.asarray(acf_values, dtype=np.float64)
+    max_lag = rho.shape[0] - 1
+    partial = np.ones_like(rho)
+    phi = np.zeros((max_lag + 1, *rho.shape[1:]))
+    variance = np.ones(rho.shape[1:])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for k in range(1, max_lag + 1):
+            # phi[1..k-1] are the coefficients of the order k-1 model.
+            reflection = (rho[k] - (phi[1:k] * rho[k - 1:0:-1]).sum(axis=0)) / variance
+            phi[1:k] = phi[1:k] - reflection * phi[k - 1:0:-1]
+            phi[k] = reflection
+            variance = variance * (1 - reflection * reflection)
+            partial[k] = reflection
+    return partial
+
+
+def get_level_series(series: pd.Series, level: str | None) -> pd.Series:
+    """`series` averaged by `level` on a regular time grid (empty periods are
+    missing values), so that lags are periods. None keeps the series as is."""
+    if level is None:
+        return series
+    return aggregate_by(series, gran_level=level, agg_func='mean').asfreq(level)
+
+
+_cache: OrderedDict[tuple, dict] = OrderedDict()
+
+
+def get_autocorrelation(series: pd.Series, max_lag: int, levels: list[str | None] = [None]) -> dict[str | None, dict]:
+    """ACF and PACF of lags 0..`max_lag` of `series` at every granularity of
+    `levels`. Results are kept while among the AUTOCORRELATION_CACHE_SIZE most
+    recently used, and reused for any `max_lag` up to the one they were computed for.
+
+    Args:
+        series (Series): series indexed by time.
+        max_lag (int): last lag, in periods of each level.
+        levels (list[str | None], optional): e.g. [None, 'h', 'D'], None for the
+            series itself. Defaults to [None].
+
+    Returns:
+        dict: level to its `lags`, `acf` and `pacf` arrays.
+    """
+    key = fingerprint_frame(series)
+    results = {}
+    for level in levels:
+        entry = _cache.get((key, level))
+        if entry is None or len(entry['lags']) <= min(max_lag, entry['size'] - 1):
+            values = get_level_series(series, level).to_numpy(dtype=np.float64, na_value=np.nan)
+            rho = acf(values, max_lag)
+            entry = {'lags': np.arange(len(rho)), 'acf': rho, 'pacf': pacf(rho), 'size': len(values)}
+            _cache[(key, level)] = entry
+            while len(_cache) > AUTOCORRELATION_CACHE_SIZE:
+                _cache.popitem(last=False)
+        _cache.move_to_end((key, level))
+        results[level] = {name: entry[name][:max_lag + 1] for name in ['lags', 'acf', 'pacf']}
+    return results
@@ -0,0 +1,118 @@
+"""Additive seasonal decomposition of many columns for several candidate periods at
+once, with the same results as `statsmodels.tsa.seasonal.seasonal_decompose`:
+the trend is a centered moving average (convolution along time of every column
+with the same filter), the seasonal component the mean of the detrended values at
+each position of the period, and the residual what is left.
+
+The strength of each seasonality, max(0, 1 - Var(resid) / Var(seasonal + resid))
+(Wang, Smith and Hyndman, 2006), tells which periods are worth modelling (e.g. in
+ARIMA or Holt-Winters).
+"""
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+from transformation.pyramid import aggregate_by
+
+
+# Candidate periods of hourly data.
+SEASONAL_PERIODS = {'24h': 24, '7d': 7 * 24}
+
+
+def get_trend_filter(period: int) -> np.ndarray:
+    """Weights of the centered moving average of `period` values: a 2 x period
+    moving average for even periods, so that it stays centered."""
+    if period % 2 == 0:
+        return np.array([0.5] + [1] * (period - 1) + [0.5]) / period
+    return np.repeat(1.0 / period, period)
+
+
+def get_trend(values: np.ndarray, period: int) -> np.ndarray:
+    """Centered moving average of every column of `values`, missing (NaN) where the
+    window doesn't fit."""
+    filt = get_trend_filter(period)
+    trend = np.full(values.shape, np.nan)
+    head = (len(filt) - 1) // 2
+    trend[head:head + len(values) - len(filt) + 1] = fftconvolve(values, filt[:, None], mode='valid', axes=0)
+    return trend
+
+
+def decompose(values: np.ndarray, period: int) -> dict[str, np.ndarray]:
+    """Additive decomposition of every column of `values`.
+
+    Args:
+        values (ndarray): (time, columns) array without missing values.
+        period (int): number of observations per cycle.
+
+    Returns:
+        dict: `trend`, `seasonal` and `resid`, arrays shaped as `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    # The trend convolution would spread a missing value over the whole column.
+    if np.isnan(values).any():
+        raise ValueError('Missing values can\'t be decomposed, fill or drop them first')
+    if len(values) < 2 * period:
+        raise ValueError(f'{len(values)} observations are not enough for a period of {period}, at least 2 cycles are needed')
+
+    trend = get_trend(values, period)
+    detrended = values - trend
+
+    # Mean of each position of the period, over the cycles with a trend.
+    nr_cycles = -(-len(values) // period)
+    cycles = np.full((nr_cycles * period, values.shape[1]), np.nan)
+    cycles[:len(values)] = detrended
+    cycles = cycles.reshape(nr_cycles, period, values.shape[1])
+    with np.errstate(invalid='ignore'):
+        averages = np.nansum(cycles, axis=0) / (~np.isnan(cycles)).sum(axis=0)
+    averages -= averages.mean(axis=0)
+
+    seasonal = np.tile(averages, (nr_cycles, 1))[:len(values)]
+    return {'trend': trend, 'seasonal': seasonal, 'resid': detrended - seasonal}
+
+
+def seasonal_strength(seasonal: np.ndarray, resid: np.ndarray) -> np.ndarray:
+    """Strength of the seasonality of every column, between 0 (none) and 1, over
+    the observations with a residual."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.nanvar(resid, axis=0) / np.nanvar(np.where(np.isnan(resid), np.nan, seasonal + resid), axis=0)
+    return np.maximum(0.0, 1 - ratio)
+
+
+def decompose_frame(df: pd.DataFrame, columns: list[str], periods: dict[str, int] = SEASONAL_PERIODS, gran_level: str | None = 'h') -> dict[str, dict]:
+    """Decompose `columns` of `df` for every period of `periods` in one pass each.
+    The columns are aggregated to `gran_level` (mean, missing periods filled
+    forward, as in `stationarity.analyze`) first, unless it is None. Leading
+    periods, before every column has a value, are dropped.
+
+    Args:
+        df (DataFrame): Dataframe with time series information.
+        columns (list[str]): columns to decompose.
+        periods (dict[str, int], optional): name to number of observations per
+            cycle. Defaults to SEASONAL_PERIODS.
+        gran_level (str | None, optional): Defaults to 'h'.
+
+    Returns:
+        dict: period name to its `trend`, `seasonal` and `resid` DataFrames and the
+            `strength` of the seasonality of each column.
+    """
+    data = df[columns]
+    if gran_level is not None:
+        data = aggregate_by(data, gran_level=gran_level, agg_func='mean').asfreq(gran_level).ffill()
+        # Only the periods before the first value of a column are left missing.
+        data = data.dropna()
+    values = data.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    results = {}
+    for name, period in periods.items():
+        components = decompose(values, period)
+        results[name] = {
+            **{component: pd.DataFrame(array, index=data.index, columns=columns) for (component, array) in components.items()},
+            'strength': pd.Series(seasonal_strength(components['seasonal'], components['resid']), index=columns),
+        }
+    return results
+
+
+def get_seasonal_strength(df: pd.DataFrame, columns: list[str], periods: dict[str, int] = SEASONAL_PERIODS, gran_level: str | None = 'h') -> pd.DataFrame:
+    """Strength of the seasonality of every column (rows) for every period (columns),
+    see `decompose_frame`."""
+    results = decompose_frame(df, columns, periods, gran_level)
+    return pd.DataFrame({name: result['strength'] for (name, result) in results.items()})
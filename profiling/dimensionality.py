@@ -30,8 +30,8 @@ def analyze(df: pd.DataFrame, target: str, savefig=True):
 
     f = figure(figsize=(3 * HEIGHT, HEIGHT / 2))
     plot_line_chart(
-        series.index.to_list(),
-        series.to_list(),
+        series.index,
+        series.to_numpy(),
         xlabel=series.index.name,
         ylabel=target,
         title=f"{target}",
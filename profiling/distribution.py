@@ -1,72 +1,63 @@
-from numpy import array
+from numpy import array, nan
 from pandas import DataFrame, Series
 from matplotlib.pyplot import Figure, figure, subplots
 from matplotlib.gridspec import GridSpec
-from dslabs import HEIGHT, plot_multiline_chart, ts_aggregation_by, set_chart_labels
+from dslabs import HEIGHT, downsample, set_chart_labels
+from transformation.pyramid import aggregate_by
+from profiling.autocorrelation import get_autocorrelation
+from profiling.summaries import get_box_stats, summarize_frame
 
-def create_five_number_summary_fig(series: Series):
+# Pairs drawn by each scatter plot of the autocorrelation study.
+MAX_SCATTER_POINTS = 10_000
+# Granularities of the box plots and histograms, None for the series itself.
+GRANULARITIES = {None: "1 minute", "h": "Hourly", "D": "Daily"}
+
+def create_five_number_summary_fig(series: Series, summaries: dict | None = None):
     """Generate a box plot and describe the Series passed as parameter.
     This helps us get a grasp of the distribution of the values of the
     Series. 
 
     Args:
         series (Series): Series to be analyzed.
+        summaries (dict | None, optional): `summarize_frame` of the series at the
+            GRANULARITIES levels. Defaults to None, computed here.
     """
     # LA: for temperature variables, there's no point in trying the sum aggfunc
-    ss_hourly: Series = ts_aggregation_by(series, gran_level="h", agg_func='mean')
-    ss_daily: Series = ts_aggregation_by(series, gran_level="D", agg_func='mean')
+    summaries = summaries or summarize_frame(series.to_frame(), levels=list(GRANULARITIES))
 
     fig: Figure
     axs: array
-    fig, axs = subplots(2, 3, figsize=(2 * HEIGHT, HEIGHT))
-
-    set_chart_labels(axs[0, 0], title="1 MIN")
-    axs[0, 0].boxplot(series.values)
-
-    set_chart_labels(axs[0, 1], title="HOURLY")
-    axs[0, 1].boxplot(ss_hourly.values)
-
-    set_chart_labels(axs[0, 2], title="DAILY")
-    axs[0, 2].boxplot(ss_daily)
-
-    axs[1, 0].grid(False)
-    axs[1, 0].set_axis_off()
-    axs[1, 0].text(0.2, 0, str(series.describe()), fontsize="small")
+    fig, axs = subplots(2, len(GRANULARITIES), figsize=(2 * HEIGHT, HEIGHT))
 
-    axs[1, 1].grid(False)
-    axs[1, 1].set_axis_off()
-    axs[1, 1].text(0.2, 0, str(ss_hourly.describe()), fontsize="small")
+    for i, (level, name) in enumerate(GRANULARITIES.items()):
+        set_chart_labels(axs[0, i], title=name.upper())
+        axs[0, i].bxp([get_box_stats(summaries[level], series.name)])
 
-    axs[1, 2].grid(False)
-    axs[1, 2].set_axis_off()
-    axs[1, 2].text(0.2, 0, str(ss_daily.describe()), fontsize="small")
+        axs[1, i].grid(False)
+        axs[1, i].set_axis_off()
+        axs[1, i].text(0.2, 0, str(summaries[level]['describe'][series.name]), fontsize="small")
 
     return fig
 
 
-def create_variable_distribution_fig(series: Series):
+def create_variable_distribution_fig(series: Series, summaries: dict | None = None):
     """Generate histogram plots over different aggregation periods to show us the
     variable distribution with different granularities.
 
     Args:
         series (Series): Series to be analyzed.
+        summaries (dict | None, optional): `summarize_frame` of the series at the
+            GRANULARITIES levels. Defaults to None, computed here.
     """
-    ss_hourly: Series = ts_aggregation_by(series, gran_level="H", agg_func='mean')
-    ss_daily: Series = ts_aggregation_by(series, gran_level="D", agg_func='mean')
-    # ss_weekly: Series = ts_aggregation_by(series, gran_level="W", agg_func='mean')
-    # ss_monthly: Series = ts_aggregation_by(series, gran_level="M", agg_func='mean')
-    # ss_quarterly: Series = ts_aggregation_by(series, gran_level="Q", agg_func='mean')
-
-    # grans: list[Series] = [series, ss_daily, ss_weekly, ss_monthly, ss_quarterly]
-    grans: list[Series] = [series, ss_hourly, ss_daily]
-    # gran_names: list[str] = ["1 minute", "Hourly", "Daily", "Weekly", "Monthly", "Quarterly"]
-    gran_names: list[str] = ["1 minute", "Hourly", "Daily"]
-
-    fig, axs = subplots(1, len(grans), figsize=(len(grans) * HEIGHT, HEIGHT))
+    summaries = summaries or summarize_frame(series.to_frame(), levels=list(GRANULARITIES))
+
+    fig, axs = subplots(1, len(GRANULARITIES), figsize=(len(GRANULARITIES) * HEIGHT, HEIGHT))
     fig.suptitle(f"{series.name}")
-    for i in range(len(grans)):
-        set_chart_labels(axs[i], title=f"{gran_names[i]}", xlabel=series.name, ylabel="Nr records")
-        axs[i].hist(grans[i].values)
+    for i, (level, name) in enumerate(GRANULARITIES.items()):
+        set_chart_labels(axs[i], title=f"{name}", xlabel=series.name, ylabel="Nr records")
+        j = summaries[level]['columns'].index(series.name)
+        edges = summaries[level]['edges'][j]
+        axs[i].hist(edges[:-1], bins=edges, weights=summaries[level]['counts'][j])
     return fig
 
 
@@ -75,22 +66,24 @@ def create_autocorrelation_lagged_fig(series:Series, max_lag:int = 20, delta:int
     `max_lag` and `delta`. For instance, with a `max_lag` of 20 and `delta` of 10, we
     will be generating the lagged series for values 0, 10 and 20.
 
+    Lagged series are drawn from views of the values moved along the index, rather
+    than shifted copies, downsampled to the width of the chart.
+
     Args:
         series (Series): Series to be analyzed.
         max_lag (int): Maximum series lag calculalated and plotted. Defaults to 20.
         delta (int): Lag step applied on each iteration. Defaults to 10.
     """
-    def get_lagged_series(series: Series, max_lag: int, delta: int = 1):
-        lagged_series: dict = {"original": series, "lag 1": series.shift(1)}
-        for i in range(delta, max_lag + 1, delta):
-            lagged_series[f"lag {i}"] = series.shift(i)
-        return lagged_series
+    index, values = series.index, series.to_numpy(dtype=float, na_value=nan)
+    lags: dict = {"original": 0, "lag 1": 1, **{f"lag {i}": i for i in range(delta, max_lag + 1, delta)}}
 
-
-    lags = get_lagged_series(series, max_lag, delta)
     fig = figure(figsize=(3 * HEIGHT, HEIGHT))
     fig.suptitle(f"{series.name} {', '.join(lags.keys())} ({series.index[0]} until {series.index[-1]})")
-    plot_multiline_chart(series.index.to_list(), lags, xlabel=series.index, ylabel=series.name)
+    ax = fig.gca()
+    set_chart_labels(ax, xlabel=series.index.name, ylabel=series.name)
+    for name, lag in lags.items():
+        ax.plot(*downsample(index[lag:], values[:len(values) - lag], ax=ax))
+    ax.legend(list(lags.keys()), fontsize="xx-small")
     return fig
 
 def create_autocorrelation_study_fig(series: Series, max_lag:int = 10, delta:int = 1):
@@ -98,6 +91,9 @@ def create_autocorrelation_study_fig(series: Series, max_lag:int = 10, delta:int
     defined with `max_lag` and `delta`. For instance, with a `max_lag` of 20 and `delta`
     of 10, we will be generating the lagged series for values 0, 10 and 20.
 
+    The autocorrelation is computed by `profiling.autocorrelation`, scatter plots
+    show at most MAX_SCATTER_POINTS pairs, evenly spaced.
+
     Args:
         series (Series): Series to be analyzed.
         max_lag (int): Maximum series lag calculalated and plotted. Defaults to 10.
@@ -107,20 +103,48 @@ def create_autocorrelation_study_fig(series: Series, max_lag:int = 10, delta:int
     fig = figure(figsize=(4 * HEIGHT, 2 * HEIGHT), constrained_layout=True)
     gs = GridSpec(2, k, figure=fig)
 
-    series_values: list = series.tolist()
+    values = series.to_numpy(dtype=float, na_value=nan)
     for i in range(1, k + 1):
         ax = fig.add_subplot(gs[0, i - 1])
         lag = i * delta
-        ax.scatter(series.shift(lag).tolist(), series_values)
+        step = max((len(values) - lag) // MAX_SCATTER_POINTS, 1)
+        ax.scatter(values[:len(values) - lag:step], values[lag::step])
         ax.set_xlabel(f"lag {lag}")
         ax.set_ylabel("original")
     ax = fig.add_subplot(gs[1, :])
-    ax.acorr(series, maxlags=max_lag)
+    plot_autocorrelation(get_autocorrelation(series, max_lag)[None], 'acf', ax)
     ax.set_title("Autocorrelation")
     ax.set_xlabel("Lags")
     return fig
 
 
+def plot_autocorrelation(results: dict, name: str, ax):
+    """Stem plot of the `acf` or `pacf` of `get_autocorrelation` results."""
+    ax.vlines(results['lags'], 0, results[name])
+    ax.plot(results['lags'], results[name], "o", markersize=2)
+    ax.axhline(0, color="grey", linewidth=0.5)
+
+
+def create_autocorrelation_levels_fig(series: Series, max_lag: int = 48, levels: list = [None, "h", "D"]):
+    """ACF and PACF of `series` at several granularities, in periods of each one.
+
+    Args:
+        series (Series): Series to be analyzed.
+        max_lag (int): Maximum lag, in periods of each granularity. Defaults to 48.
+        levels (list): granularities, None for the series itself. Defaults to
+            [None, "h", "D"].
+    """
+    results = get_autocorrelation(series, max_lag, levels)
+    fig, axs = subplots(2, len(levels), figsize=(len(levels) * HEIGHT, 2 * HEIGHT), squeeze=False)
+    fig.suptitle(f"{series.name} autocorrelation")
+    for i, level in enumerate(levels):
+        for j, name in enumerate(["acf", "pacf"]):
+            set_chart_labels(axs[j, i], title=f"{name.upper()} ({level or 'original'})", xlabel="Lags")
+            plot_autocorrelation(results[level], name, axs[j, i])
+    fig.tight_layout()
+    return fig
+
+
 def analyze(df: DataFrame, target: str, savefig = True):
     """Print and save distribution analysis of `target` in the context of the timeseries
     dataset in `df`.
@@ -130,6 +154,7 @@ def analyze(df: DataFrame, target: str, savefig = True):
     This invokes routines that perform:
     - 5 number summary
     - Variable distribution (histogram)
+    - Autocorrelation: lagged series, lag study and ACF/PACF by granularity
 
     Args:
         df (DataFrame): Dataframe with time series information. 
@@ -138,30 +163,35 @@ def analyze(df: DataFrame, target: str, savefig = True):
     print('\n-- Distribution --')
     series: Series = df[target]
 
-    fig_variable_boxplot = create_five_number_summary_fig(series)
-    fig_variable_distribution = create_variable_distribution_fig(series)
-    # fig_autocorrelation_lags = create_autocorrelation_lagged_fig(series, max_lag=90, delta=30)
-    # fig_autocorrelation_study = create_autocorrelation_study_fig(series, max_lag = 10, delta = 1)
+    summaries = summarize_frame(df, [target], levels=list(GRANULARITIES))
+    fig_variable_boxplot = create_five_number_summary_fig(series, summaries)
+    fig_variable_distribution = create_variable_distribution_fig(series, summaries)
+    fig_autocorrelation_lags = create_autocorrelation_lagged_fig(series, max_lag=90, delta=30)
+    fig_autocorrelation_study = create_autocorrelation_study_fig(series, max_lag = 10, delta = 1)
+    fig_autocorrelation_levels = create_autocorrelation_levels_fig(series)
 
     # LA: When comparing with lagged, for better visibility, I am using the aggregated hourly series.
     # could using different max_lag/delta help out?
-    # ss_hourly = ts_aggregation_by(series, gran_level="D", agg_func='mean')
-    # fig_autocorrelation_study_hourly = create_autocorrelation_study_fig(ss_hourly, max_lag = 10, delta = 1)
+    ss_hourly = aggregate_by(series, gran_level="D", agg_func='mean')
+    fig_autocorrelation_study_hourly = create_autocorrelation_study_fig(ss_hourly, max_lag = 10, delta = 1)
 
     if savefig:
         fig_variable_boxplot.savefig(f'temp/{target}_distribution-variable-boxplot.png')
         fig_variable_distribution.savefig(f'temp/{target}_distribution-variable-histograms.png')
-        # fig_autocorrelation_lags.savefig(f'temp/{target}_distribution-autocorrelation-lags.png')
-        # fig_autocorrelation_study.savefig(f'temp/{target}_distribution-autocorrelation-study.png')
-        # fig_autocorrelation_study_hourly.savefig(f'temp/{target}_distribution-autocorrelation-study-hourly.png')
+        fig_autocorrelation_lags.savefig(f'temp/{target}_distribution-autocorrelation-lags.png')
+        fig_autocorrelation_study.savefig(f'temp/{target}_distribution-autocorrelation-study.png')
+        fig_autocorrelation_study_hourly.savefig(f'temp/{target}_distribution-autocorrelation-study-hourly.png')
+        fig_autocorrelation_levels.savefig(f'temp/{target}_distribution-autocorrelation-levels.png')
         print(f'saved temp/{target}_distribution-variable-boxplot.png')
         print(f'saved temp/{target}_distribution-variable-histograms.png')
-        # print(f'saved temp/{target}_distribution-autocorrelation-lags.png')
-        # print(f'saved temp/{target}_distribution-autocorrelation-study.png')
-        # print(f'saved temp/{target}_distribution-autocorrelation-study-hourly.png')
+        print(f'saved temp/{target}_distribution-autocorrelation-lags.png')
+        print(f'saved temp/{target}_distribution-autocorrelation-study.png')
+        print(f'saved temp/{target}_distribution-autocorrelation-study-hourly.png')
+        print(f'saved temp/{target}_distribution-autocorrelation-levels.png')
     else:
         fig_variable_boxplot.show()
         fig_variable_distribution.show()
-        #  fig_autocorrelation_lags.show()
-        #  fig_autocorrelation_study.show()
-        #  fig_autocorrelation_study_hourly.show()
+        fig_autocorrelation_lags.show()
+        fig_autocorrelation_study.show()
+        fig_autocorrelation_study_hourly.show()
+        fig_autocorrelation_levels.show()
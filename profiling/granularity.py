@@ -1,20 +1,7 @@
 from pandas import Series, DataFrame, Index, Period
 from matplotlib.pyplot import figure, show, subplots, Axes, Figure
 from dslabs import plot_line_chart, HEIGHT
-
-def ts_aggregation_by(
-    data: Series | DataFrame,
-    gran_level: str = "D",
-    agg_func: str = "mean",
-) -> Series | DataFrame:
-    df: Series | DataFrame = data.copy()
-    index: Index[Period] = df.index.to_period(gran_level)
-    df = df.groupby(by=index, dropna=True, sort=True).agg(agg_func)
-    df.index.drop_duplicates()
-    df.index = df.index.to_timestamp()
-
-    return df
-
+from transformation.pyramid import aggregate_by
 
 def analyze(df: DataFrame, target: str, savefig = True):
     """Print out granularity analysis of `target` in the context of the timeseries
@@ -40,10 +27,10 @@ def analyze(df: DataFrame, target: str, savefig = True):
     fig.suptitle(f"{target} aggregation study")
 
     for i in range(len(grans)):
-        ss: Series = ts_aggregation_by(series, grans[i])
+        ss: Series = aggregate_by(series, grans[i])
         plot_line_chart(
-            ss.index.to_list(),
-            ss.to_list(),
+            ss.index,
+            ss.to_numpy(),
             ax=axs[i],
             xlabel=f"{ss.index.name} ({grans[i]})",
             ylabel=target,
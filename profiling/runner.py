@@ -0,0 +1,112 @@
+import os
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from pyarrow import feather
+
+
+# Analyzer name to its module and the columns it reads: None for the whole frame
+# (dimensionality reports its shape), otherwise only the target.
+ANALYZERS = {
+    'dimensionality': ('profiling.dimensionality', None),
+    'granularity': ('profiling.granularity', 'target'),
+    'distribution': ('profiling.distribution', 'target'),
+    'stationarity': ('profiling.stationarity', 'target'),
+}
+
+
+def write_shared_frame(df: pd.DataFrame, dir: str) -> str:
+    """Write `df` as an uncompressed feather file that workers memory-map instead
+    of receiving a pickled copy of the frame.
+
+    Returns:
+        str: path of the file.
+    """
+    path = os.path.join(dir, 'frame.feather')
+    feather.write_feather(df, path, compression='uncompressed')
+    return path
+
+
+def read_shared_frame(path: str, columns: list[str] | None = None, freq=None) -> pd.DataFrame:
+    """Read `columns` (all by default) of the frame written by `write_shared_frame`.
+
+    Args:
+        path (str): feather file.
+        columns (list[str] | None, optional): Defaults to None, every column.
+        freq (optional): frequency of the index, which isn't stored in the file.
+            Defaults to None.
+
+    Returns:
+        DataFrame
+    """
+    if columns is not None:
+        # The index is stored as columns of its own, it must be read as well.
+        index = feather.read_table(path, columns=[], memory_map=True).schema.pandas_metadata['index_columns']
+        columns = [col for col in index if isinstance(col, str)] + columns
+    df = feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    df.index.freq = freq
+    return df
+
+
+def init_worker():
+    # Workers only render to files.
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def run_job(path: str, analyzer: str, target: str, freq=None, savefig=True):
+    """Run `analyzer` on `target` from the shared frame at `path`.
+
+    Returns:
+        tuple: analyzer, target and the time it took to run it (seconds).
+    """
+    from importlib import import_module
+    from matplotlib.pyplot import close
+
+    start = time.time()
+    module, columns = ANALYZERS[analyzer]
+    df = read_shared_frame(path, None if columns is None else [target], freq)
+    import_module(module).analyze(df, target, savefig=savefig)
+    close('all')
+    return analyzer, target, time.time() - start
+
+
+def run(df: pd.DataFrame, targets: list[str], analyzers: list[str] | None = None, max_workers: int | None = None, savefig=True) -> pd.DataFrame:
+    """Run every profiling analyzer on every target across a process pool, the
+    frame being shared through a memory-mapped file. Progress and timing is
+    reported for every job.
+
+    Args:
+        df (DataFrame): Dataframe with time series information, with a DatetimeIndex.
+        targets (list[str]): columns of `df` to analyze.
+        analyzers (list[str] | None, optional): keys of ANALYZERS. Defaults to None,
+            all of them.
+        max_workers (int | None, optional): size of the process pool. Defaults to
+            the number of processors on the machine.
+        savefig (bool, optional): Save generated figures to files. Defaults to True.
+
+    Returns:
+        DataFrame: wall time (seconds) of each analyzer (columns) and target (rows),
+            empty when there are no targets or analyzers.
+    """
+    start = time.time()
+    analyzers = list(ANALYZERS) if analyzers is None else analyzers
+    jobs = [(analyzer, target) for analyzer in analyzers for target in targets]
+    timings = []
+    if len(jobs) == 0:
+        return pd.DataFrame(index=pd.Index(targets, name='target'), columns=pd.Index(analyzers, name='analyzer'), dtype=float)
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = write_shared_frame(df, dir)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor:
+            futures = [executor.submit(run_job, path, analyzer, target, df.index.freq, savefig) for (analyzer, target) in jobs]
+            for future in as_completed(futures):
+                analyzer, target, elapsed = future.result()
+                timings.append({'analyzer': analyzer, 'target': target, 'seconds': elapsed})
+                print(f'profiling [{len(timings)}/{len(jobs)}] {analyzer} {target} in {elapsed:.2f}s')
+
+    print(f'profiling ran {len(jobs)} jobs in {time.time() - start:.2f}s')
+    timings = pd.DataFrame(timings).pivot(index='target', columns='analyzer', values='seconds')
+    # In the order they were given, the pivot sorts them.
+    return timings.reindex(index=targets, columns=analyzers)
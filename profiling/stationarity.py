@@ -1,11 +1,30 @@
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from numpy import ndarray, array, arange, column_stack, repeat
 from pandas import DataFrame, Series
 from matplotlib.pyplot import subplots, plot, legend, figure, Figure
 from matplotlib.axes import Axes
-from statsmodels.tsa.seasonal import DecomposeResult, seasonal_decompose
-from statsmodels.tsa.stattools import adfuller
-from dslabs import HEIGHT, set_chart_labels, ts_aggregation_by, plot_line_chart
+from statsmodels.tsa.stattools import adfuller, kpss
+from statsmodels.tsa.tsatools import freq_to_period
+from dslabs import HEIGHT, set_chart_labels, plot_line_chart
+from preprocess.cache import fingerprint_frame
+from profiling.decomposition import decompose, get_seasonal_strength
+from transformation import smoothing
+from transformation.pyramid import aggregate_by
 from utils import log_execution_time
 
+# Transformations tested by `run_stationarity_tests`, applied after aggregation.
+STATIONARITY_TRANSFORMATIONS = {
+    'raw': lambda series: series,
+    'd=1': lambda series: series.diff(),
+    'd=2': lambda series: series.diff().diff(),
+    'smoothed': lambda series: smoothing.run(series, window=7),
+}
+
+# Significance level of both tests.
+STATIONARITY_ALPHA = 0.05
+
 def plot_components(
     series: Series
 ) -> list[Axes]:
@@ -22,12 +41,13 @@ def plot_components(
     Returns:
         Figure: Figure with series components decomposed.
     """
-    decomposition: DecomposeResult = seasonal_decompose(series, model="add")
+    # Period inferred from the frequency of the index, as seasonal_decompose does.
+    decomposition: dict = decompose(series.to_numpy(dtype=float)[:, None], freq_to_period(series.index.freq))
     components: dict = {
         "observed": series,
-        "trend": decomposition.trend,
-        "seasonal": decomposition.seasonal,
-        "residual": decomposition.resid,
+        "trend": Series(decomposition["trend"][:, 0], index=series.index),
+        "seasonal": Series(decomposition["seasonal"][:, 0], index=series.index),
+        "residual": Series(decomposition["resid"][:, 0], index=series.index),
     }
     rows: int = len(components)
     fig: Figure
@@ -54,15 +74,15 @@ def plot_with_mean(series:Series):
     """
     fig = figure(figsize=(3 * HEIGHT, HEIGHT))
     plot_line_chart(
-        series.index.to_list(),
-        series.to_list(),
+        series.index,
+        series.to_numpy(),
         xlabel=series.index.name,
         ylabel=series.name,
         title=f"{series.name} stationary study",
         name="original",
     )
-    n: int = len(series)
-    plot(series.index, [series.mean()] * n, "r-", label="mean")
+    # A constant line only needs its two ends.
+    plot(series.index[[0, -1]], [series.mean()] * 2, "r-", label="mean")
     legend()
     fig.tight_layout()
     return fig
@@ -79,26 +99,24 @@ def plot_with_binned_mean(series:Series, bins:int = 10):
         Figure: Figure with binned mean
     """
     n: int = len(series)
-    mean_line: list[float] = []
-
-    for i in range(bins):
-        segment: Series = series[i * n // bins : (i + 1) * n // bins]
-        mean_value: list[float] = [segment.mean()] * (n // bins)
-        mean_line += mean_value
-    mean_line += [mean_line[-1]] * (n - len(mean_line))
+    width: int = n // bins
+    means: ndarray = array([series.iloc[i * n // bins : (i + 1) * n // bins].mean() for i in range(bins)])
+    # Each mean is drawn flat over `width` points, the last one up to the end of the
+    # series: the two ends of every step are enough to draw the same line.
+    ends: ndarray = column_stack([arange(bins) * width, arange(1, bins + 1) * width - 1])
+    ends[-1, 1] = n - 1
 
     fig = figure(figsize=(3 * HEIGHT, HEIGHT))
     plot_line_chart(
-        series.index.to_list(),
-        series.to_list(),
+        series.index,
+        series.to_numpy(),
         xlabel=series.index.name,
         ylabel=series.name,
         title=f"{series.name} stationary study",
         name="original",
         show_stdev=True,
     )
-    n: int = len(series)
-    plot(series.index, mean_line, "r-", label="mean")
+    plot(series.index[ends.ravel()], repeat(means, 2), "r-", label="mean")
     legend()
     fig.tight_layout()
     return fig
@@ -144,7 +162,7 @@ def analyze(df: DataFrame, target: str, savefig=True):
     """
     print('\n-- Stationarity --')
     series = df[target]
-    ss_hourly: Series = ts_aggregation_by(series, gran_level="d", agg_func='mean')
+    ss_hourly: Series = aggregate_by(series, gran_level="d", agg_func='mean')
     ss_hourly = ss_hourly.asfreq('d')
     ss_hourly = ss_hourly.ffill()
 
@@ -155,6 +173,10 @@ def analyze(df: DataFrame, target: str, savefig=True):
     is_stationary= eval_stationarity_adf(ss_hourly)
     print(f"The series {('is' if is_stationary else 'is not')} stationary")
 
+    # Candidate seasonal periods of the hourly series, for ARIMA/Holt-Winters.
+    print("Seasonal strength:")
+    print(get_seasonal_strength(df, [target]))
+
     if savefig:
         fig_components.savefig(f'temp/{target}_stationary-components.png')
         fig_mean.savefig(f'temp/{target}_stationary-mean.png')
@@ -166,3 +188,122 @@ def analyze(df: DataFrame, target: str, savefig=True):
         fig_components.show()
         fig_mean.show()
         fig_binned_mean.show()
+
+
+def get_stationarity_tests(values: ndarray, lags: int | None = None, regression: str = 'c') -> dict:
+    """ADF and KPSS tests of `values`. Note that their null hypotheses are opposite:
+    ADF rejects a unit root (stationary when p-value <= alpha), KPSS rejects
+    stationarity (stationary when p-value > alpha).
+
+    Args:
+        values (ndarray): series to test, without missing values.
+        lags (int | None, optional): lag order of both tests. Defaults to None,
+            chosen by AIC for ADF and by Hobijn et al. for KPSS, which is the
+            expensive part of the tests.
+        regression (str, optional): 'c' (constant) or 'ct' (constant and trend).
+            Defaults to 'c'.
+
+    Returns:
+        dict: statistic, p-value and lags of each test, and their verdicts.
+    """
+    if lags is None:
+        adf = adfuller(values, regression=regression, autolag='AIC')
+        kpss_result = kpss(values, regression=regression, nlags='auto')
+    else:
+        adf = adfuller(values, maxlag=lags, regression=regression, autolag=None)
+        kpss_result = kpss(values, regression=regression, nlags=lags)
+    return {
+        'adf_statistic': adf[0],
+        'adf_pvalue': adf[1],
+        'adf_lags': adf[2],
+        'kpss_statistic': kpss_result[0],
+        'kpss_pvalue': kpss_result[1],
+        'kpss_lags': kpss_result[2],
+        'adf_stationary': adf[1] <= STATIONARITY_ALPHA,
+        'kpss_stationary': kpss_result[1] > STATIONARITY_ALPHA,
+    }
+
+
+def run_stationarity_job(series: Series, windows: list[int | None], step: int | None, lags: int | None, regression: str) -> list[dict]:
+    """Tests of `series` as a whole (window None) and over rolling windows of
+    each size, moved by `step` periods (by default, the window size)."""
+    rows = []
+    with warnings.catch_warnings():
+        # KPSS warns when the p-value is outside of its lookup table.
+        warnings.simplefilter('ignore')
+        for window in windows:
+            size = len(series) if window is None else window
+            for start in range(0, len(series) - size + 1, step or size):
+                values = series.iloc[start:start + size]
+                rows.append({
+                    'window': window,
+                    'start': values.index[0],
+                    'end': values.index[-1],
+                    **get_stationarity_tests(values.to_numpy(dtype=float), lags, regression),
+                })
+    return rows
+
+
+_stationarity_cache: dict[tuple, list[dict]] = {}
+
+
+def run_stationarity_tests(
+    df: DataFrame,
+    columns: list[str],
+    transformations: list[str] = list(STATIONARITY_TRANSFORMATIONS),
+    windows: list[int | None] = [None],
+    step: int | None = None,
+    lags: int | None = None,
+    regression: str = 'c',
+    gran_level: str = 'D',
+    max_workers: int | None = None,
+) -> DataFrame:
+    """Run ADF and KPSS on every column and transformation of `df`, over the whole
+    series and over rolling windows, across a process pool. Each series is
+    aggregated to `gran_level` (mean, missing periods filled forward) as in
+    `analyze` before being transformed. Results are cached by series fingerprint
+    and test parameters.
+
+    Args:
+        df (DataFrame): Dataframe with time series information.
+        columns (list[str]): columns to test.
+        transformations (list[str], optional): keys of STATIONARITY_TRANSFORMATIONS.
+            Defaults to all of them.
+        windows (list[int | None], optional): window sizes in periods, None for the
+            whole series. Defaults to [None].
+        step (int | None, optional): periods between windows. Defaults to None,
+            the window size.
+        lags (int | None, optional): fixed lag order, see `get_stationarity_tests`.
+            Defaults to None.
+        regression (str, optional): Defaults to 'c'.
+        gran_level (str, optional): Defaults to 'D'.
+        max_workers (int | None, optional): size of the process pool. Defaults to
+            the number of processors on the machine.
+
+    Returns:
+        DataFrame: a row per column, transformation and window.
+    """
+    start = time.time()
+    params = (tuple(windows), step, lags, regression)
+    jobs = {}
+    for col in columns:
+        series = aggregate_by(df[col], gran_level=gran_level, agg_func='mean').asfreq(gran_level).ffill()
+        for name in transformations:
+            transformed = STATIONARITY_TRANSFORMATIONS[name](series).dropna()
+            jobs[(col, name)] = (fingerprint_frame(transformed), transformed)
+
+    missing = {job: series for (job, (key, series)) in jobs.items() if (key, *params) not in _stationarity_cache}
+    if len(missing) > 0:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_stationarity_job, series, windows, step, lags, regression): job for (job, series) in missing.items()}
+            for future in as_completed(futures):
+                (col, name) = futures[future]
+                _stationarity_cache[(jobs[(col, name)][0], *params)] = future.result()
+
+    rows = [
+        {'column': col, 'transformation': name, **row}
+        for ((col, name), (key, _)) in jobs.items()
+        for row in _stationarity_cache[(key, *params)]
+    ]
+    print(f'run_stationarity_tests ran {len(missing)} of {len(jobs)} series in {time.time() - start:.2f}s')
+    return DataFrame(rows)
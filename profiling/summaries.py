@@ -0,0 +1,199 @@
+"""Distribution summaries of many columns at several granularities: the statistics
+of `Series.describe` (count, mean, std, min, quartiles, max), the box plot
+whiskers and histogram counts over fixed edges, computed for all the columns of a
+granularity at once so that figures are drawn from them instead of raw values.
+
+Moments and histogram counts are accumulated over chunks of rows and merged, so
+they can be combined across chunks (or frames) with `merge_moments` and a sum of
+the counts. Quartiles are exact, the ones of `describe`.
+"""
+import numpy as np
+import pandas as pd
+from transformation.pyramid import aggregate_by
+
+
+# Granularities summarized by default, None for the frame itself.
+SUMMARY_LEVELS = [None, 'h', 'D']
+# Bins of the histograms, the default of `matplotlib.pyplot.hist`.
+HISTOGRAM_BINS = 10
+# Rows processed at once.
+SUMMARY_CHUNK_SIZE = 2 ** 16
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+def get_moments(values: np.ndarray) -> dict[str, np.ndarray]:
+    """Count, mean, sum of squared deviations (m2), min and max of every column of
+    `values`, a (rows, columns) array where NaN are missing values."""
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, values, 0.0).sum(axis=0) / count
+        m2 = np.where(valid, values - mean, 0.0)
+    return {
+        'count': count,
+        'mean': np.where(count > 0, mean, 0.0),
+        'm2': np.square(m2).sum(axis=0),
+        'min': np.where(valid, values, np.inf).min(axis=0, initial=np.inf),
+        'max': np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf),
+    }
+
+
+def merge_moments(a: dict[str, np.ndarray], b: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Moments of the union of the rows of `a` and `b` (Chan et al.)."""
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(count > 0, b['count'] / count, 0.0)
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * weight,
+        'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * weight,
+        'min': np.minimum(a['min'], b['min']),
+        'max': np.maximum(a['max'], b['max']),
+    }
+
+
+def get_edges(low: np.ndarray, high: np.ndarray, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    """(columns, bins + 1) evenly spaced edges between `low` and `high` of every
+    column, widened by 0.5 on each side when they are equal, as `numpy.histogram`."""
+    low, high = np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64)
+    empty = ~np.isfinite(low) | ~np.isfinite(high)
+    low, high = np.where(empty, 0.0, low), np.where(empty, 1.0, high)
+    equal = low == high
+    low, high = np.where(equal, low - 0.5, low), np.where(equal, high + 0.5, high)
+    return np.linspace(low, high, bins + 1, axis=1)
+
+
+def get_counts(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Histogram counts of every column of `values` over its row of `edges`, as
+    `numpy.histogram`: bins are closed on the left, the last one on both sides, and
+    values out of the edges are left out.
+
+    Returns:
+        ndarray: (columns, bins) counts, which add up across chunks of rows.
+    """
+    nr_columns, bins = edges.shape[0], edges.shape[1] - 1
+    columns = np.arange(nr_columns)
+    first, last = edges[:, 0], edges[:, -1]
+    with np.errstate(invalid='ignore'):
+        valid = (values >= first) & (values <= last)
+        index = np.where(valid, (values - first) * (bins / (last - first)), 0).astype(np.intp)
+    index[index == bins] -= 1
+    # Correct the bin computed with the width where rounding put it off by one.
+    index -= values < edges[columns, index]
+    index += (values >= edges[columns, index + 1]) & (index != bins - 1)
+    flat = (index + columns * bins)[valid]
+    return np.bincount(flat, minlength=nr_columns * bins).reshape(nr_columns, bins)
+
+
+def get_level_frame(df: pd.DataFrame, level: str | None) -> pd.DataFrame:
+    """`df` averaged by `level` (periods without records are left out), None keeps
+    the frame as is."""
+    if level is None:
+        return df
+    return aggregate_by(df, gran_level=level, agg_func='mean')
+
+
+def summarize(values: np.ndarray, bins: int = HISTOGRAM_BINS, chunk_size: int = SUMMARY_CHUNK_SIZE) -> dict[str, np.ndarray]:
+    """Summary of every column of `values`: moments and quartiles, box plot whiskers
+    (the most extreme values within 1.5 IQR of the quartiles) with the number of
+    fliers past them, and histogram counts over `bins` edges between min and max.
+
+    Args:
+        values (ndarray): (rows, columns) array, NaN are missing values.
+        bins (int, optional): Defaults to HISTOGRAM_BINS.
+        chunk_size (int, optional): rows per chunk. Defaults to SUMMARY_CHUNK_SIZE.
+
+    Returns:
+        dict: arrays with an entry per column (`count`, `mean`, `std`, `min`, `q1`,
+            `median`, `q3`, `max`, `whislo`, `whishi`, `nr_fliers`), `edges`
+            (columns, bins + 1) and `counts` (columns, bins).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    chunks = [values[start:start + chunk_size] for start in range(0, max(len(values), 1), chunk_size)]
+
+    moments = get_moments(chunks[0])
+    for chunk in chunks[1:]:
+        moments = merge_moments(moments, get_moments(chunk))
+    count = moments['count']
+    empty = count == 0
+
+    quartiles = np.full((3, values.shape[1]), np.nan)
+    if not empty.all():
+        quartiles[:, ~empty] = np.nanquantile(values[:, ~empty], [0.25, 0.5, 0.75], axis=0)
+    (q1, median, q3) = quartiles
+    (low, high) = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+
+    edges = get_edges(moments['min'], moments['max'], bins)
+    counts = np.zeros((values.shape[1], bins), dtype=np.int64)
+    (whislo, whishi, nr_fliers) = (np.full(values.shape[1], np.inf), np.full(values.shape[1], -np.inf), 0)
+    with np.errstate(invalid='ignore'):
+        for chunk in chunks:
+            counts += get_counts(chunk, edges)
+            whislo = np.minimum(whislo, np.where(chunk >= low, chunk, np.inf).min(axis=0, initial=np.inf))
+            whishi = np.maximum(whishi, np.where(chunk <= high, chunk, -np.inf).max(axis=0, initial=-np.inf))
+            nr_fliers = nr_fliers + ((chunk < low) | (chunk > high)).sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(moments['m2'] / (count - 1))
+    missing = lambda array: np.where(empty, np.nan, array)
+    return {
+        'count': count.astype(np.float64),
+        'mean': missing(moments['mean']),
+        'std': np.where(count > 1, std, np.nan),
+        'min': missing(moments['min']),
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'max': missing(moments['max']),
+        'whislo': missing(whislo),
+        'whishi': missing(whishi),
+        'nr_fliers': nr_fliers,
+        'edges': edges,
+        'counts': counts,
+    }
+
+
+def summarize_frame(df: pd.DataFrame, columns: list[str] | None = None, levels: list[str | None] = SUMMARY_LEVELS, bins: int = HISTOGRAM_BINS) -> dict[str | None, dict]:
+    """Distribution summaries of `columns` of `df` at every granularity of `levels`,
+    all the columns of a granularity at once.
+
+    Args:
+        df (DataFrame): Dataframe with time series information.
+        columns (list[str] | None, optional): Defaults to None, every column.
+        levels (list[str | None], optional): granularities, None for `df` itself.
+            Defaults to SUMMARY_LEVELS.
+        bins (int, optional): Defaults to HISTOGRAM_BINS.
+
+    Returns:
+        dict: level to the `summarize` arrays of its columns, plus `columns` and
+            `describe`, a DataFrame with the rows of `Series.describe`.
+    """
+    data = df if columns is None else df[columns]
+    results = {}
+    for level in levels:
+        summary = summarize(get_level_frame(data, level).to_numpy(dtype=np.float64, na_value=np.nan), bins)
+        summary['columns'] = list(data.columns)
+        summary['describe'] = pd.DataFrame(
+            [summary[name] for name in ['count', 'mean', 'std', 'min', 'q1', 'median', 'q3', 'max']],
+            index=DESCRIBE_INDEX, columns=data.columns,
+        )
+        results[level] = summary
+    return results
+
+
+def get_box_stats(summary: dict, column: str) -> dict:
+    """Statistics of `column` in a `summarize_frame` summary, for `Axes.bxp`. The
+    values past the whiskers aren't kept: min and max stand for them."""
+    i = summary['columns'].index(column)
+    fliers = [summary[name][i] for name in ['min', 'max'] if summary[name][i] < summary['whislo'][i] or summary[name][i] > summary['whishi'][i]]
+    return {
+        'label': column,
+        'med': summary['median'][i],
+        'q1': summary['q1'][i],
+        'q3': summary['q3'][i],
+        'whislo': summary['whislo'][i],
+        'whishi': summary['whishi'][i],
+        'mean': summary['mean'][i],
+        'fliers': np.array(fliers),
+    }
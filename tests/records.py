@@ -0,0 +1,35 @@
+"""Synthetic telemetry records shaped as the monthly csv files."""
+import os
+import numpy as np
+import pandas as pd
+from preprocess.ingestion import CSV_SCHEMA, DATETIME_COL
+
+
+def make_records(start: str, minutes: int, density: float = 1.0, seed: int = 0) -> pd.DataFrame:
+    """Records on `density` of the minutes from `start`, with missing values, grid
+    sessions and invalid (zero voltage) records."""
+    rng = np.random.default_rng(seed)
+    offsets = np.flatnonzero(rng.random(minutes) < density)
+    df = pd.DataFrame({DATETIME_COL: pd.Timestamp(start, tz='UTC') + pd.to_timedelta(offsets, unit='min')})
+    for col, dtype in CSV_SCHEMA.items():
+        if dtype == 'boolean':
+            values = pd.array((offsets // 90) % 3 == 0, dtype='boolean')
+            values[rng.random(len(offsets)) < 0.2] = pd.NA
+        else:
+            values = 20 + 5 * np.sin(offsets / 300) + rng.normal(0, 0.1, len(offsets))
+            values[rng.random(len(offsets)) < 0.2] = np.nan
+        df[col] = values
+    df.loc[rng.random(len(offsets)) < 0.05, 'system_battery_voltage'] = 0
+    return df
+
+
+def write_csv_files(dir: str, records: pd.DataFrame, bounds: list[pd.Timestamp], overlap: pd.Timedelta) -> list[str]:
+    """Split `records` into a csv file per pair of consecutive `bounds`, each file
+    also holding the `overlap` before its start."""
+    paths = []
+    times = records[DATETIME_COL]
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        path = os.path.join(dir, f'{i:02d}.csv')
+        records[(times >= start - overlap) & (times < end)].to_csv(path, index=False)
+        paths.append(path)
+    return paths
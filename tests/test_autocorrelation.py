@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from statsmodels.tsa.stattools import acf as sm_acf, pacf as sm_pacf
+from profiling.autocorrelation import acf, pacf
+
+
+def make_values(n: int, seed: int) -> np.ndarray:
+    """AR(2) process with a daily cycle."""
+    rng = np.random.default_rng(seed)
+    values = np.zeros(n)
+    noise = rng.normal(size=n)
+    for t in range(2, n):
+        values[t] = 0.6 * values[t - 1] - 0.2 * values[t - 2] + noise[t]
+    return values + 3 * np.sin(2 * np.pi * np.arange(n) / 24)
+
+
+@pytest.mark.parametrize('max_lag', [1, 24, 60])
+def test_acf_and_pacf_match_statsmodels(max_lag):
+    values = make_values(1000, seed=11)
+
+    rho = acf(values, max_lag)
+    np.testing.assert_allclose(rho, sm_acf(values, nlags=max_lag, fft=False), atol=1e-10)
+    np.testing.assert_allclose(pacf(rho), sm_pacf(values, nlags=max_lag, method='ldb'), atol=1e-8)
+
+
+def test_acf_of_every_column():
+    values = np.stack([make_values(500, seed) for seed in range(3)], axis=1)
+
+    rho = acf(values, 30)
+    partial = pacf(rho)
+    for col in range(values.shape[1]):
+        np.testing.assert_allclose(rho[:, col], sm_acf(values[:, col], nlags=30, fft=False), atol=1e-10)
+        np.testing.assert_allclose(partial[:, col], sm_pacf(values[:, col], nlags=30, method='ldb'), atol=1e-8)
+
+
+def test_acf_skips_missing_values():
+    values = make_values(400, seed=12)
+    missing = values.copy()
+    missing[np.random.default_rng(13).random(400) < 0.2] = np.nan
+
+    # Mean of the observed pairs of each lag, weighted as the biased estimator.
+    centered = missing - np.nanmean(missing)
+    acov = np.array([np.nanmean(centered[:400 - k] * centered[k:]) * (400 - k) / 400 for k in range(21)])
+    np.testing.assert_allclose(acf(missing, 20), acov / acov[0], atol=1e-10)
@@ -0,0 +1,48 @@
+import dslabs
+import numpy as np
+import pandas as pd
+import pytest
+from preprocess import aggregation_func_by_col, preprocess
+from preprocess.ingestion import DATETIME_COL
+from transformation.buckets import ts_aggregation_by
+from transformation.pyramid import aggregate_by
+from tests.records import make_records
+
+
+def make_frame(density: float) -> pd.DataFrame:
+    df = preprocess(make_records('2023-01-01', 30 * 1440, density=density, seed=6), DATETIME_COL)
+    if density < 1:
+        # Drop a few days altogether, so that some periods have no records.
+        df = df[(df.index.day < 10) | (df.index.day > 16)]
+    return df[[col for col in aggregation_func_by_col if col in df.columns]]
+
+
+@pytest.mark.parametrize('density', [1.0, 0.5])
+@pytest.mark.parametrize('gran_level', ['h', 'D'])
+def test_ts_aggregation_by_matches_dslabs(gran_level, density):
+    df = make_frame(density)
+    funcs = {col: func for (col, func) in aggregation_func_by_col.items() if col in df.columns}
+
+    expected = dslabs.ts_aggregation_by(df, gran_level=gran_level, agg_func=funcs)
+    result = ts_aggregation_by(df, gran_level=gran_level, agg_func=funcs)
+    assert result.index.freq == expected.index.freq
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-5, atol=1e-4)
+
+
+@pytest.mark.parametrize('density', [1.0, 0.5])
+@pytest.mark.parametrize('gran_level', ['h', 'D', 'W'])
+def test_aggregate_by_matches_dslabs(gran_level, density):
+    df = make_frame(density)
+    funcs = {col: func for (col, func) in aggregation_func_by_col.items() if col in df.columns}
+
+    expected = dslabs.ts_aggregation_by(df, gran_level=gran_level, agg_func=funcs)
+    result = aggregate_by(df, gran_level, funcs)
+    assert result.index.freq == expected.index.freq
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-5, atol=1e-4)
+
+
+def test_bucket_index_freq_without_enough_buckets():
+    index = pd.date_range('2023-01-01', periods=90, freq='min', name=DATETIME_COL)
+    series = pd.Series(np.arange(90, dtype=float), index=index)
+
+    assert ts_aggregation_by(series, 'h', 'sum').index.freq == dslabs.ts_aggregation_by(series, 'h', 'sum').index.freq
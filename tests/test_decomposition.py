@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.seasonal import seasonal_decompose
+from profiling.decomposition import decompose, decompose_frame
+
+
+def make_frame(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(14)
+    hours = np.arange(n)
+    index = pd.date_range('2023-01-02', periods=n, freq='h', name='registered_at')
+    return pd.DataFrame({
+        'daily': 20 + 0.01 * hours + 3 * np.sin(2 * np.pi * hours / 24) + rng.normal(size=n),
+        'weekly': 50 + 5 * np.cos(2 * np.pi * hours / 168) + rng.normal(size=n),
+    }, index=index)
+
+
+@pytest.mark.parametrize('period', [7, 24, 168])
+@pytest.mark.parametrize('n', [24 * 30, 24 * 30 + 5])
+def test_decompose_matches_seasonal_decompose(period, n):
+    df = make_frame(n)
+
+    components = decompose(df.to_numpy(), period)
+    for (i, col) in enumerate(df.columns):
+        expected = seasonal_decompose(df[col], model='additive', period=period)
+        for name in ['trend', 'seasonal', 'resid']:
+            np.testing.assert_allclose(components[name][:, i], getattr(expected, name).to_numpy(), atol=1e-9)
+
+
+def test_decompose_frame_aggregates_first():
+    df = make_frame(24 * 30)
+    minutes = df.resample('min').ffill()
+
+    results = decompose_frame(minutes, list(df.columns), {'24h': 24})
+    expected = seasonal_decompose(minutes['daily'].resample('h').mean(), model='additive', period=24)
+    np.testing.assert_allclose(results['24h']['seasonal']['daily'].to_numpy(), expected.seasonal.to_numpy(), atol=1e-9)
+
+
+def test_decompose_rejects_missing_values():
+    values = make_frame(24 * 30).to_numpy()
+    values[100, 0] = np.nan
+    with pytest.raises(ValueError):
+        decompose(values, 24)
+
+
+def test_decompose_frame_drops_leading_missing_periods():
+    df = make_frame(24 * 30)
+    # 'weekly' starts two days late, and misses a few hours later on.
+    df.iloc[:48, 1] = np.nan
+    df.iloc[200:205, 1] = np.nan
+
+    results = decompose_frame(df, list(df.columns), {'24h': 24})
+    seasonal = results['24h']['seasonal']
+    assert seasonal.index[0] == df.index[48]
+    assert not np.isnan(results['24h']['strength']).any()
+    expected = seasonal_decompose(df['weekly'].iloc[48:].ffill(), model='additive', period=24)
+    np.testing.assert_allclose(seasonal['weekly'].to_numpy(), expected.seasonal.to_numpy(), atol=1e-9)
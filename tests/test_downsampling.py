@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dslabs.downsampling import downsample
+
+
+def make_series(n: int, seed: int = 0) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2023-01-01', periods=n, freq='min', tz='UTC')
+    return index, np.cumsum(rng.normal(size=n))
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_short_series_are_kept_whole(method):
+    index, values = make_series(50)
+    x, y = downsample(index, values, method=method, nr_points=50)
+    np.testing.assert_array_equal(x, index.tz_convert(None).to_numpy())
+    np.testing.assert_array_equal(y, values)
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_first_and_last_points_are_kept(method):
+    index, values = make_series(10_000)
+    x, y = downsample(index, values, method=method, nr_points=100)
+    assert x[0] == index[0].tz_convert(None) and x[-1] == index[-1].tz_convert(None)
+    assert y[0] == values[0] and y[-1] == values[-1]
+    assert (np.diff(x) > np.timedelta64(0)).all()
+
+
+@pytest.mark.parametrize('nr_points', [3, 10, 333, 1000])
+def test_lttb_returns_nr_points(nr_points):
+    index, values = make_series(10_000, seed=1)
+    x, y = downsample(index, values, method='lttb', nr_points=nr_points)
+    assert len(x) == len(y) == nr_points
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    n, nr_points = 10_001, 200
+    _, values = make_series(n, seed=2)
+    x, y = downsample(np.arange(n), values, method='minmax', nr_points=nr_points)
+
+    # Same buckets as `minmax_indices`: nr_points // 2 of equal size, the last shorter.
+    size = int(np.ceil(n / (nr_points // 2)))
+    kept = set(x.tolist())
+    for start in range(0, n, size):
+        bucket = values[start:start + size]
+        assert start + int(np.argmin(bucket)) in kept
+        assert start + int(np.argmax(bucket)) in kept
+    np.testing.assert_array_equal(y, values[x])
+
+
+def test_missing_values():
+    n = 10_000
+    _, values = make_series(n, seed=3)
+    values[1000:1010] = np.nan
+    values[5000:6000] = np.nan
+
+    # Extremes ignore missing values, but a gap keeps one of them so it's drawn.
+    x, y = downsample(np.arange(n), values, method='minmax', nr_points=100)
+    assert np.isnan(y).any()
+    size = int(np.ceil(n / 50))
+    for start in range(0, n, size):
+        bucket = values[start:start + size]
+        if not np.isnan(bucket).all():
+            assert start + int(np.nanargmax(bucket)) in x and start + int(np.nanargmin(bucket)) in x
+
+    # LTTB only picks a missing value when its whole bucket is missing.
+    x, y = downsample(np.arange(n), values, method='lttb', nr_points=100)
+    assert len(x) == 100
+    assert all(5000 <= i < 6000 for i in x[np.isnan(y)])
@@ -0,0 +1,75 @@
+from math import sqrt
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, mean_squared_error, r2_score
+
+# The pipelines import the models.
+pytest.importorskip('torch')
+from pipelines.tasks.evaluate import fit_linear_trends, forecast_metrics, score_forecasts
+
+
+def sklearn_metrics(truth, predicted) -> dict[str, float]:
+    """Metrics as `evaluate` computed them before `forecast_metrics`."""
+    return {
+        'RMSE': sqrt(mean_squared_error(truth, predicted)),
+        'MAE': mean_absolute_error(truth, predicted),
+        'MAPE': mean_absolute_percentage_error(truth, predicted),
+        'R2': r2_score(truth, predicted),
+    }
+
+
+def test_fit_linear_trends_matches_sklearn():
+    rng = np.random.default_rng(8)
+    n = 500
+    data = pd.DataFrame({
+        'trend': 3 + 0.01 * np.arange(n) + rng.normal(size=n),
+        'missing': np.where(rng.random(n) < 0.3, np.nan, 10 + np.sin(np.arange(n) / 20)),
+        'constant': np.full(n, 2.0),
+    }, index=pd.date_range('2023-01-01', periods=n, freq='h'))
+
+    trends = fit_linear_trends(data)
+    for (i, col) in enumerate(data.columns):
+        series = data[col].dropna()
+        size = int(len(series) * 0.8)
+        x = np.arange(len(series)).reshape(-1, 1)
+        model = LinearRegression().fit(x[:size], series.iloc[:size])
+        predicted = model.predict(x)
+
+        np.testing.assert_allclose(trends['slope'][i], model.coef_[0], atol=1e-12)
+        np.testing.assert_allclose(trends['intercept'][i], model.intercept_, rtol=1e-9)
+        for (dataset, part) in [('train', slice(None, size)), ('test', slice(size, None))]:
+            expected = sklearn_metrics(series.iloc[part], predicted[part])
+            for (metric, value) in expected.items():
+                np.testing.assert_allclose(trends[dataset][metric][i], value, rtol=1e-7, atol=1e-9)
+
+
+def test_forecast_metrics_match_sklearn():
+    rng = np.random.default_rng(9)
+    truth = 20 + rng.normal(size=300)
+    # A row per candidate, including a perfect one.
+    predictions = np.stack([truth + rng.normal(0, scale, 300) for scale in [0.0, 0.1, 1.0, 5.0]])
+
+    metrics = score_forecasts(pd.Series(truth), list(predictions))
+    for (i, predicted) in enumerate(predictions):
+        for (metric, value) in sklearn_metrics(truth, predicted).items():
+            np.testing.assert_allclose(metrics[metric][i], value, rtol=1e-9, atol=1e-12)
+
+    # Masked values are left out, as if they weren't there.
+    mask = rng.random(300) < 0.7
+    masked = forecast_metrics(truth, predictions, mask)
+    for (i, predicted) in enumerate(predictions):
+        for (metric, value) in sklearn_metrics(truth[mask], predicted[mask]).items():
+            np.testing.assert_allclose(masked[metric][i], value, rtol=1e-9, atol=1e-12)
+
+
+def test_score_forecasts_in_original_units():
+    rng = np.random.default_rng(10)
+    truth = 20 + rng.normal(size=100)
+    predicted = truth + rng.normal(size=100)
+    (mean, scale) = (20.0, 2.0)
+
+    scaled = score_forecasts((truth - mean) / scale, [(predicted - mean) / scale], stats=(mean, scale))
+    for (metric, value) in sklearn_metrics(truth, predicted).items():
+        np.testing.assert_allclose(scaled[metric][0], value, rtol=1e-9)
@@ -0,0 +1,51 @@
+import os
+import pandas as pd
+import pytest
+from preprocess import preprocess
+from preprocess.ingestion import DATETIME_COL, merge_records, read_csv_file
+from preprocess.incremental import read_store, update_store, write_store
+from tests.records import make_records, write_csv_files
+
+
+def split_history(dir, density, overlap):
+    records = make_records('2023-01-01', 3 * 24 * 60, density)
+    start = records[DATETIME_COL].iloc[0]
+    bounds = [start + pd.Timedelta(days=days) for days in [0, 1, 2, 4]]
+    return write_csv_files(dir, records, bounds, pd.Timedelta(overlap))
+
+
+def rebuild(paths):
+    return preprocess(merge_records([read_csv_file(path)[1] for path in paths]), DATETIME_COL)
+
+
+@pytest.mark.parametrize('density, overlap', [(1.0, '0min'), (0.3, '0min'), (0.05, '0min'), (0.3, '2h'), (1.0, '1D')])
+def test_append_matches_full_rebuild(tmp_path, density, overlap):
+    paths = split_history(tmp_path, density, overlap)
+    store = os.path.join(tmp_path, 'store')
+    for i in range(1, len(paths) + 1):
+        write_store(paths[:i], store)
+
+    pd.testing.assert_frame_equal(read_store(store), rebuild(paths), check_freq=False)
+
+
+@pytest.mark.parametrize('overlap', ['0min', '1D'])
+def test_chunked_rebuild_matches_full_rebuild(tmp_path, overlap):
+    paths = split_history(tmp_path, 0.5, overlap)
+    store = os.path.join(tmp_path, 'store')
+    write_store(paths, store, chunksize=97)
+
+    pd.testing.assert_frame_equal(read_store(store), rebuild(paths), check_freq=False)
+
+
+def test_file_before_tail_rebuilds_store(tmp_path):
+    paths = split_history(tmp_path, 1.0, '0min')
+    store = os.path.join(tmp_path, 'store')
+    write_store(paths[1:], store)
+    write_store(paths, store)
+
+    pd.testing.assert_frame_equal(read_store(store), rebuild(paths), check_freq=False)
+
+
+def test_empty_store(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        update_store([], os.path.join(tmp_path, 'store'))
@@ -0,0 +1,41 @@
+import pandas as pd
+from preprocess import is_valid_record, preprocess
+from preprocess.ingestion import DATETIME_COL, merge_records, read_csv_file, sort_records
+from tests.records import make_records
+
+
+def filter_then_deduplicate(frames):
+    """Records as the baseline kept them: invalid records dropped first, then
+    the first record of each timestamp."""
+    df = pd.concat(frames, axis=0, ignore_index=True)
+    df = df[is_valid_record(df)].sort_values(DATETIME_COL, kind='stable')
+    return df[~df[DATETIME_COL].duplicated(keep='first')].reset_index(drop=True)
+
+
+def test_merge_keeps_valid_duplicate_of_overlapping_files(tmp_path):
+    records = make_records('2023-01-01', 600, seed=1)
+    first, second = records.iloc[:400].copy(), records.iloc[300:].copy()
+    # The earlier file's copy of these minutes is invalid, the later one's isn't.
+    first.loc[[320, 350, 399], 'system_battery_voltage'] = 0
+    second.loc[[320, 350, 399], 'system_battery_voltage'] = 12.5
+    paths = [tmp_path / 'a.csv', tmp_path / 'b.csv']
+    first.to_csv(paths[0], index=False)
+    second.to_csv(paths[1], index=False)
+
+    frames = [read_csv_file(path)[1] for path in paths]
+    merged = merge_records(frames)
+    pd.testing.assert_frame_equal(merged[is_valid_record(merged)].reset_index(drop=True), filter_then_deduplicate(frames))
+
+    df = preprocess(merged, DATETIME_COL)
+    lost = records[DATETIME_COL].iloc[[320, 350, 399]]
+    assert (df.loc[lost, 'system_battery_voltage'] == 12.5).all()
+
+
+def test_sort_keeps_valid_duplicate_within_a_file():
+    records = make_records('2023-01-01', 10, seed=2)
+    copy = records.iloc[[4]].assign(system_battery_voltage=12.5)
+    records.loc[4, 'system_battery_voltage'] = 0
+    df = sort_records(pd.concat([records, copy], ignore_index=True))
+
+    assert df[DATETIME_COL].is_unique
+    assert df.loc[df[DATETIME_COL] == records[DATETIME_COL].iloc[4], 'system_battery_voltage'].item() == 12.5
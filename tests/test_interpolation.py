@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+from preprocess import gap_policy_by_col
+from preprocess.interpolation import fill_gaps
+
+
+def make_series(n: int, seed: int) -> pd.Series:
+    """Minute series with gaps of all lengths, including leading and trailing ones."""
+    rng = np.random.default_rng(seed)
+    values = 20 + 5 * np.sin(np.arange(n) / 300) + rng.normal(0, 0.1, n)
+    missing = np.zeros(n, dtype=bool)
+    for start in rng.integers(0, n, n // 50):
+        missing[start:start + rng.integers(1, 200)] = True
+    missing[:40] = True
+    missing[-90:] = True
+    index = pd.date_range('2023-01-01', periods=n, freq='min', tz='UTC')
+    return pd.Series(np.where(missing, np.nan, values), index=index, name='values')
+
+
+@pytest.mark.parametrize('col', list(gap_policy_by_col))
+@pytest.mark.parametrize('seed', [0, 1])
+def test_fill_gaps_matches_pandas_interpolate(col, seed):
+    policy = gap_policy_by_col[col]
+    series = make_series(5000, seed)
+    expected = series.bfill(limit=policy['bfill']).ffill(limit=policy['ffill']).interpolate(policy['method'])
+
+    pd.testing.assert_series_equal(fill_gaps(series, policy), expected, rtol=1e-6)
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The pipelines import the models.
+pytest.importorskip('torch')
+from pipelines.tasks.report import save_report
+from transformation.scaling import IncrementalScaler
+
+
+def test_save_report_in_target_units(tmp_path):
+    rng = np.random.default_rng(7)
+    index = pd.date_range('2023-01-01', periods=200, freq='h', name='registered_at')
+    df = pd.DataFrame({'temp': 30 + 4 * rng.normal(size=200), 'soc': rng.random(200)}, index=index)
+    predicted = df['temp'] + rng.normal(size=200)
+    (train, test, prd_train, prd_test) = (df['temp'][:150], df['temp'][150:], predicted[:150].rename(None), predicted[150:].rename(None))
+
+    scaler = IncrementalScaler().fit(df)
+    scaled = [scaler.transform(values, col='temp') for values in [train, test, prd_train, prd_test]]
+    results = save_report('model', 'temp', *scaled, path=str(tmp_path), plot=False, scaler=scaler)
+    expected = save_report('model', 'temp', train, test, prd_train, prd_test, path=None)
+
+    for dataset in ['train', 'test']:
+        for (metric, values) in expected['metrics'][dataset].items():
+            np.testing.assert_allclose(results['metrics'][dataset][metric], values)
+    pd.testing.assert_series_equal(results['predicted_test'], prd_test)
+    loaded = IncrementalScaler.load(os.path.join(tmp_path, 'model-temp-scaler.json'))
+    np.testing.assert_allclose(loaded.get_stats(['temp']), scaler.get_stats(['temp']))
+
+
+def test_pipelines_import_without_matplotlib():
+    # In a new interpreter, the test session may have loaded matplotlib already.
+    code = (
+        'import sys, pipelines.arima, pipelines.exponential_smoothing, pipelines.lstm, pipelines.lstm_exog, pipelines.rolling_mean; '
+        'print("matplotlib.pyplot" in sys.modules)'
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
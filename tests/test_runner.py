@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+# Loaded before changing directory, the style sheet path is relative. Workers
+# are forked with it.
+import dslabs
+from profiling import runner
+
+
+def make_frame() -> pd.DataFrame:
+    index = pd.date_range('2023-01-01', periods=500, freq='min', tz='UTC', name='registered_at')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'temp': rng.normal(size=500), 'soc': rng.random(500)}, index=index)
+
+
+def test_runs_every_analyzer_on_every_target(tmp_path, monkeypatch):
+    # Analyzers write their reports to temp/.
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'temp').mkdir()
+
+    timings = runner.run(make_frame(), ['temp', 'soc'], analyzers=['dimensionality'], max_workers=2, savefig=False)
+    assert timings.shape == (2, 1)
+    assert list(timings.index) == ['temp', 'soc'] and list(timings.columns) == ['dimensionality']
+    assert (timings.to_numpy() >= 0).all()
+    assert sorted(p.name for p in (tmp_path / 'temp').iterdir()) == ['soc_dimensionality.txt', 'temp_dimensionality.txt']
+
+
+def test_no_jobs():
+    df = make_frame()
+    assert runner.run(df, [], analyzers=['dimensionality']).shape == (0, 1)
+    assert runner.run(df, ['temp', 'soc'], analyzers=[]).shape == (2, 0)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from preprocess.runs import run_cumsum, run_ids, run_lengths, run_starts, time_since_change
+
+
+def make_signal(n: int, seed: int) -> pd.Series:
+    """On/off flags in runs of a few records, with missing values."""
+    rng = np.random.default_rng(seed)
+    values = np.repeat(rng.integers(0, 2, n), rng.integers(1, 6, n))[:n].astype(float)
+    values[rng.random(n) < 0.05] = np.nan
+    values[10:13] = np.nan
+    return pd.Series(values)
+
+
+def get_groups(series: pd.Series) -> pd.Series:
+    """Run ids as `preprocess` computed them before the kernels."""
+    return series.ne(series.shift()).cumsum()
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_runs_match_groupby(seed):
+    series = make_signal(1000, seed)
+    groups = get_groups(series)
+
+    np.testing.assert_array_equal(run_ids(series.to_numpy()), groups.to_numpy() - 1)
+    np.testing.assert_array_equal(run_lengths(series.to_numpy()), groups.value_counts(sort=False).sort_index().to_numpy())
+    np.testing.assert_array_equal(run_cumsum(series.to_numpy()), series.groupby(groups).cumsum().to_numpy())
+    expected = series.groupby(groups).cumcount().to_numpy()
+    np.testing.assert_array_equal(time_since_change(series.to_numpy()), expected)
+
+
+def test_time_since_change_with_tz_aware_timestamps():
+    series = make_signal(500, 2)
+    rng = np.random.default_rng(3)
+    index = pd.DatetimeIndex(pd.Timestamp('2023-03-26', tz='Europe/Lisbon') + pd.to_timedelta(np.cumsum(rng.integers(1, 90, 500)), unit='min'))
+
+    elapsed = time_since_change(series.to_numpy(), index)
+    times = pd.Series(index)
+    expected = (times - times.groupby(get_groups(series)).transform('first')).to_numpy()
+    np.testing.assert_array_equal(elapsed, expected)
+
+    # A run spanning the change to summer time lasted 2 hours, not 3.
+    index = pd.DatetimeIndex(['2023-03-26 00:30', '2023-03-26 03:30'], tz='Europe/Lisbon')
+    assert time_since_change(np.array([1.0, 1.0]), index)[1] == np.timedelta64(2, 'h')
+
+
+def test_empty_input():
+    empty = np.array([], dtype=np.float64)
+
+    assert len(run_starts(empty)) == 0
+    assert len(run_lengths(empty)) == 0
+    assert len(run_ids(empty)) == 0
+    assert len(run_cumsum(empty)) == 0
+    assert len(time_since_change(empty)) == 0
+    assert len(time_since_change(empty, pd.DatetimeIndex([], tz='UTC'))) == 0
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+from preprocess import preprocess
+from preprocess.ingestion import DATETIME_COL
+from tests.records import make_records
+
+# The pipelines (and the analyses in `transformation.smoothing`) import the models.
+pytest.importorskip('torch')
+from pipelines.tasks.prepare import prepare
+from transformation import smoothing
+
+
+@pytest.mark.parametrize('density', [1.0, 0.3])
+@pytest.mark.parametrize('window', [1, 12])
+def test_sparse_smoothing_matches_dense(density, window):
+    data = preprocess(make_records('2023-01-01', 3000, density=density, seed=3), DATETIME_COL, sparse=True)
+    dense = smoothing.run(data.to_dense(), window)
+
+    smoothed = smoothing.run(data, window).to_dense()
+    expected = dense.loc[smoothed.index[0]:]
+    assert dense.loc[:smoothed.index[0]].iloc[:-1].isna().all().all()
+    pd.testing.assert_frame_equal(smoothed, expected, check_freq=False, check_dtype=False, rtol=1e-6)
+
+
+def test_prepare_smooths_sparse_frame():
+    data = preprocess(make_records('2023-01-01', 3000, density=0.8, seed=4), DATETIME_COL, sparse=True)
+    options = {'training_pct': 0.8, 'smoothing': {'window': 12}}
+
+    (train, test) = prepare(data, options)
+    (dense_train, dense_test) = prepare(data.to_dense(), options)
+    pd.testing.assert_frame_equal(train, dense_train, check_freq=False, rtol=1e-6)
+    pd.testing.assert_frame_equal(test, dense_test)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+# `transformation.smoothing` imports the pipelines, which import the models.
+pytest.importorskip('torch')
+from profiling.stationarity import run_stationarity_tests
+
+
+COLUMNS = [
+    'column', 'transformation', 'window', 'start', 'end',
+    'adf_statistic', 'adf_pvalue', 'adf_lags', 'kpss_statistic', 'kpss_pvalue', 'kpss_lags',
+    'adf_stationary', 'kpss_stationary',
+]
+
+
+def make_frame(seed: int, days: int = 100) -> pd.DataFrame:
+    """Hourly frame, tested on its daily means: a random walk and white noise."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2023-01-01', periods=24 * days, freq='h', tz='UTC', name='registered_at')
+    return pd.DataFrame({'walk': np.cumsum(rng.normal(size=len(index))), 'noise': rng.normal(size=len(index))}, index=index)
+
+
+def test_table_has_a_row_per_column_transformation_and_window():
+    df = make_frame(seed=1)
+    result = run_stationarity_tests(df, ['walk', 'noise'], transformations=['raw', 'd=1'], windows=[None, 30], lags=2, max_workers=2)
+
+    assert list(result.columns) == COLUMNS
+    # 'raw' has 100 days, the whole series and 3 windows of 30 days. 'd=1' loses
+    # its first day, which doesn't change the number of windows.
+    counts = result.groupby(['column', 'transformation', result['window'].fillna(0)], sort=False).size()
+    assert counts.to_dict() == {
+        (col, name, window): count
+        for col in ['walk', 'noise']
+        for name in ['raw', 'd=1']
+        for (window, count) in [(0, 1), (30, 3)]
+    }
+    windows = result[result['window'] == 30]
+    assert ((windows['end'] - windows['start']) == pd.Timedelta(days=29)).all()
+    # Periods start at midnight, without the time zone, as `ts_aggregation_by` does.
+    first = pd.Timestamp('2023-01-01')
+    whole = result[result['window'].isna()]
+    assert (whole['start'] == whole['transformation'].map({'raw': first, 'd=1': first + pd.Timedelta(days=1)})).all()
+
+
+def test_fixed_lags_are_used_by_both_tests():
+    result = run_stationarity_tests(make_frame(seed=2), ['walk'], transformations=['raw'], windows=[None, 50], lags=3, max_workers=2)
+    assert (result['adf_lags'] == 3).all()
+    assert (result['kpss_lags'] == 3).all()
+
+
+def test_second_run_is_cached(capsys):
+    df = make_frame(seed=3)
+    first = run_stationarity_tests(df, ['walk', 'noise'], transformations=['raw', 'd=1'], lags=2, max_workers=2)
+    assert 'ran 4 of 4 series' in capsys.readouterr().out
+
+    second = run_stationarity_tests(df, ['walk', 'noise'], transformations=['raw', 'd=1'], lags=2, max_workers=2)
+    assert 'ran 0 of 4 series' in capsys.readouterr().out
+    pd.testing.assert_frame_equal(second, first)
+
+    # Other parameters aren't served from the cache.
+    run_stationarity_tests(df, ['walk'], transformations=['raw'], lags=1, max_workers=2)
+    assert 'ran 1 of 1 series' in capsys.readouterr().out
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from preprocess.meteo.stations import EARTH_RADIUS_KM, StationResolver
+
+
+STATIONS = pd.DataFrame({
+    'id': ['08535', '08545', '08562', '08579', '10637'],
+    'icao': ['LPPT', 'LPCS', 'LPPR', 'LPFR', 'EDDF'],
+    'name': ['Lisbon', 'Cascais', 'Porto', 'Faro', 'Frankfurt'],
+    'latitude': [38.77, 38.72, 41.24, 37.02, 50.05],
+    'longitude': [-9.13, -9.35, -8.68, -7.97, 8.60],
+}).set_index('id')
+
+
+def haversine(lat, lon, stations: pd.DataFrame) -> np.ndarray:
+    (lat1, lon1) = np.radians(lat), np.radians(lon)
+    (lat2, lon2) = np.radians(stations['latitude'].to_numpy()), np.radians(stations['longitude'].to_numpy())
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class CountingTree:
+    """Tree that counts the queries made to the one it wraps."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.queries = 0
+
+    def query(self, *args, **kwargs):
+        self.queries += 1
+        return self.tree.query(*args, **kwargs)
+
+
+def test_resolves_nearest_station_by_haversine_distance():
+    resolver = StationResolver(STATIONS)
+    rng = np.random.default_rng(16)
+    lat, lon = rng.uniform(36, 52, 50), rng.uniform(-10, 10, 50)
+
+    result = resolver.resolve(lat, lon)
+    for i in range(len(lat)):
+        # Coordinates are looked up by their rounded cell.
+        distances = haversine(round(lat[i], 2), round(lon[i], 2), STATIONS)
+        nearest = STATIONS.iloc[np.argmin(distances)]
+        assert result.loc[i, 'id'] == nearest.name
+        assert result.loc[i, 'icao'] == nearest['icao']
+        np.testing.assert_allclose(result.loc[i, 'distance'], distances.min(), rtol=1e-9)
+
+
+def test_missing_coordinates():
+    resolver = StationResolver(STATIONS)
+
+    result = resolver.resolve(np.array([38.7, np.nan, 41.2]), np.array([-9.1, -8.0, np.nan]))
+    assert result['id'].tolist()[0] == '08535'
+    assert result.loc[1:, 'id'].isna().all()
+    assert result.loc[1:, 'distance'].isna().all()
+
+
+def test_coordinates_of_a_cell_are_looked_up_once():
+    resolver = StationResolver(STATIONS)
+    resolver.tree = CountingTree(resolver.tree)
+
+    # All round to (38.72, -9.14).
+    lat = np.array([38.7201, 38.7249, 38.7151, 38.72])
+    lon = np.array([-9.1401, -9.1449, -9.1351, -9.14])
+    result = resolver.resolve(lat, lon)
+    assert result['id'].nunique() == 1
+    assert resolver.tree.queries == 1
+    assert len(resolver.cache) == 1
+
+    resolver.resolve(lat[::-1], lon[::-1])
+    assert resolver.tree.queries == 1
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+from transformation.buckets import ts_aggregation_by
+from profiling.summaries import summarize, summarize_frame
+
+
+def make_frame(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(15)
+    index = pd.date_range('2023-01-01', periods=n, freq='min', name='registered_at')
+    df = pd.DataFrame({
+        'normal': rng.normal(20, 3, n),
+        'skewed': rng.exponential(2, n),
+        'constant': np.full(n, 4.0),
+    }, index=index)
+    df.loc[rng.random(n) < 0.1, 'normal'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('level', [None, 'h', 'D'])
+def test_summarize_frame_matches_describe_and_histogram(level):
+    df = make_frame(5 * 1440)
+
+    summary = summarize_frame(df, levels=[level])[level]
+    data = df if level is None else ts_aggregation_by(df, level, 'mean')
+    pd.testing.assert_frame_equal(summary['describe'], data.describe(), rtol=1e-9)
+    for (i, col) in enumerate(df.columns):
+        values = data[col].dropna().to_numpy()
+        (counts, edges) = np.histogram(values)
+        np.testing.assert_array_equal(summary['counts'][i], counts)
+        np.testing.assert_allclose(summary['edges'][i], edges)
+
+
+def test_summarize_in_chunks_matches_boxplot_stats():
+    df = make_frame(3000)
+
+    summary = summarize(df.to_numpy(), chunk_size=256)
+    for (i, col) in enumerate(df.columns):
+        values = df[col].dropna().to_numpy()
+        expected = boxplot_stats(values)[0]
+        np.testing.assert_allclose([summary['whislo'][i], summary['whishi'][i]], [expected['whislo'], expected['whishi']])
+        assert summary['nr_fliers'][i] == len(expected['fliers'])
+        np.testing.assert_allclose(summary['std'][i], np.std(values, ddof=1), rtol=1e-9)
+        np.testing.assert_array_equal(summary['counts'][i], np.histogram(values)[0])
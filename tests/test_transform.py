@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+from preprocess import preprocess
+from preprocess.ingestion import DATETIME_COL
+from tests.records import make_records
+
+# `transformation.scaling` imports the pipelines, which import the models.
+pytest.importorskip('torch')
+from pipelines.tasks.transform import transform
+
+
+OPTIONS = [
+    {'scaling': True, 'aggregation': {'rule': 'H'}, 'differentiation': False},
+    {'scaling': True, 'aggregation': {'rule': 'D'}, 'differentiation': True},
+    {'scaling': False, 'aggregation': {'rule': 'H'}, 'differentiation': True},
+    {'scaling': True, 'aggregation': False, 'differentiation': True},
+]
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+@pytest.mark.parametrize('options', OPTIONS)
+def test_fused_transform_matches_step_by_step(options, sparse):
+    df = preprocess(make_records('2023-01-01', 4 * 1440, density=0.7, seed=5), DATETIME_COL, sparse=sparse)
+
+    expected = transform(df.copy(), options, cache=None)
+    pd.testing.assert_frame_equal(transform(df.copy(), options, cache=None, fused=True), expected, rtol=1e-5)
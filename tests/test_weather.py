@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pandas as pd
+from preprocess.meteo.weather import add_weather, file_provider
+
+
+def test_add_weather_with_missing_station_file(tmp_path):
+    hours = pd.date_range('2023-01-31', '2023-02-01 23:00', freq='h', tz='UTC')
+    weather_dir = tmp_path / 'weather'
+    weather_dir.mkdir()
+    pd.DataFrame({'time': hours.tz_convert(None), 'temp': np.arange(len(hours), dtype=float)}).to_csv(weather_dir / 'A.csv', index=False)
+
+    index = pd.date_range('2023-01-31 12:00', '2023-02-01 12:00', freq='30min', tz='UTC', name='registered_at')
+    # Station B has no observations at all, in either month.
+    df = pd.DataFrame({'station_id': np.where(np.arange(len(index)) % 2 == 0, 'A', 'B')}, index=index)
+    cache_dir = tmp_path / 'cache'
+    df = add_weather(df, provider=file_provider(str(weather_dir)), cache_dir=str(cache_dir))
+
+    from_a = df['station_id'] == 'A'
+    expected = (df.index[from_a].floor('h') - hours[0]) / pd.Timedelta(hours=1)
+    np.testing.assert_array_equal(df.loc[from_a, 'ambient_temperature'], expected.to_numpy(dtype=np.float32))
+    assert df.loc[~from_a, 'ambient_temperature'].isna().all()
+    # Months without observations are fetched again next time.
+    assert not os.path.exists(cache_dir / 'B')
+    assert sorted(os.listdir(cache_dir / 'A')) == ['2023-01.parquet', '2023-02.parquet']
+
+
+def test_preprocess_joins_ambient_temperature(tmp_path, monkeypatch):
+    from preprocess import preprocess
+    from preprocess.meteo.stations import STATIONS_FILE, StationResolver, _resolvers
+    from tests.records import make_records
+
+    # Synthetic coordinates are around (20, 20), closest to the second station.
+    stations = pd.DataFrame({
+        'id': ['A', 'B'], 'icao': ['AAAA', 'BBBB'], 'name': ['Far', 'Near'],
+        'latitude': [50.0, 20.0], 'longitude': [-10.0, 20.0],
+    }).set_index('id')
+    monkeypatch.setitem(_resolvers, STATIONS_FILE, StationResolver(stations))
+    # Weather cache dir is relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+
+    hours = pd.date_range('2023-03-01', periods=48, freq='h', tz='UTC')
+    os.mkdir('weather')
+    pd.DataFrame({'time': hours.tz_convert(None), 'temp': np.arange(len(hours), dtype=float)}).to_csv('weather/B.csv', index=False)
+    provider = file_provider('weather')
+
+    records = make_records('2023-03-01', 24 * 60, density=0.8, seed=3)
+    df = preprocess(records.copy(), datetime_col='registered_at', weather_provider=provider)
+    expected = (df.index.floor('h') - hours[0]) / pd.Timedelta(hours=1)
+    has_coordinates = df['latitude'].notna() & df['longitude'].notna()
+    np.testing.assert_array_equal(df.loc[has_coordinates, 'ambient_temperature'], expected[has_coordinates].to_numpy(dtype=np.float32))
+    assert not {'station_id', 'station_code', 'station_name'} & set(df.columns)
+
+    sparse = preprocess(records.copy(), datetime_col='registered_at', sparse=True, weather_provider=provider)
+    assert 'ambient_temperature' in sparse.observed.columns
+    assert 'ambient_temperature' not in preprocess(records.copy(), datetime_col='registered_at').columns
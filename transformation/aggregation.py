@@ -1,24 +1,11 @@
 from pandas import DataFrame
-from matplotlib.pyplot import subplots
-from dslabs import ts_aggregation_by, plot_forecasting_series_on_ax
+from transformation.buckets import ts_aggregation_by
+from transformation.pyramid import aggregate_by
 from preprocess import aggregation_func_by_col
-from pipelines import linear_regression
-from pipelines.tasks.evaluate import evaluate
+from preprocess.sparse import SparseFrame
+from pipelines.tasks.evaluate import compare_with_linear_reg
 
 
-def compare_with_linear_reg(df, target, ax=None, plot_subtitle=""):
-    train, test, predicted_train, predicted_test = linear_regression.run(df, target, None, path=None)
-    plot_forecasting_series_on_ax(
-        train,
-        test,
-        predicted_test,
-        ax=ax,
-        title=plot_subtitle,
-        xlabel=train.index.name,
-        ylabel=""
-    )
-    return evaluate(train, test, predicted_train, predicted_test)
-
 def analyze(df: DataFrame, target: str, agg_funcs: str|dict = aggregation_func_by_col, savefig=True):
     """Analyze smoothing to df's target. Output plots with multiple aggregation windows
     and compare their results by applying Linear Regression on each.
@@ -33,8 +20,12 @@ def analyze(df: DataFrame, target: str, agg_funcs: str|dict = aggregation_func_b
     """
     # Perform aggregations
     agg_funcs = { k: v for (k,v) in aggregation_func_by_col.items() if k in df.columns }
-    hour: DataFrame = ts_aggregation_by(df, gran_level='h', agg_func=agg_funcs).dropna()
-    day: DataFrame = ts_aggregation_by(df, gran_level='d', agg_func=agg_funcs).dropna()
+    hour: DataFrame = aggregate_by(df, gran_level='h', agg_func=agg_funcs).dropna()
+    day: DataFrame = aggregate_by(df, gran_level='d', agg_func=agg_funcs).dropna()
+
+    # Imported here so that the pipelines don't load matplotlib, `dslabs` applies the figure style.
+    import dslabs
+    from matplotlib.pyplot import subplots
 
     # Setup result plot
     fig, axs = subplots(3, 1, figsize=(16, 3 * 1.5))
@@ -46,13 +37,11 @@ def analyze(df: DataFrame, target: str, agg_funcs: str|dict = aggregation_func_b
     print(DataFrame(metrics_raw))
 
     # rule: h
-    hour: DataFrame = ts_aggregation_by(df, gran_level='h', agg_func=agg_funcs).dropna()
     metrics_hour = compare_with_linear_reg(hour, target, ax=axs[1], plot_subtitle="freq='h'")
     print("rule='h':")
     print(DataFrame(metrics_hour))
 
     # rule: d
-    day: DataFrame = ts_aggregation_by(df, gran_level='d', agg_func=agg_funcs).dropna()
     metrics_day = compare_with_linear_reg(day, target, ax=axs[2], plot_subtitle="freq='d'")
     print("rule='d':")
     print(DataFrame(metrics_day))
@@ -79,4 +68,7 @@ def run(df: DataFrame, gran_level: str='W', agg_funcs=aggregation_func_by_col):
         agg_funcs (str | dict, optional): Defaults to 'mean'.
     """
     agg_funcs = { k: v for (k,v) in aggregation_func_by_col.items() if k in df.columns }
+    if isinstance(df, SparseFrame):
+        # Aggregate the observed records directly, without materialising every minute.
+        return df.aggregate(gran_level, agg_funcs)
     return ts_aggregation_by(df, gran_level=gran_level, agg_func=agg_funcs)
@@ -1,21 +1,6 @@
 from pandas import DataFrame, Series
-from dslabs import plot_forecasting_series_on_ax
-from matplotlib.pyplot import subplots
-from pipelines import linear_regression
-from pipelines.tasks.evaluate import evaluate
-
-def compare_with_linear_reg(df, target, ax=None, plot_subtitle=""):
-    train, test, predicted_train, predicted_test = linear_regression.run(df, target, path=None)
-    plot_forecasting_series_on_ax(
-        train,
-        test,
-        predicted_test,
-        ax=ax,
-        title=plot_subtitle,
-        xlabel=train.index.name,
-        ylabel=""
-    )
-    return evaluate(train, test, predicted_train, predicted_test)
+from pipelines.tasks.evaluate import compare_with_linear_reg
+from preprocess.sparse import SparseFrame
 
 
 def analyze(df: DataFrame, target: str, plot_title='Differentiation Analysis', savefig=True, ):
@@ -30,6 +15,10 @@ def analyze(df: DataFrame, target: str, plot_title='Differentiation Analysis', s
     diff_1 = df[[target]].diff().dropna()
     diff_2 = diff_1[[target]].diff().dropna()
 
+    # Imported here so that the pipelines don't load matplotlib, `dslabs` applies the figure style.
+    import dslabs
+    from matplotlib.pyplot import subplots
+
     # Setup result plot
     fig, axs = subplots(3, 1, figsize=(16, 3 * 1.5))
     fig.suptitle(plot_title)
@@ -66,9 +55,12 @@ def run(df: DataFrame):
     TODO: explain differentiation
 
     Args:
-        df (DataFrame):
+        df (DataFrame | SparseFrame):
 
     Returns:
         DataFrame: 
     """
+    if isinstance(df, SparseFrame):
+        # Differences are taken between consecutive minutes, which needs the grid.
+        df = df.to_dense()
     return df.diff().iloc[1:].copy()
@@ -0,0 +1,142 @@
+"""Fused execution of the transformation steps (scaling, aggregation and
+differentiation). Instead of building a new frame after every step, the steps are
+planned together and run on the underlying arrays:
+
+- Standard scaling is an increasing affine map per column, which commutes with
+  the max, min, mean and median aggregations and turns a sum into
+  `(sum - mean * count) / std`. Aggregating first means scaling only touches the
+  aggregated rows.
+- All steps work on one float64 array per run, aggregation writes its output
+  into a preallocated one and differentiation is done in place. The frame is
+  only copied again when it is cast back to the column dtypes, e.g. float32.
+"""
+import numpy as np
+import pandas as pd
+from preprocess import aggregation_func_by_col
+from preprocess.sparse import SparseFrame
+
+
+# Aggregations for which aggregating the scaled values equals scaling the aggregate.
+AFFINE_EQUIVARIANT_FUNCS = ['max', 'min', 'mean', 'median']
+
+
+def get_scaling_stats(df: pd.DataFrame | SparseFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Mean and scale of each column of `df`, as `scaling.run` fits them."""
+    # Imported here, `transformation.scaling` imports the pipelines.
+    from transformation.scaling import IncrementalScaler
+
+    return IncrementalScaler().fit(df).get_stats(list(df.columns))
+
+
+def plan(steps: list[tuple[str, object]], agg_funcs: dict[str, str]) -> list[tuple[str, object]]:
+    """Order in which the fused engine runs `steps`, equivalent to running them as
+    listed. Aggregation is moved ahead of scaling when every aggregation function
+    allows it.
+
+    Args:
+        steps (list[tuple[str, object]]): (step, params) pairs, as in `transform`.
+        agg_funcs (dict[str, str]): aggregation function of each column.
+
+    Returns:
+        list[tuple[str, object]]: steps in execution order.
+    """
+    names = [step for (step, _) in steps]
+    for name in names:
+        if name not in ['scaling', 'aggregation', 'differentiation']:
+            raise ValueError(f'Unsupported transformation step {name}')
+
+    if 'scaling' in names and 'aggregation' in names and names.index('scaling') < names.index('aggregation'):
+        funcs = set(agg_funcs.values())
+        if funcs <= {*AFFINE_EQUIVARIANT_FUNCS, 'sum'}:
+            steps = [s for s in steps if s[0] == 'aggregation'] + [s for s in steps if s[0] != 'aggregation']
+    return steps
+
+
+def aggregate(df: pd.DataFrame | SparseFrame, gran_level: str, agg_funcs: dict[str, str]) -> tuple[np.ndarray, pd.Index, pd.DataFrame]:
+    """Aggregate `df` by `gran_level` as `ts_aggregation_by` does, without copying
+    `df` first. Values are aggregated in float64, into a new array with a column
+    per entry of `agg_funcs`. Also returns the number of values behind each sum,
+    which is needed to scale a sum after the fact.
+    """
+    sum_cols = [col for (col, func) in agg_funcs.items() if func == 'sum']
+    if isinstance(df, SparseFrame):
+        aggregated = df.aggregate(gran_level, agg_funcs, dtype=np.float64)
+        counts = df.aggregate(gran_level, {col: 'count' for col in sum_cols}).fillna(0)
+        return aggregated.to_numpy(dtype=np.float64, na_value=np.nan), aggregated.index, counts
+
+    # Group positions are computed once and shared by every column. Columns are
+    # aggregated one at a time, straight into the output array.
+    codes, periods = pd.factorize(df.index.to_period(gran_level), sort=True)
+    index = periods.to_timestamp()
+    index.name = df.index.name
+    out = np.empty((len(index), len(agg_funcs)), dtype=np.float64)
+    counts = pd.DataFrame(index=index)
+    for (i, (col, func)) in enumerate(agg_funcs.items()):
+        grouped = pd.Series(df[col].to_numpy(dtype=np.float64, na_value=np.nan)).groupby(codes, sort=True)
+        out[:, i] = grouped.agg(func).to_numpy()
+        if func == 'sum':
+            counts[col] = grouped.count().to_numpy()
+    return out, index, counts
+
+
+def to_array(df: pd.DataFrame | SparseFrame) -> tuple[np.ndarray, pd.Index]:
+    """Values of `df` as a new float64 array, safe to modify in place."""
+    if isinstance(df, SparseFrame):
+        dense = df.to_dense()
+        return dense.to_numpy(dtype=np.float64, na_value=np.nan), dense.index
+    return df.to_numpy(dtype=np.float64, na_value=np.nan, copy=True), df.index
+
+
+def run(df: pd.DataFrame | SparseFrame, steps: list[tuple[str, object]]) -> pd.DataFrame:
+    """Apply `steps` to `df` in a single pass, returning the same frame as applying
+    `scaling.run`, `aggregation.run` and `differentiation.run` in turn.
+
+    Args:
+        df (DataFrame | SparseFrame): minute frame.
+        steps (list[tuple[str, object]]): enabled (step, params) pairs, in the
+            order `transform` applies them.
+
+    Returns:
+        DataFrame: transformed frame.
+    """
+    agg_funcs = { k: v for (k,v) in aggregation_func_by_col.items() if k in df.columns }
+    steps = plan(steps, agg_funcs)
+
+    out = None
+    index = None
+    counts = None
+    columns = list(df.columns)
+    dtypes = df.observed.dtypes if isinstance(df, SparseFrame) else df.dtypes
+
+    for (step, params) in steps:
+        if step == 'aggregation':
+            source = df if out is None else pd.DataFrame(out, index=index, columns=columns, copy=False)
+            out, index, counts = aggregate(source, params['rule'], agg_funcs)
+            columns = list(agg_funcs)
+            dtypes = None if dtypes is None else dtypes[columns]
+
+        elif step == 'scaling':
+            means, stds = get_scaling_stats(df)
+            means, stds = dict(zip(df.columns, means)), dict(zip(df.columns, stds))
+            if out is None:
+                out, index = to_array(df)
+            for (i, col) in enumerate(columns):
+                # A sum of `count` scaled values is shifted by `count` times the mean.
+                shift = means[col] * counts[col].to_numpy() if counts is not None and col in counts.columns else means[col]
+                out[:, i] -= shift
+                out[:, i] /= stds[col]
+            # As `scaling.run`, float columns keep their dtype and others become float64.
+            dtypes = None if dtypes is None else dtypes.map(lambda dtype: dtype if pd.api.types.is_float_dtype(dtype) else np.dtype(np.float64))
+
+        elif step == 'differentiation':
+            if out is None:
+                out, index = to_array(df)
+            out[1:] -= out[:-1]
+            out, index = out[1:], index[1:]
+
+    result = pd.DataFrame(out, index=index, columns=columns, copy=False)
+    if dtypes is not None:
+        # Values are computed in float64, cast back to the dtypes of the other paths.
+        # Columns that stay float64 aren't copied.
+        result = result.astype(dict(zip(columns, dtypes)), copy=False)
+    return result
@@ -0,0 +1,242 @@
+"""Aggregation pyramid: the minute frame aggregated to hours, days and weeks once.
+Each level keeps mergeable partial states per column (row count, value count,
+sum, sum of squares, min and max) and is derived from the level below it, so
+asking any analyzer for hourly or daily values is a lookup. Approximate medians
+are merged the same way, from quantile sketches built on first use.
+"""
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from preprocess.cache import fingerprint_frame
+from transformation.buckets import get_bucket_ids, get_bucket_index, reduce_buckets, ts_aggregation_by
+from transformation.quantiles import QuantileSketch
+from preprocess.runs import run_ids, run_starts
+
+
+# Levels built on top of the minute frame, each derived from the previous one.
+PYRAMID_LEVELS = ['h', 'D', 'W']
+
+# Aggregations answered from the partial states.
+MERGEABLE_FUNCS = ['sum', 'count', 'mean', 'min', 'max', 'std', 'var']
+
+# Pyramids kept by `get_pyramid`, most recently used last.
+PYRAMID_CACHE_SIZE = 4
+
+DAY_NS = 86_400 * 10 ** 9
+
+
+def get_level(gran_level: str) -> str | None:
+    """Pyramid level matching `gran_level` (e.g. 'H', 'h' and '1h' are all 'h'),
+    None when it's not one of PYRAMID_LEVELS.
+    """
+    try:
+        offset = to_offset(gran_level)
+    except ValueError:
+        return None
+    if offset.n != 1:
+        return None
+    if offset.name.startswith('W'):
+        # Only weeks as `to_period('W')` defines them, from Monday to Sunday.
+        return 'W' if offset.name == 'W-SUN' else None
+    return {'H': 'h', 'h': 'h', 'D': 'D'}.get(offset.name)
+
+
+def get_parent_ids(index: pd.DatetimeIndex, level: str) -> tuple[np.ndarray, np.ndarray]:
+    """Bucket of `level` each row of `index` falls in, and the start (epoch ns) of
+    each bucket id."""
+    if level == 'W':
+        # Epoch day 0 is a Thursday, weeks start on Monday.
+        days = get_bucket_ids(index, DAY_NS)
+        ids = np.floor_divide(days + 3, 7)
+        return ids, ids * 7 * DAY_NS - 3 * DAY_NS
+    width = {'h': 3600 * 10 ** 9, 'D': DAY_NS}[level]
+    ids = get_bucket_ids(index, width)
+    return ids, ids * width
+
+
+def merge_states(states: dict[str, pd.DataFrame], level: str) -> dict[str, pd.DataFrame]:
+    """Derive the partial states of `level` from the ones of a finer level."""
+    ids, starts_ns = get_parent_ids(states['rows'].index, level)
+    starts = run_starts(ids)
+    index = get_bucket_index(starts_ns[starts], name=states['rows'].index.name)
+
+    merged = {}
+    for (name, ufunc) in [('rows', np.add), ('count', np.add), ('sum', np.add), ('sumsq', np.add), ('min', np.fmin), ('max', np.fmax)]:
+        merged[name] = pd.DataFrame(ufunc.reduceat(states[name].to_numpy(), starts, axis=0), index=index, columns=states[name].columns)
+    return merged
+
+
+def get_base_states(df: pd.DataFrame, level: str) -> dict[str, pd.DataFrame]:
+    """Partial states of the first level, reduced from the records in `df`."""
+    ids, starts_ns = get_parent_ids(df.index, level)
+    starts = run_starts(ids)
+    index = get_bucket_index(starts_ns[starts], name=df.index.name)
+
+    states = {name: {} for name in ['count', 'sum', 'sumsq', 'min', 'max']}
+    for col in df.columns:
+        values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        states['count'][col] = reduce_buckets(values, starts, None, len(starts), 'count')
+        states['sum'][col] = reduce_buckets(values, starts, None, len(starts), 'sum')
+        states['sumsq'][col] = reduce_buckets(values * values, starts, None, len(starts), 'sum')
+        states['min'][col] = reduce_buckets(values, starts, None, len(starts), 'min')
+        states['max'][col] = reduce_buckets(values, starts, None, len(starts), 'max')
+
+    states = {name: pd.DataFrame(cols, index=index, columns=df.columns) for (name, cols) in states.items()}
+    states['rows'] = pd.DataFrame({'rows': np.diff(starts, append=len(ids))}, index=index)
+    return states
+
+
+def is_aggregable(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+class AggregationPyramid:
+    """Minute frame aggregated to every level in PYRAMID_LEVELS.
+
+    Args:
+        df (DataFrame): numeric frame indexed by time, sorted.
+        levels (list[str], optional): Defaults to PYRAMID_LEVELS.
+        relative_accuracy (float | None, optional): when given, medians are
+            merged level by level from approximate quantile sketches, see
+            `transformation.quantiles`. Defaults to None, exact medians computed
+            from the records.
+    """
+
+    def __init__(self, df: pd.DataFrame, levels: list[str] = PYRAMID_LEVELS, relative_accuracy: float | None = None):
+        df = df[[col for col in df.columns if is_aggregable(df[col])]]
+        self.dtypes = df.dtypes
+        self.levels = {}
+        # Row of each level every row of the level below (the records, for the
+        # first one) falls in.
+        self.parents: dict[str, np.ndarray] = {}
+        states = None
+        for level in levels:
+            index = df.index if states is None else states['rows'].index
+            self.parents[level] = run_ids(get_parent_ids(index, level)[0])
+            states = get_base_states(df, level) if states is None else merge_states(states, level)
+            self.levels[level] = states
+
+        self.df = df
+        self.relative_accuracy = relative_accuracy
+        self.sketches: dict[str, dict[str, QuantileSketch]] = {level: {} for level in levels}
+        self.medians: dict[str, dict[str, np.ndarray]] = {}
+
+    def get_sketch(self, level: str, col: str) -> QuantileSketch:
+        """Quantile sketch of `col` with a bucket per row of `level`, merged from
+        the sketch of the level below."""
+        if col not in self.sketches[level]:
+            levels = list(self.levels)
+            position = levels.index(level)
+            if position == 0:
+                sketch = QuantileSketch.from_values(self.df[col].to_numpy(dtype=np.float64, na_value=np.nan), self.parents[level], self.relative_accuracy)
+            else:
+                child = self.get_sketch(levels[position - 1], col)
+                sketch = child.regroup(self.parents[level][child.buckets])
+            self.sketches[level][col] = sketch
+        return self.sketches[level][col]
+
+    def get_median(self, level: str, col: str) -> np.ndarray:
+        if self.relative_accuracy is None:
+            # An exact sketch costs a sort of the whole column, a groupby per level is cheaper.
+            if col not in self.medians.get(level, {}):
+                self.medians.setdefault(level, {})[col] = ts_aggregation_by(self.df[col], level, 'median').to_numpy()
+            return self.medians[level][col]
+
+        buckets, medians = self.get_sketch(level, col).quantile(0.5)
+        result = np.full(len(self.levels[level]['rows']), np.nan)
+        result[buckets] = medians
+        return result
+
+    def get(self, gran_level: str, agg_func: str | dict = 'mean') -> pd.DataFrame:
+        """Same as `ts_aggregation_by(df, gran_level, agg_func)`.
+
+        Args:
+            gran_level (str): one of the pyramid levels.
+            agg_func (str | dict, optional): aggregation of every column, or of
+                each column to keep. Defaults to 'mean'.
+
+        Returns:
+            DataFrame: aggregated frame.
+        """
+        level = get_level(gran_level)
+        states = self.levels[level]
+        funcs = agg_func if isinstance(agg_func, dict) else {col: agg_func for col in self.dtypes.index}
+
+        columns = {}
+        for (col, func) in funcs.items():
+            count = states['count'][col].to_numpy()
+            if func == 'count':
+                columns[col] = count
+                continue
+            if func == 'median':
+                columns[col] = self.get_median(level, col)
+            elif func == 'sum':
+                columns[col] = states['sum'][col].to_numpy()
+            elif func in ['min', 'max']:
+                columns[col] = states[func][col].to_numpy()
+            elif func in ['mean', 'var', 'std']:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    total = states['sum'][col].to_numpy()
+                    mean = total / count
+                    if func == 'mean':
+                        columns[col] = mean
+                    else:
+                        # Sample variance, as pandas computes it.
+                        var = np.maximum(states['sumsq'][col].to_numpy() - total * mean, 0) / (count - 1)
+                        columns[col] = var if func == 'var' else np.sqrt(var)
+            else:
+                raise ValueError(f'Unsupported pyramid aggregation {func}')
+
+            # Keep the dtypes pandas would return.
+            dtype = self.dtypes[col]
+            if pd.api.types.is_float_dtype(dtype) and func != 'std':
+                columns[col] = columns[col].astype(dtype)
+            elif pd.api.types.is_integer_dtype(dtype) and func in ['sum', 'min', 'max'] and not np.isnan(columns[col]).any():
+                columns[col] = columns[col].astype(dtype)
+
+        return pd.DataFrame(columns, index=states['rows'].index)
+
+
+_pyramids: OrderedDict[str, AggregationPyramid] = OrderedDict()
+
+
+def get_pyramid(df: pd.DataFrame) -> AggregationPyramid:
+    """Aggregation pyramid of `df`, built on first use and kept while it's among
+    the PYRAMID_CACHE_SIZE most recently used ones.
+    """
+    key = fingerprint_frame(df)
+    if key not in _pyramids:
+        _pyramids[key] = AggregationPyramid(df)
+        while len(_pyramids) > PYRAMID_CACHE_SIZE:
+            _pyramids.popitem(last=False)
+    _pyramids.move_to_end(key)
+    return _pyramids[key]
+
+
+def aggregate_by(data: pd.Series | pd.DataFrame, gran_level: str, agg_func: str | dict = 'mean') -> pd.Series | pd.DataFrame:
+    """`ts_aggregation_by` answered from the aggregation pyramid of `data` when
+    `gran_level` is a pyramid level and `agg_func` can be answered from it.
+
+    Args:
+        data (Series | DataFrame): numeric data indexed by time, sorted.
+        gran_level (str): e.g. 'h', 'D' or 'W'.
+        agg_func (str | dict, optional): Defaults to 'mean'.
+
+    Returns:
+        Series | DataFrame: aggregated data.
+    """
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    funcs = agg_func if isinstance(agg_func, dict) else {col: agg_func for col in frame.columns}
+    supported = (
+        get_level(gran_level) is not None
+        and isinstance(frame.index, pd.DatetimeIndex) and frame.index.is_monotonic_increasing
+        and set(funcs.values()) <= {*MERGEABLE_FUNCS, 'median'}
+        and all(col in frame.columns and is_aggregable(frame[col]) for col in funcs)
+    )
+    if not supported:
+        return ts_aggregation_by(data, gran_level, agg_func)
+
+    if isinstance(data, pd.Series):
+        return get_pyramid(frame).get(gran_level, agg_func)[frame.columns[0]].rename(data.name)
+    return get_pyramid(frame).get(gran_level, agg_func)
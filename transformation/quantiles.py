@@ -0,0 +1,165 @@
+"""Mergeable quantile sketches for time-bucketed data, so that medians (and other
+quantiles) can be computed per chunk, in parallel or level by level, and merged.
+
+A sketch holds, for every time bucket, the distinct keys seen and how many values
+fell on each key:
+
+- Exact mode (`relative_accuracy=None`): keys are the values themselves. Quantiles
+  are exactly what pandas returns (linear interpolation between order statistics),
+  memory grows with the number of distinct values per bucket.
+- Approximate mode: values are mapped to logarithmic bins as in DDSketch, keyed by
+  the integer index of the bin. Every order statistic, and therefore every
+  quantile interpolated between two of them, is within `relative_accuracy` of its
+  exact value (for values of the same sign). At most ~log(max / min) / log(gamma)
+  keys are kept per bucket, gamma = (1 + a) / (1 - a): e.g. 350 keys for values
+  between 1 and 1000 with a = 1%.
+
+Merging two sketches with the same accuracy is exact: counts of equal
+(bucket, key) pairs are added.
+"""
+import numpy as np
+from preprocess.runs import run_starts
+
+
+# Absolute values below this are treated as 0 by approximate sketches.
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+def get_gamma(relative_accuracy: float) -> float:
+    return (1 + relative_accuracy) / (1 - relative_accuracy)
+
+
+def get_bin_offset(gamma: float) -> int:
+    """Added to bin indices so that every value above MIN_INDEXABLE_VALUE gets a
+    positive key."""
+    return 1 - int(np.ceil(np.log(MIN_INDEXABLE_VALUE) / np.log(gamma)))
+
+
+def quantize(values: np.ndarray, relative_accuracy: float) -> np.ndarray:
+    """Key of the logarithmic bin each value falls in, ordered as the values are:
+    0 for (near) zero, positive for positive values, negative for negative ones.
+    """
+    gamma = get_gamma(relative_accuracy)
+    magnitude = np.abs(values)
+    indexable = magnitude > MIN_INDEXABLE_VALUE
+    bins = np.ceil(np.log(magnitude, where=indexable, out=np.ones_like(magnitude)) / np.log(gamma)).astype(np.int64)
+    return np.where(indexable, np.sign(values).astype(np.int64) * (bins + get_bin_offset(gamma)), 0)
+
+
+def dequantize(keys: np.ndarray, relative_accuracy: float) -> np.ndarray:
+    """Representative value of each bin key, within `relative_accuracy` of every
+    value in the bin."""
+    gamma = get_gamma(relative_accuracy)
+    bins = np.abs(keys) - get_bin_offset(gamma)
+    return np.where(keys != 0, np.sign(keys) * 2 * gamma ** bins.astype(np.float64) / (gamma + 1), 0.0)
+
+
+class QuantileSketch:
+    """Quantile sketch of values grouped by integer bucket ids (e.g. hour ids).
+
+    Attributes:
+        buckets (ndarray): int64 bucket of each entry, sorted.
+        keys (ndarray): key of each entry, sorted within a bucket: the float64
+            value for exact sketches, the int64 bin for approximate ones.
+        counts (ndarray): int64 number of values on each entry.
+        relative_accuracy (float | None): None for an exact sketch.
+    """
+
+    def __init__(self, buckets: np.ndarray, keys: np.ndarray, counts: np.ndarray, relative_accuracy: float | None = None):
+        self.buckets = buckets
+        self.keys = keys
+        self.counts = counts
+        self.relative_accuracy = relative_accuracy
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, buckets: np.ndarray, relative_accuracy: float | None = None) -> 'QuantileSketch':
+        """Sketch `values`, each one in the bucket given by `buckets`. NaN are skipped.
+
+        Args:
+            values (ndarray): 1-D numeric array.
+            buckets (ndarray): int64 bucket id of each value.
+            relative_accuracy (float | None, optional): Defaults to None, exact.
+
+        Returns:
+            QuantileSketch
+        """
+        values = np.asarray(values, dtype=np.float64)
+        observed = ~np.isnan(values)
+        keys = values[observed]
+        if relative_accuracy is not None:
+            keys = quantize(keys, relative_accuracy)
+        return cls(*cls.compact(np.asarray(buckets)[observed], keys, np.ones(len(keys), dtype=np.int64)), relative_accuracy)
+
+    @staticmethod
+    def compact(buckets: np.ndarray, keys: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sort entries by (bucket, key) and add up the counts of equal entries."""
+        if len(keys) > 0 and np.issubdtype(keys.dtype, np.integer):
+            # Bins are small integers, sort a single code per (bucket, key).
+            low, span = keys.min(), keys.max() - keys.min() + 1
+            first = buckets.min()
+            order = np.argsort((buckets - first) * span + (keys - low))
+        else:
+            # Cheaper than np.lexsort: any sort on keys, then a stable one on buckets.
+            order = np.argsort(keys)
+            order = order[np.argsort(buckets[order], kind='stable')]
+        buckets, keys, counts = buckets[order], keys[order], counts[order]
+        if len(order) == 0:
+            return buckets, keys, counts
+
+        new = np.empty(len(order), dtype=bool)
+        new[0] = True
+        new[1:] = (buckets[1:] != buckets[:-1]) | (keys[1:] != keys[:-1])
+        starts = np.flatnonzero(new)
+        return buckets[starts], keys[starts], np.add.reduceat(counts, starts)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get_values(self, entries: np.ndarray) -> np.ndarray:
+        """Value each of the `entries` stands for."""
+        keys = self.keys[entries]
+        return keys if self.relative_accuracy is None else dequantize(keys, self.relative_accuracy)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Sketch of the values of both `self` and `other`."""
+        if self.relative_accuracy != other.relative_accuracy:
+            raise ValueError('can only merge sketches with the same relative accuracy')
+        return QuantileSketch(
+            *self.compact(
+                np.concatenate([self.buckets, other.buckets]),
+                np.concatenate([self.keys, other.keys]),
+                np.concatenate([self.counts, other.counts]),
+            ),
+            self.relative_accuracy,
+        )
+
+    def regroup(self, buckets: np.ndarray) -> 'QuantileSketch':
+        """Sketch with each entry moved to a new bucket, e.g. from hours to days.
+
+        Args:
+            buckets (ndarray): new bucket of each entry, as a function of
+                `self.buckets`. Must keep buckets in order.
+        """
+        return QuantileSketch(*self.compact(buckets, self.keys, self.counts), self.relative_accuracy)
+
+    def quantile(self, q: float = 0.5) -> tuple[np.ndarray, np.ndarray]:
+        """`q` quantile of every bucket, interpolating linearly between order
+        statistics as pandas does.
+
+        Returns:
+            tuple: bucket ids and the quantile of each one.
+        """
+        if len(self.keys) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        starts = run_starts(self.buckets)
+        totals = np.add.reduceat(self.counts, starts)
+        cumulative = np.cumsum(self.counts)
+        before = cumulative[starts] - self.counts[starts]
+
+        rank = q * (totals - 1)
+        lower = np.floor(rank)
+        # Entry holding the k-th value of a bucket: the first whose cumulative count exceeds k.
+        low = self.get_values(np.searchsorted(cumulative, before + lower, side='right'))
+        high = self.get_values(np.searchsorted(cumulative, before + np.ceil(rank), side='right'))
+        return self.buckets[starts], low + (rank - lower) * (high - low)
@@ -1,15 +1,160 @@
+import os
+import json
+import numpy as np
 from pandas import DataFrame, Series
-from sklearn.preprocessing import StandardScaler
-from dslabs import plot_line_chart, HEIGHT
-from matplotlib.pyplot import figure, show, subplots
 from pipelines.tasks.evaluate import compare_with_linear_reg
+from preprocess.sparse import SparseFrame
 
-def scale_all_dataframe(data: DataFrame) -> DataFrame:
-    vars: list[str] = data.columns.to_list()
-    transf: StandardScaler = StandardScaler().fit(data)
-    df = DataFrame(transf.transform(data), index=data.index)
-    df.columns = vars
-    return df
+
+class IncrementalScaler:
+    """Standard scaler that keeps running statistics per column, so it can be
+    updated with newly appended records instead of refitted, and saved next to
+    the models trained on its output.
+
+    Batches are merged with the parallel form of Welford's algorithm. Statistics
+    are those StandardScaler fits: missing values are ignored, the standard
+    deviation is the population one and constant columns get a scale of 1.
+    """
+
+    def __init__(self):
+        self.columns: list[str] = []
+        self.n: dict[str, int] = {}
+        self.mean: dict[str, float] = {}
+        self.m2: dict[str, float] = {}
+
+    def partial_fit(self, data: DataFrame | SparseFrame) -> 'IncrementalScaler':
+        """Update the statistics with the records in `data`.
+
+        Args:
+            data (DataFrame | SparseFrame): records not seen before.
+
+        Returns:
+            IncrementalScaler: self.
+        """
+        for col in data.columns:
+            values = data.get_values(col) if isinstance(data, SparseFrame) else data[col]
+            values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if col not in self.n:
+                self.columns.append(col)
+                (self.n[col], self.mean[col], self.m2[col]) = (0, 0.0, 0.0)
+            if len(values) == 0:
+                continue
+
+            n = len(values)
+            mean = values.mean()
+            m2 = np.square(values - mean).sum()
+            total = self.n[col] + n
+            delta = mean - self.mean[col]
+            self.mean[col] += delta * n / total
+            self.m2[col] += m2 + delta * delta * self.n[col] * n / total
+            self.n[col] = total
+        return self
+
+    def fit(self, data: DataFrame | SparseFrame) -> 'IncrementalScaler':
+        self.__init__()
+        return self.partial_fit(data)
+
+    def get_scale(self, col: str) -> float:
+        std = np.sqrt(self.m2[col] / self.n[col]) if self.n[col] > 0 else 0.0
+        return std if std >= 10 * np.finfo(np.float64).eps else 1.0
+
+    def get_stats(self, columns: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Mean and scale of each of `columns`."""
+        missing = [col for col in columns if col not in self.n]
+        if len(missing) > 0:
+            raise ValueError(f'Scaler was not fitted on {missing}')
+        return np.array([self.mean[col] for col in columns]), np.array([self.get_scale(col) for col in columns])
+
+    def scale_values(self, values: np.ndarray | Series, col: str, out: np.ndarray | None = None, inverse: bool = False) -> np.ndarray:
+        """Scale (or unscale) the values of `col`. Float arrays keep their dtype,
+        others are scaled as float64.
+        """
+        values = np.asarray(values)
+        if not np.issubdtype(values.dtype, np.floating):
+            values, out = values.astype(np.float64), None
+        if out is None:
+            out = np.empty_like(values)
+        (means, scales) = self.get_stats([col])
+        # Computed in float64 and written back to float32 arrays, without a float64 copy.
+        kwargs = {'out': out, 'dtype': np.float64, 'casting': 'same_kind'}
+        if inverse:
+            np.multiply(values, scales[0], **kwargs)
+            return np.add(out, means[0], **kwargs)
+        np.subtract(values, means[0], **kwargs)
+        return np.divide(out, scales[0], **kwargs)
+
+    def transform(self, data: DataFrame | Series | SparseFrame, copy: bool = True, inverse: bool = False, col: str | None = None):
+        """Scale `data` with the fitted statistics.
+
+        Args:
+            data (DataFrame | Series | SparseFrame): columns (or a series named as
+                a column) the scaler was fitted on.
+            copy (bool, optional): when False, float columns of a DataFrame or
+                Series are scaled in place. Defaults to True.
+            inverse (bool, optional): undo the scaling instead, see
+                `inverse_transform`. Defaults to False.
+            col (str | None, optional): column the values of a Series belong to,
+                e.g. for predictions. Defaults to None, the Series' name.
+
+        Returns:
+            DataFrame | Series | SparseFrame: scaled data.
+        """
+        if isinstance(data, SparseFrame):
+            return data.map_columns(lambda values, col: self.scale_values(values, col, inverse=inverse))
+
+        if isinstance(data, Series):
+            values = data.to_numpy(copy=copy)
+            scaled = self.scale_values(values, data.name if col is None else col, out=values, inverse=inverse)
+            if not copy and np.shares_memory(scaled, data.to_numpy()):
+                return data
+            return Series(scaled, index=data.index, name=data.name)
+
+        result = data.copy() if copy else data
+        for col in result.columns:
+            values = result[col].to_numpy()
+            scaled = self.scale_values(values, col, out=values, inverse=inverse)
+            if not np.shares_memory(scaled, result[col].to_numpy()):
+                result[col] = scaled
+        return result
+
+    def inverse_transform(self, data: DataFrame | Series | SparseFrame, copy: bool = True, col: str | None = None):
+        """Bring scaled data, e.g. predictions of the target, back to its units."""
+        return self.transform(data, copy=copy, inverse=True, col=col)
+
+    def save(self, path: str):
+        """Write the statistics to a JSON file at `path`."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({col: {'n': self.n[col], 'mean': self.mean[col], 'm2': self.m2[col]} for col in self.columns}, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'IncrementalScaler':
+        """Scaler saved with `save`."""
+        scaler = cls()
+        with open(path) as f:
+            for (col, stats) in json.load(f).items():
+                scaler.columns.append(col)
+                (scaler.n[col], scaler.mean[col], scaler.m2[col]) = (stats['n'], stats['mean'], stats['m2'])
+        return scaler
+
+
+def scale_all_dataframe(data: DataFrame, scaler: IncrementalScaler | None = None) -> DataFrame:
+    """Standard scale every column of `data`, with `scaler` when given or else
+    with a scaler fitted on `data`. Float columns keep their dtype.
+    """
+    if scaler is None:
+        scaler = IncrementalScaler().fit(data)
+    return scaler.transform(data)
+
+
+def scale_sparse_frame(data: SparseFrame, scaler: IncrementalScaler | None = None) -> SparseFrame:
+    """Same as `scale_all_dataframe` for a SparseFrame, where the mean and standard
+    deviation of each column are computed over its non-missing minutes.
+    """
+    if scaler is None:
+        scaler = IncrementalScaler().fit(data)
+    return scaler.transform(data)
 
 
 def analyze(df: DataFrame, target: str, savefig=True):
@@ -25,6 +170,10 @@ def analyze(df: DataFrame, target: str, savefig=True):
     """
     scaled: DataFrame = scale_all_dataframe(df)
 
+    # Imported here so that the pipelines don't load matplotlib, `dslabs` applies the figure style.
+    import dslabs
+    from matplotlib.pyplot import subplots
+
     # Setup result plot
     no_plots = 2
     fig, axs = subplots(no_plots, 1, figsize=(16, no_plots * 1.5))
@@ -52,14 +201,19 @@ def analyze(df: DataFrame, target: str, savefig=True):
     return scaled
 
 
-def run(df: DataFrame):
-    """Apply StandardScaler to entire dataframe.
+def run(df: DataFrame, scaler: IncrementalScaler | None = None):
+    """Apply standard scaling to entire dataframe.
     TODO: explain scaling
 
     Args:
         df (DataFrame):
+        scaler (IncrementalScaler | None, optional): fitted scaler to apply, e.g.
+            one loaded with `IncrementalScaler.load`. Defaults to None, fitting
+            one on `df`.
 
     Returns:
         DataFrame: 
     """
-    return scale_all_dataframe(df)
+    if isinstance(df, SparseFrame):
+        return scale_sparse_frame(df, scaler)
+    return scale_all_dataframe(df, scaler)
@@ -1,8 +1,83 @@
+import numpy as np
 from pandas import Series, DataFrame
-from dslabs import plot_forecasting_series_on_ax
-from matplotlib.pyplot import Figure, Axes, subplots
+from pandas.tseries.frequencies import to_offset
 from preprocess import aggregation_func_by_col
-from pipelines.tasks.evaluate import compare_with_linear_reg
+from preprocess.sparse import SparseFrame
+from pipelines.tasks.evaluate import compare_with_linear_reg, fit_linear_trends, plot_linear_trend, round_metrics
+
+
+# Aggregations computed by `rolling_windows` without going through `Series.rolling`.
+ROLLING_KERNEL_FUNCS = ['mean', 'sum', 'max', 'min']
+
+
+def rolling_extremes(values: np.ndarray, windows: list[int], ufunc) -> np.ndarray:
+    """Rolling `ufunc` (np.fmax or np.fmin) of `values` over each of `windows`.
+
+    Extremes over blocks of 1, 2, 4, ... values are built once, each level from
+    the previous one, and the extreme over a window is the one of the two
+    overlapping power-of-two blocks covering it.
+    """
+    n = len(values)
+    out = np.full((n, len(windows)), np.nan, order='F')
+    levels = [values]
+    for (i, window) in enumerate(windows):
+        if window > n:
+            continue
+        k = window.bit_length() - 1
+        while len(levels) <= k:
+            previous, size = levels[-1], 1 << (len(levels) - 1)
+            levels.append(ufunc(previous[:-size], previous[size:]))
+        # Block of 2**k values starting at each position.
+        blocks = levels[k]
+        out[window - 1:, i] = ufunc(blocks[:n - window + 1], blocks[window - (1 << k):])
+    return out
+
+
+def rolling_windows(series: Series, windows: list[int], agg_func: str = 'mean') -> DataFrame:
+    """Same as `series.rolling(window).agg(agg_func)` for every one of `windows`,
+    in a column `window=N` each, without modifying `series`' frame.
+
+    Means and sums are computed for all windows from one cumulative sum, maxima
+    and minima from shared power-of-two blocks, into a single 2-D array. Other
+    aggregations go through `Series.rolling`.
+
+    Args:
+        series (Series): series to smooth.
+        windows (list[int]): window sizes, in number of records.
+        agg_func (str, optional): Defaults to 'mean'.
+
+    Returns:
+        DataFrame: smoothed series, indexed as `series`.
+    """
+    columns = [f'window={window}' for window in windows]
+    if agg_func not in ROLLING_KERNEL_FUNCS:
+        return DataFrame({col: series.rolling(window=window).agg(agg_func) for (col, window) in zip(columns, windows)}, index=series.index)
+
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(values)
+
+    if agg_func in ['max', 'min']:
+        out = rolling_extremes(values, windows, np.fmax if agg_func == 'max' else np.fmin)
+    else:
+        # Centering keeps the cumulative sum small, and the differences precise.
+        shift = values[~missing].mean() if (~missing).any() else 0.0
+        cumulative = np.concatenate([[0.0], np.cumsum(np.where(missing, 0.0, values - shift))])
+        # Column-major, so each window is written contiguously and framed without a copy.
+        out = np.full((len(values), len(windows)), np.nan, order='F')
+        for (i, window) in enumerate(windows):
+            if window <= len(values):
+                sums = np.subtract(cumulative[window:], cumulative[:-window], out=out[window - 1:, i])
+                sums += shift * window
+                if agg_func == 'mean':
+                    sums /= window
+
+    if missing.any():
+        # As pandas with min_periods=window, windows with a missing value are NaN.
+        missing_count = np.concatenate([[0], np.cumsum(missing)])
+        for (i, window) in enumerate(windows):
+            if window <= len(values):
+                out[window - 1:, i][missing_count[window:] - missing_count[:-window] > 0] = np.nan
+    return DataFrame(out, index=series.index, columns=columns, copy=False)
 
 
 def analyze(df: DataFrame, target: str, windows=None, plot_title='Smoothing Analysis', savefig=True):
@@ -12,6 +87,10 @@ def analyze(df: DataFrame, target: str, windows=None, plot_title='Smoothing Anal
     if windows is None:
         sizes = [12, 24, 36, 48]
 
+    # Imported here so that the pipelines don't load matplotlib, `dslabs` applies the figure style.
+    import dslabs
+    from matplotlib.pyplot import Figure, Axes, subplots
+
     series: Series = df[target]
     fig: Figure
     axs: list[Axes]
@@ -25,15 +104,13 @@ def analyze(df: DataFrame, target: str, windows=None, plot_title='Smoothing Anal
     print('No smoothing:')
     print(DataFrame(metrics['no-smoothing']))
 
+    # Trends of all the windows are fitted at once.
+    smoothed = rolling_windows(series, sizes)
+    trends = fit_linear_trends(smoothed)
     for i in range(1, len(sizes) + 1):
         window = sizes[i-1]
-        df[f'window={window}'] = series.rolling(window=window).mean()
-        iter_metrics = compare_with_linear_reg(
-            df[[f'window={window}']].dropna(),
-            f'window={window}',
-            ax=axs[i],
-            plot_subtitle=f'window={window}'
-        )
+        plot_linear_trend(smoothed[f'window={window}'], trends, row=i-1, ax=axs[i], plot_subtitle=f'window={window}')
+        iter_metrics = {'train': round_metrics(trends['train'], i-1), 'test': round_metrics(trends['test'], i-1)}
         print(f'window={window}:')
         print(DataFrame(iter_metrics))
         metrics[f'window={window}'] = iter_metrics
@@ -47,19 +124,55 @@ def analyze(df: DataFrame, target: str, windows=None, plot_title='Smoothing Anal
 
 
     agg_func = aggregation_func_by_col[series.name]
-    return series.rolling(window=window).agg(agg_func)
+    return rolling_windows(series, [window], agg_func).iloc[:, 0].rename(series.name)
+
+
+def smooth_sparse_frame(data: SparseFrame, window: int) -> SparseFrame:
+    """Same as `run(data.to_dense(), window)` for a SparseFrame, computed on the
+    runs of consecutive values of each column (observed or filled) rather than on
+    every minute. Minutes without a full window of values are left out, so the
+    result starts `window - 1` minutes after the first run long enough.
+
+    Args:
+        data (SparseFrame): minute frame to smooth.
+        window (int): window size, in minutes.
+
+    Returns:
+        SparseFrame: smoothed frame, without filled values.
+    """
+    step = to_offset(data.freq).nanos
+    smoothed = {}
+    for col in data.columns:
+        values = data.get_values(col)
+        positions = values.index.asi8 // step
+        out = rolling_windows(Series(values.to_numpy()), [window]).iloc[:, 0].to_numpy()
+        # Windows spanning a gap are missing, as on the dense grid.
+        if len(values) >= window:
+            out[window - 1:][positions[window - 1:] - positions[:len(values) - window + 1] != window - 1] = np.nan
+        smoothed[col] = Series(out, index=values.index).dropna()
+
+    observed = DataFrame(smoothed).sort_index()
+    observed.index.name = data.observed.index.name
+    positions = observed.index.asi8 // step
+    after = np.flatnonzero(np.diff(positions) > 1)
+    gaps = DataFrame({
+        'start': observed.index[after] + to_offset(data.freq),
+        'length': positions[after + 1] - positions[after] - 1,
+    })
+    return SparseFrame(observed, gaps, DataFrame(index=observed.index[:0]), data.freq)
 
 
-def run(series: Series, window:int = 24):
+def run(series: Series | SparseFrame, window:int = 24):
     """Apply `agg_func` smoothing on `window`.
 
     Args:
-        series (Series): _description_
-        target (str): _description_
-        window (int, optional): _description_. Defaults to 50.
-        agg_func (str, optional): _description_. Defaults to 'mean'.
+        series (Series | SparseFrame): _description_
+        window (int, optional): _description_. Defaults to 24.
 
     Returns:
-        Series: _description_
+        Series | SparseFrame: _description_
     """
+    if isinstance(series, SparseFrame):
+        # Smooth the runs of values directly, without materialising every minute.
+        return smooth_sparse_frame(series, window)
     return series.rolling(window=window).mean()